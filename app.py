@@ -1,15 +1,47 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse, Response
 from config import settings
-from core.middleware import CacheRateLimitMiddleware
+from core.invalid_handles import start_invalid_handles_sync
+from core.local_cache import start_invalidation_listener
+from core.middleware import CacheRateLimitMiddleware, register_cache_codec, register_negotiated_media_type
+from core.rate_limit import start_rate_limit_sync
+from core.write_behind import write_behind
 from models.exceptions import http_exception_handler
-from routes import badges, contests, docs, heatmap, legacy, profile, rating, stats, summary, topics
+from routes import badges, contests, docs, heatmap, legacy, metrics, profile, rating, refresh, stats, summary, topics
+from services import heatmap_codec
+from services.warmer import start_cache_warmer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    listener = start_invalidation_listener()
+    rate_limit_sync = start_rate_limit_sync()
+    warmer = start_cache_warmer(app)
+    invalid_handles_sync = start_invalid_handles_sync("gfg")
+    yield
+    if listener is not None:
+        listener.cancel()
+    if invalid_handles_sync is not None:
+        invalid_handles_sync.cancel()
+    if warmer is not None:
+        warmer.cancel()
+    await write_behind.drain()
+    if rate_limit_sync is not None:
+        # the task pushes its last batch on the way out
+        rate_limit_sync.cancel()
+        with suppress(asyncio.CancelledError):
+            await rate_limit_sync
+
 
 app = FastAPI(
     title=settings.app_name,
     description=settings.app_description,
     version=settings.app_version,
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -19,6 +51,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 app.add_middleware(CacheRateLimitMiddleware, platform="gfg")
+register_cache_codec("heatmap", heatmap_codec.compact_envelope, heatmap_codec.expand_envelope)
+register_negotiated_media_type(heatmap_codec.MEDIA_TYPE)
 
 app.add_exception_handler(HTTPException, http_exception_handler)
 
@@ -29,6 +63,8 @@ async def favicon():
 
 
 app.include_router(docs.docs_router)
+app.include_router(metrics.router)
+app.include_router(refresh.router)
 app.include_router(profile.router)
 app.include_router(stats.router)
 app.include_router(contests.router)
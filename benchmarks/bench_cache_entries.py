@@ -0,0 +1,123 @@
+"""Size and cost of a cached response entry, JSON + base64 versus binary.
+
+The previous entry format (reproduced here) was a JSON object with the body
+base64-encoded, stored through the text-mode Redis client. The current one is
+``core.cache.pack_response``: a small struct header, the kept headers and the
+raw body on the bytes-mode client. Redis keeps string values as-is, so the
+stored length is what each entry costs in memory (plus per-key overhead,
+identical for both).
+
+Bodies: a stats SVG card, a ``/profile`` JSON body for a 10-year history and
+the compacted heatmap envelope (``services.heatmap_codec``).
+
+A second table shows the entries the middleware stores now, compressed with
+``cache_encoding()`` where that helps (``_compact``), and what a hit costs for
+a client that accepts the encoding (sent as stored) and one that does not
+(decompressed per Redis hit, then kept in the local cache).
+
+    python benchmarks/bench_cache_entries.py
+"""
+
+import json
+import os
+import sys
+import time
+from base64 import b64decode, b64encode
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from starlette.responses import JSONResponse  # noqa: E402
+
+from bench_heatmap import day_counts, synthetic_payload  # noqa: E402
+from core.cache import pack_response, unpack_response  # noqa: E402
+from core.compression import cache_encoding  # noqa: E402
+from core.middleware import CacheRateLimitMiddleware, register_cache_codec  # noqa: E402
+from models.canonical import make_envelope  # noqa: E402
+from services.heatmap_codec import compact_envelope, expand_envelope  # noqa: E402
+from services.heatmap_engine import BaseHeatmap, project  # noqa: E402
+from services.stats_svg import render_stats_svg  # noqa: E402
+from services.submission_store import SubmissionStore  # noqa: E402
+
+ROUNDS = 200
+
+register_cache_codec("heatmap", compact_envelope, expand_envelope)
+
+
+def legacy_pack(status_code, headers, body, codec=None) -> bytes:
+    entry = {
+        "status_code": status_code,
+        "headers": {name.decode("latin-1"): value.decode("latin-1") for name, value in headers},
+        "media_type": headers[0][1].decode("latin-1").split(";", 1)[0],
+    }
+    if codec:
+        entry["codec"] = codec
+    entry["body"] = b64encode(body).decode("ascii")
+    return json.dumps(entry, separators=(",", ":")).encode("utf-8")
+
+
+def legacy_unpack(value: bytes):
+    entry = json.loads(value)
+    return entry["status_code"], entry["headers"], b64decode(entry["body"].encode("ascii")), entry.get("codec")
+
+
+def bodies():
+    payload, created, today = synthetic_payload()
+    store = SubmissionStore.from_payload(payload)
+    svg = render_stats_svg(
+        "gfg",
+        "alice",
+        {"totalSolved": len(store), "byDifficulty": store.count_by_difficulty()},
+    ).encode("utf-8")
+    profile = JSONResponse(make_envelope("alice", {"solvedStats": store.solved_stats()})).body
+    base = BaseHeatmap.build(day_counts(payload, created, today))
+    heatmap = JSONResponse(make_envelope("alice", project(base, "all", None), legacy={"cursor": "c", "since": None})).body
+    return [
+        ("stats svg", b"image/svg+xml", svg, None),
+        ("profile json", b"application/json", profile, None),
+        ("heatmap", b"application/json", heatmap, "heatmap"),
+    ]
+
+
+def _time(function, *args) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        function(*args)
+    return (time.perf_counter() - start) / ROUNDS * 1e6
+
+
+def main() -> None:
+    print(f"stored bytes per entry; encode/decode in us ({ROUNDS} rounds)")
+    print(f"{'body':<18} {'raw':>9} {'json+b64':>9} {'binary':>9} {'saved':>6} {'enc old':>8} {'enc new':>8} {'hit old':>8} {'hit new':>8}")
+    for name, content_type, body, codec in bodies():
+        headers = [(b"content-type", content_type), (b"cache-control", b"public, max-age=300"), (b"vary", b"Accept")]
+        if codec:
+            name, body = f"{name} (compact)", compact_envelope(body)
+        old = legacy_pack(200, headers, body, codec)
+        new = pack_response(200, headers, body, codec)
+        assert legacy_unpack(old)[2] == unpack_response(new)[2] == body
+        print(
+            f"{name:<18} {len(body):9d} {len(old):9d} {len(new):9d} {1 - len(new) / len(old):6.0%}"
+            f" {_time(legacy_pack, 200, headers, body, codec):8.1f} {_time(pack_response, 200, headers, body, codec):8.1f}"
+            f" {_time(legacy_unpack, old):8.1f} {_time(unpack_response, new):8.1f}"
+        )
+
+    encoding = cache_encoding()
+    print()
+    print(f"stored entries with {encoding} (bytes; hit in us)")
+    print(f"{'body':<18} {'binary':>9} {'stored':>9} {'saved':>6} {'wire':>9} {'hit enc':>8} {'hit plain':>9}")
+    for name, content_type, body, codec in bodies():
+        headers = [(b"content-type", content_type), (b"cache-control", b"public, max-age=300"), (b"vary", b"Accept")]
+        binary = pack_response(200, headers, body, codec)
+        stored = pack_response(200, *CacheRateLimitMiddleware._compact(headers, body, codec))
+        # no ETag in these headers, so codec entries are expanded on every call
+        key = f"cache:bench:{name}"
+        hit = CacheRateLimitMiddleware._cached_hit(key, stored, encoding)
+        print(
+            f"{name:<18} {len(binary):9d} {len(stored):9d} {1 - len(stored) / len(binary):6.0%} {len(hit[2]):9d}"
+            f" {_time(CacheRateLimitMiddleware._cached_hit, key, stored, encoding):8.1f}"
+            f" {_time(CacheRateLimitMiddleware._cached_hit, key, stored, None):9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Heatmap pipeline benchmark over a synthetic 10-year submission history.
+
+Compares, for the three views the API serves:
+
+* three-step: ``Counter`` of ISO strings -> ``heatmap_from`` -> ``window_heatmap``
+  (the original pipeline, reproduced here);
+* columnar: the request path with the heatmap cache off, i.e.
+  ``SubmissionStore.from_payload`` -> ``build_submission_times`` ->
+  ``SubmissionTimes.day_counts`` -> ``window_counts``;
+* cached base: ``project`` from an already-built ``BaseHeatmap``, i.e. what a
+  warm ``get_windowed_heatmap`` does on a memo miss.
+
+It also times re-bucketing the cached epoch array into another ``tz=``.
+
+    python benchmarks/bench_heatmap.py
+"""
+
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.canonical_mapper import heatmap_from  # noqa: E402
+from services.heatmap import build_submission_times  # noqa: E402
+from services.heatmap_engine import BaseHeatmap, project, window_counts  # noqa: E402
+from services.submission_store import SubmissionStore  # noqa: E402
+from services.heatmap_window import window_heatmap  # noqa: E402
+
+YEARS = 10
+ROUNDS = 20
+DIFFICULTIES = ["school", "basic", "easy", "medium", "hard"]
+
+
+def synthetic_payload(years: int = YEARS, seed: int = 7):
+    rng = random.Random(seed)
+    today = datetime.now(timezone.utc).date()
+    created = today - timedelta(days=365 * years)
+    result = {difficulty: {} for difficulty in DIFFICULTIES}
+    problem_id = 0
+    for offset in range((today - created).days + 1):
+        if rng.random() > 0.55:
+            continue
+        day = created + timedelta(days=offset)
+        for _ in range(rng.randint(1, 6)):
+            problem_id += 1
+            stamp = f"{day.isoformat()} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}"
+            result[rng.choice(DIFFICULTIES)][str(problem_id)] = {
+                "pname": f"Problem {problem_id}",
+                "slug": f"problem-{problem_id}",
+                "user_subtime": stamp,
+            }
+    return {"result": result, "count": problem_id}, created, today
+
+
+def legacy_path(payload, created: date, today: date, view: str, year):
+    heatmap_counts = Counter()
+    for details in (d for problems in payload["result"].values() for d in problems.values()):
+        submitted = datetime.strptime(details["user_subtime"], "%Y-%m-%d %H:%M:%S").date()
+        if created <= submitted <= today:
+            heatmap_counts[submitted.isoformat()] += 1
+    data = {"heatmap": [{"date": d, "count": c} for d, c in sorted(heatmap_counts.items())]}
+    years = list(range(today.year, created.year - 1, -1))
+    return window_heatmap(heatmap_from(data), view, year, available_years=years)
+
+
+def day_counts(payload, created: date, today: date):
+    """UTC day counts the way a request builds them from a fresh payload."""
+    store = SubmissionStore.from_payload(payload)
+    times = build_submission_times(store, datetime.combine(created, datetime.min.time()))
+    return times.day_counts(timezone.utc, today)
+
+
+def columnar_path(payload, created: date, today: date, view: str, year):
+    return window_counts(day_counts(payload, created, today), view, year)
+
+
+def _time(fn, *args) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        fn(*args)
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+def main() -> None:
+    payload, created, today = synthetic_payload()
+    base = BaseHeatmap.build(day_counts(payload, created, today))
+    print(f"{payload['count']} submissions over {YEARS} years, {ROUNDS} rounds each (ms per request)")
+    print(f"{'view':<12} {'three-step':>10} {'columnar':>10} {'cached base':>12}")
+    for view, year in [("all", None), ("last_365", None), ("year", today.year - 1)]:
+        expected = legacy_path(payload, created, today, view, year)
+        assert columnar_path(payload, created, today, view, year) == expected
+        assert project(base, view, year) == expected
+        legacy_ms = _time(legacy_path, payload, created, today, view, year)
+        columnar_ms = _time(columnar_path, payload, created, today, view, year)
+        base_ms = _time(project, base, view, year)
+        label = f"{view}{'=' + str(year) if year else ''}"
+        print(f"{label:<12} {legacy_ms:10.2f} {columnar_ms:10.2f} {base_ms:12.3f}   columnar x{legacy_ms / columnar_ms:.1f}")
+
+    store = SubmissionStore.from_payload(payload)
+    times = build_submission_times(store, datetime.combine(created, datetime.min.time()))
+    print("re-bucket cached epochs (ms):")
+    for name in ["UTC", "Asia/Kolkata", "America/New_York"]:
+        zone = ZoneInfo(name)
+        print(f"  {name:<18} {_time(times.day_counts, zone, today):8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Redis round trips on the middleware's cache-miss path.
+
+Runs the miss-path lookups against a Redis stand-in on a loopback TCP socket:
+every command or script call is one request/reply on the socket, optionally
+delayed server-side to mimic network latency. Compared:
+
+* original: GET response, GET invalid marker, then the fixed-window
+  ``check_rate_limit`` (reproduced here) for the IP and for the handle;
+* per call: GET response, GET invalid marker, one ``check_rate_limits`` script;
+* lookup: ``core.lookup.lookup``, everything in one script call.
+
+    python benchmarks/bench_lookup.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core import cache, lookup as lookup_module, rate_limit  # noqa: E402
+from core.lookup import lookup  # noqa: E402
+from core.rate_limit import check_rate_limits  # noqa: E402
+
+ROUNDS = 200
+LIMITS = [("ip:gfg:127.0.0.1", 60, 60, "ip"), ("handle:gfg:alice", 30, 60, "handle")]
+INVALID_LIMITS = [("invalid-ip:gfg:127.0.0.1", 10, 600, "invalid-ip"), ("invalid-handle:gfg:alice", 5, 600, "invalid-handle")]
+
+
+class LoopbackRedis:
+    """Answers every command with a canned reply after one socket round trip."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.round_trips = 0
+
+    async def _round_trip(self, reply):
+        self.round_trips += 1
+        self.writer.write(b"*\n")
+        await self.writer.drain()
+        await self.reader.readline()
+        return reply
+
+    async def get(self, key):
+        return await self._round_trip(None)
+
+    async def ttl(self, key):
+        return await self._round_trip(-2 if key.startswith("backoff:") else 42)
+
+    async def incr(self, key):
+        return await self._round_trip(3)
+
+    async def expire(self, key, seconds):
+        return await self._round_trip(1)
+
+    async def delete(self, key):
+        return await self._round_trip(0)
+
+    def register_script(self, source):
+        limits_reply = [1, 2, 0, 29, int(time.time() * 1000)]
+        reply = [0, 0, limits_reply] if "EXISTS" in source else limits_reply
+
+        async def script(keys, args):
+            return await self._round_trip(reply)
+
+        return script
+
+
+async def original_check_rate_limit(client, key: str, limit: int, window_seconds: int) -> bool:
+    if (await client.ttl(f"backoff:{key}")) > 0:
+        return False
+    count = await client.incr(f"rl:{key}")
+    if count == 1:
+        await client.expire(f"rl:{key}", window_seconds)
+    await client.ttl(f"rl:{key}")
+    if count <= limit:
+        await client.delete(f"violations:{key}")
+        return True
+    return False
+
+
+async def original(client) -> None:
+    await client.get("cache:gfg:key")
+    await client.get("invalid:gfg:alice")
+    for key, limit, window_seconds, _ in LIMITS:
+        if not await original_check_rate_limit(client, key, limit, window_seconds):
+            return
+
+
+async def per_call(client) -> None:
+    await cache.get_bytes("cache:gfg:key")
+    await client.get("invalid:gfg:alice")
+    await check_rate_limits(LIMITS)
+
+
+async def single(client) -> None:
+    await lookup("cache:gfg:key", "invalid:gfg:alice", LIMITS, INVALID_LIMITS)
+
+
+async def _serve(delay: float):
+    async def handle(reader, writer):
+        while await reader.readline():
+            if delay:
+                await asyncio.sleep(delay)
+            writer.write(b"+\n")
+            await writer.drain()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+async def main() -> None:
+    print(f"cache-miss lookup, {ROUNDS} requests each (us per request, round trips)")
+    print(f"{'server delay':>12} {'original':>16} {'per call':>16} {'lookup':>16}")
+    for delay in (0.0, 0.0005):
+        server = await _serve(delay)
+        reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+        client = LoopbackRedis(reader, writer)
+        cache.get_bytes_redis = lambda: client
+        rate_limit.get_redis = lambda: client
+        lookup_module.get_bytes_redis = lambda: client
+
+        cells = []
+        for path in (original, per_call, single):
+            await path(client)
+            client.round_trips = 0
+            start = time.perf_counter()
+            for _ in range(ROUNDS):
+                await path(client)
+            elapsed = (time.perf_counter() - start) / ROUNDS * 1e6
+            cells.append(f"{elapsed:9.1f} ({client.round_trips // ROUNDS:>2})")
+        print(f"{delay * 1e3:10.1f}ms " + " ".join(f"{cell:>16}" for cell in cells))
+
+        writer.close()
+        await writer.wait_closed()
+        await asyncio.sleep(0)
+        server.close()
+        await server.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,172 @@
+"""Per-request overhead of the cache/rate-limit middleware.
+
+Compares the pure ASGI ``CacheRateLimitMiddleware`` with the previous
+``BaseHTTPMiddleware`` version (reproduced here) around a trivial app that
+streams a JSON body in 64 KB chunks. Redis is replaced by in-process stand-ins
+so only the middleware itself is measured:
+
+* miss: every lookup misses, the body is collected and "stored";
+* hit: the entry is served from the (stand-in) Redis, local cache disabled;
+* l1: the entry is served from the in-process local cache (the legacy
+  version has none, so its column repeats its Redis hit);
+* bare: the app without any middleware, for reference.
+
+    python benchmarks/bench_middleware.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+from base64 import b64decode, b64encode
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+from starlette.responses import Response  # noqa: E402
+
+from core import middleware, write_behind  # noqa: E402
+from core.config import cache_rate_limit_settings as settings  # noqa: E402
+from core.middleware import (  # noqa: E402
+    CacheRateLimitMiddleware,
+    _cache_key,
+    _handle_from_path,
+    _is_invalid_user,
+    _ttl_from_cache_control,
+)
+from core.local_cache import LocalCache  # noqa: E402
+from core.lookup import CacheLookup  # noqa: E402
+from core.rate_limit import RateLimitResult  # noqa: E402
+
+ROUNDS = 300
+CHUNK = 64 * 1024
+
+
+class LegacyCacheRateLimitMiddleware(BaseHTTPMiddleware):
+    """Condensed copy of the original ``BaseHTTPMiddleware`` implementation,
+    with its JSON + base64 cache entries."""
+
+    def __init__(self, app, platform: str) -> None:
+        super().__init__(app)
+        self.platform = platform
+
+    async def dispatch(self, request, call_next):
+        handle = _handle_from_path(request.url.path)
+        key = _cache_key(self.platform, request)
+        cached = await middleware.get_json(key)
+        if cached is not None:
+            headers = dict(cached["headers"])
+            headers["X-Cache"] = "HIT"
+            body = b64decode(cached["body"].encode("ascii"))
+            return Response(content=body, status_code=cached["status_code"], headers=headers)
+        await middleware.get_json(f"invalid:{self.platform}:{handle}")
+        await middleware.check_rate_limit("ip", 1, 1, "ip")
+        await middleware.check_rate_limit("handle", 1, 1, "handle")
+
+        response = await call_next(request)
+        body = b""
+        async for chunk in response.body_iterator:
+            body += chunk
+        headers = dict(response.headers)
+        headers.pop("content-length", None)
+        headers["X-Cache"] = "MISS"
+        if not _is_invalid_user(response.status_code, body) and response.status_code == 200:
+            headers.setdefault("Cache-Control", f"public, max-age={settings.cache_ttl_seconds}")
+            _ttl_from_cache_control(headers, settings.cache_ttl_seconds)
+            entry = {"status_code": 200, "headers": headers, "body": b64encode(body).decode("ascii")}
+            await middleware.set_json(key, entry, 60)
+        return Response(content=body, status_code=response.status_code, headers=headers, background=response.background)
+
+
+def make_app(size: int):
+    body = b'{"data":"' + b"x" * max(size - 11, 0) + b'"}'
+
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        for start in range(0, len(body), CHUNK):
+            end = start + CHUNK
+            await send({"type": "http.response.body", "body": body[start:end], "more_body": end < len(body)})
+
+    return app
+
+
+def _scope():
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/alice/heatmap",
+        "raw_path": b"/alice/heatmap",
+        "query_string": b"view=all",
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+    }
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _send(message):
+    return None
+
+
+def _install_stand_ins(hit: bool, l1: bool):
+    store = {}
+
+    async def get_json(key):
+        return store.get(key) if hit else None
+
+    async def set_json(key, value, ttl_seconds):
+        store[key] = value
+
+    async def write_many(writes, messages=()):
+        for write in writes:
+            store[write.key] = write.value
+
+    async def lookup(key, invalid_key, limits, invalid_limits):
+        return CacheLookup(cached=store.get(key) if hit else None)
+
+    async def check_rate_limit(*args):
+        return RateLimitResult(allowed=True)
+
+    middleware.cache_enabled = lambda: True
+    middleware.get_json = get_json
+    middleware.set_json = set_json
+    middleware.lookup = lookup
+    write_behind.write_many = write_many
+    middleware.check_rate_limit = check_rate_limit
+    middleware.local_cache = LocalCache(max_entries=64 if l1 else 0, max_bytes=64 * 1024 * 1024)
+
+
+async def _time(app) -> float:
+    await app(_scope(), _receive, _send)  # warm up (and fill the cache for hits)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        await app(_scope(), _receive, _send)
+    return (time.perf_counter() - start) / ROUNDS * 1e6
+
+
+async def main() -> None:
+    print(f"{ROUNDS} requests each (us per request)")
+    print(f"{'body':>8} {'path':<5} {'bare':>9} {'BaseHTTP':>10} {'ASGI':>9}")
+    for size in (1024, 256 * 1024, 2 * 1024 * 1024):
+        for label, hit, l1 in (("miss", False, False), ("hit", True, False), ("l1", True, True)):
+            _install_stand_ins(hit, l1)
+            app = make_app(size)
+            bare = await _time(app)
+            legacy = await _time(LegacyCacheRateLimitMiddleware(app, "gfg"))
+            current = await _time(CacheRateLimitMiddleware(app, "gfg"))
+            print(f"{size // 1024:>6}KB {label:<5} {bare:9.1f} {legacy:10.1f} {current:9.1f}   x{legacy / current:.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
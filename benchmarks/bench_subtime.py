@@ -0,0 +1,54 @@
+"""Micro-benchmark: ``subtime_ordinal`` vs ``datetime.strptime`` for ``user_subtime``.
+
+    python benchmarks/bench_subtime.py
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.subtime import SUBTIME_FORMAT, subtime_ordinal  # noqa: E402
+
+SAMPLES = 100_000
+
+
+def _stamps(count: int, seed: int = 3):
+    rng = random.Random(seed)
+    start = date(2016, 1, 1)
+    return [
+        f"{(start + timedelta(days=rng.randrange(3650))).isoformat()} "
+        f"{rng.randrange(24):02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d}"
+        for _ in range(count)
+    ]
+
+
+def _strptime(values):
+    return [datetime.strptime(value, SUBTIME_FORMAT).toordinal() for value in values]
+
+
+def _fast(values):
+    return [subtime_ordinal(value) for value in values]
+
+
+def _time(fn, values) -> float:
+    start = time.perf_counter()
+    fn(values)
+    return (time.perf_counter() - start) / len(values) * 1e9
+
+
+def main() -> None:
+    values = _stamps(SAMPLES)
+    assert _strptime(values) == _fast(values)
+    strptime_ns = _time(_strptime, values)
+    fast_ns = _time(_fast, values)
+    print(f"{SAMPLES} timestamps over 10 years")
+    print(f"strptime        {strptime_ns:8.0f} ns/op")
+    print(f"subtime_ordinal {fast_ns:8.0f} ns/op   x{strptime_ns / fast_ns:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,4 +9,16 @@ class Settings(BaseSettings):
     
     request_timeout: float = 10.0
 
+    # Prebuilt slug -> topic tags catalog (see services/topic_catalog.py).
+    # Relative paths resolve against the repository root; a missing file is ignored.
+    topic_catalog_path: str = "data/topic_catalog.bin"
+
+    # In-process per-user base heatmaps (services/heatmap.py::get_windowed_heatmap).
+    heatmap_cache_ttl_seconds: int = 300
+    heatmap_cache_size: int = 512
+
+    # Timezone GFG's naive ``user_subtime`` / ``created_date`` values are in.
+    # Heatmaps are re-bucketed per request with ``tz=`` (default UTC).
+    gfg_timezone: str = "UTC"
+
 settings = Settings()
@@ -0,0 +1,16 @@
+import hmac
+
+from fastapi import HTTPException
+
+
+def require_bearer(authorization: str | None, token: str, name: str) -> None:
+    """Raise unless ``authorization`` is ``Bearer <token>``.
+
+    An empty ``token`` means the endpoint is disabled (404).
+    """
+    if not token:
+        raise HTTPException(status_code=404, detail=f"{name.capitalize()} is not enabled")
+    scheme, _, given = (authorization or "").partition(" ")
+    # as bytes: compare_digest rejects non-ASCII str with a TypeError
+    if scheme.lower() != "bearer" or not hmac.compare_digest(given.strip().encode(), token.encode()):
+        raise HTTPException(status_code=401, detail=f"Invalid {name} token", headers={"WWW-Authenticate": "Bearer"})
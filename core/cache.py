@@ -1,34 +1,186 @@
 import json
-from base64 import b64decode, b64encode
+import sqlite3
+import struct
+from collections.abc import Sequence
+from dataclasses import dataclass
 from typing import Any
 
 from redis import asyncio as redis
+from redis.asyncio.retry import Retry
+from redis.backoff import NoBackoff
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
 
+from core.cache_backends import MemoryStore, SqliteStore
+from core.circuit_breaker import CircuitBreaker
 from core.config import cache_rate_limit_settings as settings
+from core.metrics import register_gauge
 
 
+LocalStore = MemoryStore | SqliteStore
+
 _client: redis.Redis | None = None
+_bytes_client: redis.Redis | None = None
+_local_store: LocalStore | None = None
+_fallback_store: MemoryStore | None = None
+_scripts: dict[tuple[str, int], Any] = {}
+
+# Cached responses are one binary string per key:
+#   magic, status, codec name length, headers length   (struct below)
+#   codec name        ASCII, empty when the body is stored as-is
+#   headers           "name: value\r\n" lines, latin-1 as on the wire
+#   body              raw bytes
+RESPONSE_MAGIC = b"GCR1"
+_RESPONSE_HEADER = struct.Struct("<4sHBI")
+
+# KEYS: entry, index set. ARGV: value, TTL seconds. The index lives as long
+# as its longest-lived entry.
+_INDEXED_SET_SCRIPT = """
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+redis.call('SADD', KEYS[2], KEYS[1])
+if redis.call('TTL', KEYS[2]) < tonumber(ARGV[2]) then
+    redis.call('EXPIRE', KEYS[2], ARGV[2])
+end
+"""
+
+# KEYS: index set, then other keys to drop with it. Deletes every indexed
+# entry and the given keys; replies with the indexed entries.
+_PURGE_INDEX_SCRIPT = """
+local members = redis.call('SMEMBERS', KEYS[1])
+for i = 1, #members do
+    redis.call('DEL', members[i])
+end
+redis.call('DEL', unpack(KEYS))
+return members
+"""
+
+
+redis_breaker = CircuitBreaker(
+    "redis",
+    settings.redis_breaker_failure_threshold,
+    settings.redis_breaker_cooldown_seconds,
+)
+register_gauge("redis.breaker.state", lambda: redis_breaker.state_code())
+
+_REDIS_FAILURES = (RedisConnectionError, RedisTimeoutError, OSError)
+
+
+class _BreakerHooks:
+    """Reports every connect and reply of a connection to ``redis_breaker``.
+
+    Error replies count as successes: Redis answered.
+    """
+
+    async def connect(self) -> None:
+        try:
+            await super().connect()
+        except _REDIS_FAILURES:
+            redis_breaker.record_failure()
+            raise
+
+    async def read_response(self, *args: Any, **kwargs: Any) -> Any:
+        try:
+            response = await super().read_response(*args, **kwargs)
+        except _REDIS_FAILURES:
+            redis_breaker.record_failure()
+            raise
+        redis_breaker.record_success()
+        return response
+
+
+def _redis_client(decode_responses: bool) -> redis.Redis:
+    """Client with tight timeouts, no retries and its connections reporting to the breaker."""
+    client = redis.from_url(
+        settings.redis_url,
+        decode_responses=decode_responses,
+        socket_timeout=settings.redis_timeout_seconds,
+        socket_connect_timeout=settings.redis_timeout_seconds,
+        retry=Retry(NoBackoff(), 0),
+    )
+    pool = client.connection_pool
+    base = pool.connection_class
+    pool.connection_class = type(f"Breaker{base.__name__}", (_BreakerHooks, base), {})
+    return client
 
 
 def redis_enabled() -> bool:
-    return bool(settings.redis_url)
+    return settings.cache_backend == "redis" and bool(settings.redis_url)
+
+
+def redis_available() -> bool:
+    """Redis is configured and the breaker is closed (no side effects, unlike ``get_redis``)."""
+    return redis_enabled() and redis_breaker.state == CircuitBreaker.CLOSED
+
+
+def cache_enabled() -> bool:
+    return redis_enabled() or get_local_store() is not None
+
+
+def get_local_store() -> LocalStore | None:
+    """The in-process or on-disk store when ``CACHE_BACKEND`` is memory or sqlite.
+
+    With Redis, an in-process stand-in while ``redis_breaker`` keeps it
+    skipped, so caching and limits carry on per worker.
+    """
+    global _local_store, _fallback_store
+    if redis_enabled():
+        if redis_breaker.state == CircuitBreaker.CLOSED:
+            return None
+        if _fallback_store is None:
+            _fallback_store = MemoryStore(settings.cache_memory_max_entries)
+        return _fallback_store
+    if _local_store is None:
+        if settings.cache_backend == "sqlite":
+            try:
+                _local_store = SqliteStore(settings.cache_sqlite_path, settings.cache_sqlite_busy_timeout_seconds)
+            except sqlite3.Error:
+                _local_store = MemoryStore(settings.cache_memory_max_entries)
+        elif settings.cache_backend == "memory":
+            _local_store = MemoryStore(settings.cache_memory_max_entries)
+    return _local_store
 
 
 def get_redis() -> redis.Redis | None:
+    """The Redis client, or ``None`` without Redis or while ``redis_breaker`` is open."""
     global _client
-    if not settings.redis_url:
+    if not redis_enabled() or not redis_breaker.allow():
         return None
     if _client is None:
-        _client = redis.from_url(settings.redis_url, decode_responses=True)
+        _client = _redis_client(decode_responses=True)
     return _client
 
 
+def get_bytes_redis() -> redis.Redis | None:
+    """Client for binary values; ``get_redis`` decodes replies as text."""
+    global _bytes_client
+    if not redis_enabled() or not redis_breaker.allow():
+        return None
+    if _bytes_client is None:
+        _bytes_client = _redis_client(decode_responses=False)
+    return _bytes_client
+
+
+def get_pubsub_redis() -> redis.Redis | None:
+    """Client for blocking pub/sub reads: no socket timeout and no breaker."""
+    if not redis_enabled():
+        return None
+    return redis.from_url(
+        settings.redis_url,
+        decode_responses=True,
+        socket_connect_timeout=settings.redis_timeout_seconds,
+    )
+
+
 async def get_json(key: str) -> dict[str, Any] | None:
     client = get_redis()
-    if client is None:
-        return None
+    store = get_local_store() if client is None else None
     try:
-        value = await client.get(key)
+        if client is not None:
+            value = await client.get(key)
+        elif store is not None:
+            value = store.get(key)
+        else:
+            return None
     except Exception:
         return None
     if not value:
@@ -40,18 +192,216 @@ async def get_json(key: str) -> dict[str, Any] | None:
 
 
 async def set_json(key: str, value: dict[str, Any], ttl_seconds: int) -> None:
+    encoded = json.dumps(value, separators=(",", ":"))
+    client = get_redis()
+    store = get_local_store() if client is None else None
+    try:
+        if client is not None:
+            await client.setex(key, ttl_seconds, encoded)
+        elif store is not None:
+            store.set(key, encoded.encode("utf-8"), ttl_seconds)
+    except Exception:
+        return
+
+
+async def get_bytes(key: str) -> bytes | None:
+    client = get_bytes_redis()
+    store = get_local_store() if client is None else None
+    try:
+        if client is not None:
+            value = await client.get(key)
+        elif store is not None:
+            value = store.get(key)
+        else:
+            return None
+    except Exception:
+        return None
+    return value or None
+
+
+async def set_bytes(key: str, value: bytes, ttl_seconds: int) -> None:
+    client = get_bytes_redis()
+    store = get_local_store() if client is None else None
+    try:
+        if client is not None:
+            await client.setex(key, ttl_seconds, value)
+        elif store is not None:
+            store.set(key, value, ttl_seconds)
+    except Exception:
+        return
+
+
+async def claim(key: str, ttl_seconds: int) -> bool:
+    """Set ``key`` unless it exists; True for the one caller that set it."""
     client = get_redis()
-    if client is None:
+    store = get_local_store() if client is None else None
+    try:
+        if client is not None:
+            return bool(await client.set(key, "1", nx=True, ex=ttl_seconds))
+        if store is None:
+            return False
+        with store.transaction():
+            if store.get(key) is not None:
+                return False
+            store.set(key, b"1", ttl_seconds)
+            return True
+    except Exception:
+        return False
+
+
+async def increment_counter(key: str, ttl_seconds: int) -> int | None:
+    """Add one to the counter at ``key`` and return it; ``None`` without a store.
+
+    A plain counter with no backoff, however far it is pushed; callers name
+    the window in ``key`` and let it expire after ``ttl_seconds``.
+    """
+    client = get_redis()
+    store = get_local_store() if client is None else None
+    try:
+        if client is not None:
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.incr(key)
+                pipe.expire(key, ttl_seconds)
+                value, _ = await pipe.execute()
+            return int(value)
+        if store is None:
+            return None
+        with store.transaction():
+            current = store.get(key)
+            value = int(current) + 1 if current else 1
+            store.set(key, str(value).encode(), store.ttl(key) if current else ttl_seconds)
+            return value
+    except Exception:
+        return None
+
+
+async def release(key: str) -> None:
+    """Give up a ``claim`` early, e.g. when the claimed work did not run."""
+    client = get_redis()
+    store = get_local_store() if client is None else None
+    try:
+        if client is not None:
+            await client.delete(key)
+        elif store is not None:
+            store.delete(key)
+    except Exception:
+        return
+
+
+def _script(client: redis.Redis, source: str):
+    key = (source, id(client))
+    if key not in _scripts:
+        _scripts[key] = client.register_script(source)
+    return _scripts[key]
+
+
+def _index_members(store: LocalStore, index_key: str) -> list[str]:
+    value = store.get(index_key)
+    return value.decode("utf-8").split("\n") if value else []
+
+
+@dataclass
+class CacheWrite:
+    key: str
+    value: bytes
+    ttl_seconds: int
+    # also record ``key`` in this set (see ``purge_index``)
+    index_key: str | None = None
+
+
+def _write_locally(store: LocalStore, write: CacheWrite) -> None:
+    store.set(write.key, write.value, write.ttl_seconds)
+    if write.index_key is None:
         return
+    members = _index_members(store, write.index_key)
+    if write.key not in members:
+        members.append(write.key)
+    index_ttl = max(store.ttl(write.index_key), write.ttl_seconds)
+    store.set(write.index_key, "\n".join(members).encode("utf-8"), index_ttl)
+
+
+async def write_many(writes: Sequence[CacheWrite], messages: Sequence[tuple[str, str]] = ()) -> None:
+    """Apply ``writes`` in order, then publish ``messages`` (channel, message), in one round trip.
+
+    Indexed writes go through ``EVAL`` rather than a registered script: a
+    pipeline with scripts checks ``SCRIPT EXISTS`` first, a second round trip.
+    """
+    client = get_bytes_redis()
+    store = get_local_store() if client is None else None
     try:
-        await client.setex(key, ttl_seconds, json.dumps(value, separators=(",", ":")))
+        if client is not None:
+            async with client.pipeline(transaction=False) as pipe:
+                for write in writes:
+                    if write.index_key is None:
+                        pipe.set(write.key, write.value, ex=write.ttl_seconds)
+                    else:
+                        pipe.eval(_INDEXED_SET_SCRIPT, 2, write.key, write.index_key, write.value, write.ttl_seconds)
+                for channel, message in messages:
+                    pipe.publish(channel, message)
+                await pipe.execute()
+        elif store is not None:
+            with store.transaction():
+                for write in writes:
+                    _write_locally(store, write)
     except Exception:
         return
 
 
-def encode_body(body: bytes) -> str:
-    return b64encode(body).decode("ascii")
+async def purge_index(index_key: str, keys: list[str]) -> list[str]:
+    """Atomically delete every entry indexed under ``index_key``, the index and ``keys``.
+
+    Returns the indexed entry keys; empty when nothing was indexed or the
+    backend failed.
+    """
+    client = get_redis()
+    store = get_local_store() if client is None else None
+    try:
+        if client is not None:
+            return list(await _script(client, _PURGE_INDEX_SCRIPT)(keys=[index_key, *keys], args=[]))
+        if store is None:
+            return []
+        with store.transaction():
+            members = _index_members(store, index_key)
+            for key in [*members, index_key, *keys]:
+                store.delete(key)
+            return members
+    except Exception:
+        return []
+
+
+def pack_response(
+    status_code: int,
+    headers: list[tuple[bytes, bytes]],
+    body: bytes,
+    codec: str | None = None,
+) -> bytes:
+    codec_name = (codec or "").encode("ascii")
+    header_block = b"".join(name + b": " + value + b"\r\n" for name, value in headers)
+    return b"".join(
+        [
+            _RESPONSE_HEADER.pack(RESPONSE_MAGIC, status_code, len(codec_name), len(header_block)),
+            codec_name,
+            header_block,
+            body,
+        ]
+    )
 
 
-def decode_body(body: str) -> bytes:
-    return b64decode(body.encode("ascii"))
+def unpack_response(value: bytes) -> tuple[int, list[tuple[bytes, bytes]], bytes, str | None]:
+    """``(status_code, headers, body, codec)``; raises ``ValueError`` for anything else."""
+    if len(value) < _RESPONSE_HEADER.size:
+        raise ValueError("Truncated cached response.")
+    magic, status_code, codec_length, headers_length = _RESPONSE_HEADER.unpack_from(value)
+    if magic != RESPONSE_MAGIC:
+        raise ValueError("Not a cached response.")
+    offset = _RESPONSE_HEADER.size
+    headers_start = offset + codec_length
+    body_start = headers_start + headers_length
+    if body_start > len(value):
+        raise ValueError("Truncated cached response.")
+    codec = value[offset:headers_start].decode("ascii") or None
+    headers = []
+    for line in value[headers_start:body_start].split(b"\r\n")[:-1]:
+        name, _, header_value = line.partition(b": ")
+        headers.append((name, header_value))
+    return status_code, headers, value[body_start:], codec
@@ -0,0 +1,115 @@
+"""Process-local cache backends for deployments without Redis.
+
+Both stores keep bytes values with a TTL and expose the few synchronous
+primitives the cache, negative cache and rate limiter need. ``transaction``
+groups a read-modify-write: a no-op for ``MemoryStore``, whose calls never
+yield to the event loop, and ``BEGIN IMMEDIATE`` for ``SqliteStore``, which
+several worker processes may share.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager
+
+
+class MemoryStore:
+    """LRU-bounded dict of ``key -> (expires_at, value)``."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+
+    def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def ttl(self, key: str) -> float:
+        """Seconds left, 0 when missing or expired."""
+        entry = self._entries.get(key)
+        return max(entry[0] - time.time(), 0.0) if entry is not None else 0.0
+
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        self._entries.pop(key, None)
+        self._entries[key] = (time.time() + ttl_seconds, value)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def transaction(self) -> ContextManager[None]:
+        return nullcontext()
+
+
+class SqliteStore:
+    """Single-table store on local disk, shared by the workers of one host.
+
+    Calls run on the event loop, so waiting for another worker's write lock
+    is capped at ``busy_timeout`` seconds; past that they raise
+    ``sqlite3.OperationalError``, which callers treat as a miss or an allow.
+    """
+
+    _PURGE_EVERY = 500
+
+    def __init__(self, path: str, busy_timeout: float = 0.05) -> None:
+        self._connection = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False, timeout=busy_timeout
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._lock = threading.RLock()
+        self._writes = 0
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def ttl(self, key: str) -> float:
+        with self._lock:
+            row = self._connection.execute("SELECT expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        return max(row[0] - time.time(), 0.0) if row else 0.0
+
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl_seconds),
+            )
+            self._writes += 1
+            if self._writes % self._PURGE_EVERY == 0:
+                self._connection.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        with self._lock:
+            if self._connection.in_transaction:
+                yield
+                return
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
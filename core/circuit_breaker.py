@@ -0,0 +1,62 @@
+import time
+from collections.abc import Callable
+
+from core.metrics import increment
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    ``failure_threshold`` failures in a row open it for ``cooldown_seconds``,
+    during which ``allow`` refuses. After that one caller at a time is let
+    through as a probe (half-open): a success closes the breaker, a failure
+    opens it for another cool-down. A probe that never reports back is
+    replaced after a cool-down.
+    """
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        cooldown_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self._since = 0.0
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.clock() - self._since < self.cooldown_seconds:
+            increment(f"{self.name}.breaker.skipped")
+            return False
+        # cool-down over (or the last probe went quiet): let one probe through
+        self.state = self.HALF_OPEN
+        self._since = self.clock()
+        increment(f"{self.name}.breaker.probes")
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.state = self.CLOSED
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        increment(f"{self.name}.failures")
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+            self.state = self.OPEN
+            self._since = self.clock()
+            increment(f"{self.name}.breaker.opened")
+
+    def state_code(self) -> int:
+        """0 closed, 1 half-open, 2 open; for the metrics gauge."""
+        return (self.CLOSED, self.HALF_OPEN, self.OPEN).index(self.state)
@@ -0,0 +1,66 @@
+import gzip
+import zlib
+
+from core.config import cache_rate_limit_settings as settings
+
+try:
+    import brotli
+except ImportError:  # optional: CACHE_COMPRESSION=br falls back to gzip without it
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = ("application/json", "image/svg+xml", "text/", "application/javascript")
+
+
+def cache_encoding() -> str | None:
+    """Content-Encoding cache entries are stored with, ``None`` for uncompressed."""
+    if settings.cache_compression == "none":
+        return None
+    if settings.cache_compression == "br" and brotli is not None:
+        return "br"
+    return "gzip"
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.split(";", 1)[0].strip().lower().startswith(COMPRESSIBLE_TYPES)
+
+
+def accepts_encoding(accept_encoding: str, encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows ``encoding`` (explicitly or via ``*``)."""
+    wildcard = False
+    for item in accept_encoding.lower().split(","):
+        token, _, params = item.strip().partition(";")
+        token = token.strip()
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if token == encoding:
+            return quality > 0
+        if token == "*":
+            wildcard = quality > 0
+    return wildcard
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.cache_compression_level)
+    return gzip.compress(body, compresslevel=settings.cache_compression_level, mtime=0)
+
+
+def decompress(body: bytes, encoding: str) -> bytes:
+    """Inverse of ``compress``; raises ``ValueError`` for anything it cannot decode."""
+    try:
+        if encoding == "br" and brotli is not None:
+            return brotli.decompress(body)
+        if encoding == "gzip":
+            return gzip.decompress(body)
+    except (OSError, EOFError, zlib.error) as error:
+        raise ValueError(f"Corrupt {encoding} body.") from error
+    except Exception as error:  # brotli.error
+        raise ValueError(f"Corrupt {encoding} body.") from error
+    raise ValueError(f"Unsupported content encoding {encoding!r}.")
@@ -1,18 +1,75 @@
 import os
+import tempfile
+
+
+def _positive_int(name: str, default: str) -> int:
+    value = int(os.getenv(name, default))
+    if value <= 0:
+        # e.g. a zero backoff is SET ... EX 0, which errors inside the limit script
+        raise ValueError(f"{name} must be a positive integer, got {value}.")
+    return value
 
 
 class CacheRateLimitSettings:
     redis_url = os.getenv("REDIS_URL")
+    # redis | memory | sqlite | none; without REDIS_URL the default is memory
+    cache_backend = (os.getenv("CACHE_BACKEND") or ("redis" if redis_url else "memory")).lower()
+    cache_memory_max_entries = int(os.getenv("CACHE_MEMORY_MAX_ENTRIES", "10000"))
+    cache_sqlite_path = os.getenv("CACHE_SQLITE_PATH", os.path.join(tempfile.gettempdir(), "gfg-api-cache.sqlite3"))
+    # how long a sqlite call waits for another worker's write lock; the call runs
+    # on the event loop, so past this it gives up and reads as a miss / allow
+    cache_sqlite_busy_timeout_seconds = float(os.getenv("CACHE_SQLITE_BUSY_TIMEOUT_SECONDS", "0.05"))
+    # per-operation socket timeout; failures trip the breaker rather than being retried
+    redis_timeout_seconds = float(os.getenv("REDIS_TIMEOUT_SECONDS", "0.25"))
+    redis_breaker_failure_threshold = int(os.getenv("REDIS_BREAKER_FAILURE_THRESHOLD", "5"))
+    redis_breaker_cooldown_seconds = float(os.getenv("REDIS_BREAKER_COOLDOWN_SECONDS", "10"))
     cache_ttl_seconds = int(os.getenv("API_CACHE_TTL_SECONDS", "3600"))
     invalid_user_cache_ttl_seconds = int(os.getenv("INVALID_USER_CACHE_TTL_SECONDS", "300"))
+    submission_store_ttl_seconds = int(os.getenv("SUBMISSION_STORE_TTL_SECONDS", "300"))
+    profile_cache_ttl_seconds = int(os.getenv("PROFILE_CACHE_TTL_SECONDS", "300"))
     rate_limit_ip_requests = int(os.getenv("RATE_LIMIT_IP_REQUESTS", "60"))
     rate_limit_handle_requests = int(os.getenv("RATE_LIMIT_HANDLE_REQUESTS", "30"))
     rate_limit_window_seconds = int(os.getenv("RATE_LIMIT_WINDOW_SECONDS", "60"))
     invalid_rate_limit_ip_requests = int(os.getenv("INVALID_RATE_LIMIT_IP_REQUESTS", "10"))
     invalid_rate_limit_handle_requests = int(os.getenv("INVALID_RATE_LIMIT_HANDLE_REQUESTS", "5"))
     invalid_rate_limit_window_seconds = int(os.getenv("INVALID_RATE_LIMIT_WINDOW_SECONDS", "600"))
-    rate_limit_backoff_base_seconds = int(os.getenv("RATE_LIMIT_BACKOFF_BASE_SECONDS", "5"))
-    rate_limit_backoff_max_seconds = int(os.getenv("RATE_LIMIT_BACKOFF_MAX_SECONDS", "300"))
+    rate_limit_backoff_base_seconds = _positive_int("RATE_LIMIT_BACKOFF_BASE_SECONDS", "5")
+    rate_limit_backoff_max_seconds = _positive_int("RATE_LIMIT_BACKOFF_MAX_SECONDS", "300")
+    # hybrid: decide in process memory and sync to Redis in batches | exact: ask Redis every time
+    rate_limit_mode = os.getenv("RATE_LIMIT_MODE", "hybrid").lower()
+    rate_limit_sync_interval_seconds = float(os.getenv("RATE_LIMIT_SYNC_INTERVAL_SECONDS", "1"))
+    rate_limit_sync_max_pending = int(os.getenv("RATE_LIMIT_SYNC_MAX_PENDING", "4"))
+    # gzip | br (needs the brotli package) | none
+    cache_compression = os.getenv("CACHE_COMPRESSION", "gzip").lower()
+    cache_compression_min_bytes = int(os.getenv("CACHE_COMPRESSION_MIN_BYTES", "512"))
+    # gzip level / brotli quality; entries are compressed on the miss path
+    cache_compression_level = int(os.getenv("CACHE_COMPRESSION_LEVEL", "3"))
+    # Bloom filter of handles confirmed invalid, per generation (0 disables it)
+    invalid_handle_filter_capacity = int(os.getenv("INVALID_HANDLE_FILTER_CAPACITY", "100000"))
+    invalid_handle_filter_error_rate = float(os.getenv("INVALID_HANDLE_FILTER_ERROR_RATE", "0.0001"))
+    invalid_handle_filter_sync_seconds = float(os.getenv("INVALID_HANDLE_FILTER_SYNC_SECONDS", "5"))
+    # Bearer token for POST /{username}/refresh; unset disables the endpoint.
+    cache_refresh_token = os.getenv("CACHE_REFRESH_TOKEN", "")
+    refresh_rate_limit_requests = int(os.getenv("REFRESH_RATE_LIMIT_REQUESTS", "2"))
+    refresh_rate_limit_window_seconds = int(os.getenv("REFRESH_RATE_LIMIT_WINDOW_SECONDS", "600"))
+    # Bearer token for GET /_internal/metrics (defaults to the refresh token);
+    # unset disables the endpoint.
+    metrics_token = os.getenv("METRICS_TOKEN", cache_refresh_token)
+    # Background warming of the most requested handles (0 disables it).
+    cache_warm_top_n = int(os.getenv("CACHE_WARM_TOP_N", "20"))
+    cache_warm_interval_seconds = int(os.getenv("CACHE_WARM_INTERVAL_SECONDS", "60"))
+    # a handle is re-warmed this long before its entries would expire
+    cache_warm_margin_seconds = int(os.getenv("CACHE_WARM_MARGIN_SECONDS", "300"))
+    # handles re-warmed per minute across all workers, each a few upstream calls
+    cache_warm_budget_per_minute = int(os.getenv("CACHE_WARM_BUDGET_PER_MINUTE", "10"))
+    popularity_half_life_seconds = float(os.getenv("POPULARITY_HALF_LIFE_SECONDS", "3600"))
+    popularity_max_handles = int(os.getenv("POPULARITY_MAX_HANDLES", "10000"))
+    # Redis writes queued behind responses; beyond this the oldest are dropped
+    cache_write_behind_max_pending = int(os.getenv("CACHE_WRITE_BEHIND_MAX_PENDING", "1000"))
+    l1_cache_max_entries = int(os.getenv("L1_CACHE_MAX_ENTRIES", "512"))
+    l1_cache_max_bytes = int(os.getenv("L1_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    l1_cache_ttl_seconds = int(os.getenv("L1_CACHE_TTL_SECONDS", "10"))
+    cache_invalidation_pubsub = os.getenv("CACHE_INVALIDATION_PUBSUB", "false").lower() in {"1", "true", "yes"}
 
 
 cache_rate_limit_settings = CacheRateLimitSettings()
@@ -0,0 +1,167 @@
+"""In-process filter of handles recently confirmed not to exist.
+
+Only handles GFG itself reported missing are added. On a cache miss, a
+request for a handle in the filter is answered 404 by the middleware, so bad
+handles (typos in badge URLs, path scanners) cost no upstream calls; cached
+responses are still served. Handles go into a Bloom filter, in two
+generations rotated every half ``INVALID_USER_CACHE_TTL_SECONDS`` (or sooner,
+once the current one holds ``capacity`` handles, so a flood of probes cannot
+raise the false-positive rate), so an entry is forgotten within about the TTL
+of the Redis ``invalid:`` marker. Each generation hashes with its own random
+key, so a false positive does not outlive its generation either.
+
+Bloom filters cannot remove an item, so ``discard`` (used by a refresh)
+keeps a set of cleared handles that overrides them until both generations
+that might hold the handle have rotated out.
+
+Workers share what they find through a Redis sorted set of handles scored by
+the time they were confirmed, which ``sync`` polls; cleared handles are
+shared as ``!handle`` members (``!`` is never part of a handle).
+"""
+
+import asyncio
+import hashlib
+import math
+import os
+import time
+from collections.abc import Callable, Iterator
+
+from core.cache import get_redis, redis_enabled
+from core.config import cache_rate_limit_settings as settings
+from core.metrics import increment, register_gauge
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter of strings, sized for ``capacity`` items at ``error_rate``."""
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        capacity = max(capacity, 1)
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(round(self.size / capacity * math.log(2)), 1)
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+        self._key = os.urandom(16)
+
+    def _positions(self, item: str) -> Iterator[int]:
+        # double hashing: the i-th position is h1 + i * h2; lazy, so a miss
+        # usually stops after the first few
+        digest = hashlib.blake2b(item.encode("utf-8"), key=self._key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class InvalidHandles:
+    def __init__(
+        self,
+        capacity: int,
+        error_rate: float,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous = BloomFilter(capacity, error_rate)
+        # handles cleared while the current / previous generation was current
+        self._cleared: set[str] = set()
+        self._previously_cleared: set[str] = set()
+        self._rotated_at = clock()
+        # wall-clock ms of the newest synced entry
+        self.synced_until = (time.time() - ttl_seconds) * 1000
+
+    def __len__(self) -> int:
+        return self._current.count + self._previous.count
+
+    def _rotate_if_due(self) -> None:
+        full = self._current.count >= self.capacity
+        if full or self.clock() - self._rotated_at >= self.ttl_seconds / 2:
+            if full:
+                increment("invalid_handles.early_rotations")
+            self._previous, self._current = self._current, BloomFilter(self.capacity, self.error_rate)
+            self._previously_cleared, self._cleared = self._cleared, set()
+            self._rotated_at = self.clock()
+
+    def add(self, handle: str) -> None:
+        self._rotate_if_due()
+        self._cleared.discard(handle)
+        self._previously_cleared.discard(handle)
+        if handle not in self._current:
+            self._current.add(handle)
+
+    def discard(self, handle: str) -> None:
+        """Stop reporting ``handle``, e.g. after a refresh found it exists."""
+        self._rotate_if_due()
+        self._cleared.add(handle)
+
+    def __contains__(self, handle: str) -> bool:
+        self._rotate_if_due()
+        if handle in self._cleared or handle in self._previously_cleared:
+            return False
+        return handle in self._current or handle in self._previous
+
+    async def share(self, client, key: str, handle: str, cleared: bool = False) -> None:
+        """Tell the other workers about a handle this one confirmed invalid (or ``cleared``)."""
+        if client is None:
+            return
+        now = time.time() * 1000
+        member, superseded = (f"!{handle}", handle) if cleared else (handle, f"!{handle}")
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.zrem(key, superseded)
+                pipe.zadd(key, {member: now})
+                pipe.zremrangebyscore(key, "-inf", now - self.ttl_seconds * 1000)
+                pipe.expire(key, int(self.ttl_seconds))
+                await pipe.execute()
+        except Exception:
+            return
+
+    async def sync(self, client, key: str) -> None:
+        """Apply what other workers confirmed or cleared since the last sync."""
+        try:
+            found = await client.zrangebyscore(key, f"({self.synced_until}", "+inf", withscores=True)
+        except Exception:
+            increment("invalid_handles.sync_errors")
+            return
+        for member, confirmed_at in found:
+            if member.startswith("!"):
+                self.discard(member[1:])
+            else:
+                self.add(member)
+            self.synced_until = max(self.synced_until, confirmed_at)
+
+
+def invalid_handles_key(platform: str) -> str:
+    return f"invalid-handles:{platform}"
+
+
+invalid_handles = InvalidHandles(
+    settings.invalid_handle_filter_capacity,
+    settings.invalid_handle_filter_error_rate,
+    settings.invalid_user_cache_ttl_seconds,
+)
+register_gauge("invalid_handles.entries", lambda: len(invalid_handles))
+
+
+async def sync_invalid_handles_periodically(platform: str, handles: InvalidHandles = invalid_handles) -> None:
+    while True:
+        client = get_redis()
+        if client is not None:
+            await handles.sync(client, invalid_handles_key(platform))
+        await asyncio.sleep(settings.invalid_handle_filter_sync_seconds)
+
+
+def start_invalid_handles_sync(platform: str) -> asyncio.Task | None:
+    if not redis_enabled() or settings.invalid_handle_filter_capacity <= 0:
+        return None
+    return asyncio.create_task(sync_invalid_handles_periodically(platform))
@@ -0,0 +1,142 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+from core.cache import get_pubsub_redis, get_redis
+from core.config import cache_rate_limit_settings as settings
+from core.metrics import register_gauge
+
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+# Tags this process's own invalidation messages so it does not drop the entry
+# it just stored.
+INSTANCE_ID = uuid.uuid4().hex
+# key prefix -> callback for invalidations of per-process state other than the
+# local cache (e.g. the heatmap bases); it gets the key without the prefix.
+_INVALIDATION_HANDLERS: dict[str, Callable[[str], None]] = {}
+
+
+class LocalCache:
+    """In-process LRU bounded by entry count and total size, with per-entry TTLs.
+
+    Sits in front of Redis for the hottest responses. TTLs are kept short so
+    workers converge on their own even without pub/sub invalidation.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.size = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[float, int, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, _, value = entry
+        if expires_at <= self.clock():
+            self.delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, size: int, ttl_seconds: float) -> None:
+        self.delete(key)
+        if ttl_seconds <= 0 or size > self.max_bytes or self.max_entries <= 0:
+            return
+        self._entries[key] = (self.clock() + ttl_seconds, size, value)
+        self.size += size
+        while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self.size -= evicted_size
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+
+def variant_key(key: str, encoding: str | None) -> str:
+    """Local cache key for the copy of ``key`` served with ``encoding``."""
+    return f"{key}:{encoding}" if encoding else key
+
+
+def expanded_key(key: str) -> str:
+    """Local cache key for the expanded body of ``key``'s codec-compacted entry."""
+    return f"{key}:expanded"
+
+
+def delete_variants(cache: LocalCache, key: str) -> None:
+    for encoding in (None, "gzip", "br"):
+        cache.delete(variant_key(key, encoding))
+    cache.delete(expanded_key(key))
+
+
+def register_invalidation_handler(prefix: str, handler: Callable[[str], None]) -> None:
+    _INVALIDATION_HANDLERS[prefix] = handler
+
+
+def invalidate(cache: LocalCache, key: str) -> None:
+    """Apply an invalidation message: a registered handler, or drop ``key``."""
+    for prefix, handler in _INVALIDATION_HANDLERS.items():
+        if key.startswith(prefix):
+            handler(key[len(prefix):])
+            return
+    delete_variants(cache, key)
+
+
+local_cache = LocalCache(settings.l1_cache_max_entries, settings.l1_cache_max_bytes)
+register_gauge("cache.l1.entries", lambda: len(local_cache))
+register_gauge("cache.l1.bytes", lambda: local_cache.size)
+register_gauge("cache.l1.evictions", lambda: local_cache.evictions)
+
+
+async def publish_invalidation(key: str) -> None:
+    """Tell the other workers to drop ``key`` from their local cache."""
+    client = get_redis()
+    if client is None or not settings.cache_invalidation_pubsub:
+        return
+    try:
+        await client.publish(INVALIDATION_CHANNEL, f"{INSTANCE_ID} {key}")
+    except Exception:
+        return
+
+
+async def listen_for_invalidations(cache: LocalCache = local_cache) -> None:
+    """Drop keys other workers announce, reconnecting after Redis errors."""
+    client = get_pubsub_redis()
+    if client is None:
+        return
+    while True:
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            async for message in pubsub.listen():
+                sender, _, key = str(message.get("data", "")).partition(" ")
+                if sender != INSTANCE_ID:
+                    invalidate(cache, key)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
+
+
+def start_invalidation_listener() -> asyncio.Task | None:
+    if not settings.redis_url or not settings.cache_invalidation_pubsub:
+        return None
+    return asyncio.create_task(listen_for_invalidations())
@@ -0,0 +1,115 @@
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+
+from core.cache import get_bytes_redis, get_local_store
+from core.rate_limit import (
+    GCRA_FUNCTION,
+    RateLimit,
+    RateLimitResult,
+    backoff_args,
+    check_limits_locally,
+    hybrid_rate_limits,
+    limit_keys_and_args,
+    limit_result,
+    local_rate_limiter,
+)
+
+
+# KEYS: response key, invalid-user marker key, then the (backoff, violations,
+# tat) triples of the normal limits followed by those of the invalid-user
+# limits. ARGV: backoff base/max, the number of normal and invalid limits,
+# then their limit/window pairs in the same order.
+#
+# A cached response is returned without charging any limit; otherwise the
+# limits matching the marker are checked. Reply: {1, body} or
+# {0, invalid, check_limits reply}.
+_LOOKUP_SCRIPT = GCRA_FUNCTION + """
+local cached = redis.call('GET', KEYS[1])
+if cached then
+    return {1, cached}
+end
+local normal = tonumber(ARGV[3])
+local invalid = tonumber(ARGV[4])
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return {0, 1, check_limits(3 + 3 * normal, 5 + 2 * normal, invalid)}
+end
+return {0, 0, check_limits(3, 5, normal)}
+"""
+
+_script = None
+_script_client = None
+
+
+@dataclass
+class CacheLookup:
+    cached: bytes | None = None
+    invalid: bool = False
+    limited: RateLimitResult = field(default_factory=lambda: RateLimitResult(allowed=True))
+
+
+def _lookup_locally(
+    cache_key: str,
+    invalid_key: str,
+    limits: Sequence[RateLimit],
+    invalid_limits: Sequence[RateLimit],
+) -> CacheLookup:
+    store = get_local_store()
+    if store is None:
+        return CacheLookup()
+    try:
+        cached = store.get(cache_key)
+        if cached is not None:
+            return CacheLookup(cached=cached)
+        invalid = store.get(invalid_key) is not None
+        return CacheLookup(invalid=invalid, limited=check_limits_locally(store, invalid_limits if invalid else limits))
+    except Exception:
+        return CacheLookup()
+
+
+def _lookup_script(client):
+    global _script, _script_client
+    if _script is None or _script_client is not client:
+        _script = client.register_script(_LOOKUP_SCRIPT)
+        _script_client = client
+    return _script
+
+
+async def lookup(
+    cache_key: str,
+    invalid_key: str,
+    limits: Sequence[RateLimit],
+    invalid_limits: Sequence[RateLimit],
+) -> CacheLookup:
+    """Cached response, invalid-user marker and rate limits in one round trip.
+
+    ``limited`` is the result of ``limits``, or of ``invalid_limits`` when the
+    marker is set; nothing is charged on a cache hit. Redis errors read as a
+    miss with every limit allowed, like the separate calls did. Without Redis
+    the same steps run against the local store. In hybrid rate-limit mode the
+    script only reads the entry and the marker; the limits are decided by
+    ``local_rate_limiter`` afterwards.
+    """
+    client = get_bytes_redis()
+    if client is None:
+        return _lookup_locally(cache_key, invalid_key, limits, invalid_limits)
+
+    hybrid = hybrid_rate_limits()
+    script_limits = [] if hybrid else limits
+    script_invalid_limits = [] if hybrid else invalid_limits
+    keys, args = limit_keys_and_args(script_limits)
+    invalid_keys, invalid_args = limit_keys_and_args(script_invalid_limits)
+    try:
+        reply = await _lookup_script(client)(
+            keys=[cache_key, invalid_key, *keys, *invalid_keys],
+            args=[*backoff_args(), len(script_limits), len(script_invalid_limits), *args, *invalid_args],
+        )
+    except Exception:
+        return CacheLookup()
+
+    if reply[0] == 1:
+        return CacheLookup(cached=reply[1])
+    invalid = reply[1] == 1
+    checked = invalid_limits if invalid else limits
+    if hybrid:
+        return CacheLookup(invalid=invalid, limited=await local_rate_limiter.check(client, checked))
+    return CacheLookup(invalid=invalid, limited=limit_result(checked, reply[2]))
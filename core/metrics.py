@@ -0,0 +1,30 @@
+from collections import Counter
+from collections.abc import Callable
+
+
+_counters: Counter[str] = Counter()
+_gauges: dict[str, Callable[[], int | float]] = {}
+
+
+def increment(name: str, amount: int = 1) -> None:
+    _counters[name] += amount
+
+
+def register_gauge(name: str, read: Callable[[], int | float]) -> None:
+    _gauges[name] = read
+
+
+def reset() -> None:
+    _counters.clear()
+
+
+def snapshot() -> dict[str, int | float]:
+    """Counters, gauges and a ``<prefix>.hit_ratio`` for every ``.hit``/``.miss`` pair."""
+    values: dict[str, int | float] = dict(sorted(_counters.items()))
+    for name, read in sorted(_gauges.items()):
+        values[name] = read()
+    for name in [name for name in values if name.endswith(".hit")]:
+        prefix = name[: -len(".hit")]
+        total = values[name] + values.get(f"{prefix}.miss", 0)
+        values[f"{prefix}.hit_ratio"] = round(values[name] / total, 4) if total else 0.0
+    return values
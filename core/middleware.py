@@ -1,19 +1,62 @@
+import asyncio
 import hashlib
 import re
 import json
 from collections.abc import Callable
 
 from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
 from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from core.cache import decode_body, encode_body, get_json, redis_enabled, set_json
+from core.cache import CacheWrite, cache_enabled, get_redis, pack_response, unpack_response
 from core.config import cache_rate_limit_settings as settings
-from core.rate_limit import RateLimitResult, check_rate_limit
-
-
-SKIP_PATHS = {"/", "/docs", "/redoc", "/openapi.json", "/favicon.ico"}
-INVALID_USER_MARKERS = ("user does not exist", "user not found", "not found on", "invalid username")
+from core.compression import accepts_encoding, cache_encoding, compress, decompress, is_compressible
+from core.invalid_handles import invalid_handles, invalid_handles_key
+from core.local_cache import expanded_key, local_cache, variant_key
+from core.lookup import CacheLookup, lookup
+from core.metrics import increment
+from core.popularity import popularity
+from core.rate_limit import RateLimit, RateLimitResult, check_rate_limits
+from core.write_behind import write_behind
+
+
+SKIP_PATHS = {"/", "/docs", "/redoc", "/openapi.json", "/favicon.ico", "/_internal/metrics"}
+CACHED_HEADERS = {b"content-type", b"cache-control", b"vary", b"etag"}
+NOT_MODIFIED_HEADERS = {b"etag", b"cache-control", b"vary", b"x-cache"}
+# (status, raw headers, body) ready to send, as kept in the local cache.
+CachedHit = tuple[int, list[tuple[bytes, bytes]], bytes]
+# Bodies at least this large are compacted in a worker thread (zlib and the
+# codecs' bulk work release the GIL) instead of on the event loop.
+OFFLOAD_COMPACT_BYTES = 64 * 1024
+# Scope flag of requests ``core.warming`` sends through the app.
+WARM_SCOPE_KEY = "gfg.cache_warm"
+# What a GFG handle can look like; anything else is rejected without a lookup.
+VALID_HANDLE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+INVALID_USER_MARKERS = (
+    "user does not exist",
+    "user not found",
+    "not found on",
+    "profile information not found",
+    "invalid username",
+)
+
+# name -> (compact, expand) for storing response bodies in a smaller form. A
+# route opts in by setting ``request.state.cache_codec``; ``compact`` raises
+# ValueError for bodies it cannot reproduce exactly, which are stored as-is.
+_CACHE_CODECS: dict[str, tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {}
+# Media types some routes serve only when asked for via Accept. Requests that
+# ask for one get their own cache entry.
+_NEGOTIATED_MEDIA_TYPES: list[str] = []
+
+
+def register_cache_codec(name: str, compact: Callable[[bytes], bytes], expand: Callable[[bytes], bytes]) -> None:
+    _CACHE_CODECS[name] = (compact, expand)
+
+
+def register_negotiated_media_type(media_type: str) -> None:
+    if media_type not in _NEGOTIATED_MEDIA_TYPES:
+        _NEGOTIATED_MEDIA_TYPES.append(media_type)
 
 
 def _client_ip(request: Request) -> str:
@@ -40,26 +83,85 @@ def _query_string(request: Request) -> str:
     return "&".join(f"{key}={value}" for key, value in pairs)
 
 
+def _negotiated_variant(request: Request) -> str | None:
+    accept = request.headers.get("accept", "")
+    return next((media_type for media_type in _NEGOTIATED_MEDIA_TYPES if media_type in accept), None)
+
+
+def _accepted_encoding(request: Request) -> str | None:
+    """The cache's content encoding if this client accepts it."""
+    encoding = cache_encoding()
+    if encoding is None or not accepts_encoding(request.headers.get("accept-encoding", ""), encoding):
+        return None
+    return encoding
+
+
+def _etag(body: bytes) -> str:
+    # truncated SHA-256: hardware-accelerated, over twice as fast as blake2b here
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def _encoded_etag(etag: bytes, encoding: str) -> bytes:
+    """Strong ETag of the ``encoding``-coded representation of ``etag``'s body."""
+    return etag[:-1] + f'-{encoding}"'.encode("latin-1")
+
+
+def _etag_matches(if_none_match: str | None, etag: bytes | str | None) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 requires for it)."""
+    if not if_none_match or not etag:
+        return False
+    if isinstance(etag, bytes):
+        etag = etag.decode("latin-1")
+    etag = etag.removeprefix("W/")
+    return any(
+        candidate == "*" or candidate.removeprefix("W/") == etag
+        for candidate in (item.strip() for item in if_none_match.split(","))
+    )
+
+
+async def _send_not_modified(send: Send, headers: list[tuple[bytes, bytes]]) -> None:
+    kept = [(name, value) for name, value in headers if name.lower() in NOT_MODIFIED_HEADERS]
+    await send({"type": "http.response.start", "status": 304, "headers": kept})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def handle_index_key(platform: str, handle: str) -> str:
+    """Set of every cache key stored for ``handle`` (see ``core.cache.purge_index``)."""
+    return f"index:{platform}:{handle.lower()}"
+
+
 def _cache_key(platform: str, request: Request) -> str:
     raw = f"{request.method}:{request.url.path}:{_query_string(request)}"
+    variant = _negotiated_variant(request)
+    if variant:
+        raw = f"{raw}:{variant}"
     digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()
     return f"cache:{platform}:{digest}"
 
 
 def _is_invalid_user(status_code: int, body: bytes) -> bool:
-    if status_code == 404:
-        return True
+    """Whether the response reports that GFG does not know the user.
+
+    A 404 alone is not enough: an unknown route under a real handle is one too.
+    """
+    try:
+        text = body.decode("utf-8")
+    except UnicodeDecodeError:
+        return False
     try:
-        payload = json.loads(body.decode("utf-8"))
-    except (UnicodeDecodeError, ValueError):
+        payload = json.loads(text)
+    except ValueError:
+        # e.g. the stats card's error SVG, which renders the message
+        return status_code == 404 and any(marker in text.lower() for marker in INVALID_USER_MARKERS)
+    if not isinstance(payload, dict):
         return False
 
     message = str(payload.get("message") or payload.get("detail") or "").lower()
     status = str(payload.get("status") or "").lower()
-    return status == "error" and any(marker in message for marker in INVALID_USER_MARKERS)
+    return (status_code == 404 or status == "error") and any(marker in message for marker in INVALID_USER_MARKERS)
 
 
-def _rate_limited_response(result: RateLimitResult) -> JSONResponse:
+def rate_limited_response(result: RateLimitResult) -> JSONResponse:
     headers = {
         "Retry-After": str(result.retry_after),
         "X-RateLimit-Limit": str(result.limit or 0),
@@ -79,7 +181,15 @@ def _rate_limited_response(result: RateLimitResult) -> JSONResponse:
 
 
 
-def _ttl_from_cache_control(headers: dict, default: int) -> int:
+def _invalid_user_response(cache_status: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=404,
+        content={"status": "error", "message": "User does not exist"},
+        headers={"X-Cache": cache_status},
+    )
+
+
+def _ttl_from_cache_control(headers, default: int) -> int:
     """Prefer response Cache-Control max-age when present (e.g. SVG 24h)."""
     cache_control = headers.get("cache-control") or headers.get("Cache-Control") or ""
     match = re.search(r"max-age=(\d+)", cache_control, re.IGNORECASE)
@@ -88,117 +198,321 @@ def _ttl_from_cache_control(headers: dict, default: int) -> int:
     return default
 
 
-class CacheRateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, platform: str) -> None:
-        super().__init__(app)
+class CacheRateLimitMiddleware:
+    """Response cache plus per-IP / per-handle rate limits, as plain ASGI.
+
+    On a miss a 200 body is collected in full and stored first, then sent the
+    way a hit on the new entry would be (same ETag and content encoding) with
+    the downstream headers plus ``X-Cache``; other statuses are forwarded as
+    they arrive. Entries are binary (``core.cache.pack_response``) and
+    compressed when that helps, so a hit is sent as stored to clients
+    accepting the entry's encoding.
+    """
+
+    def __init__(self, app: ASGIApp, platform: str) -> None:
+        self.app = app
         self.platform = platform.lower()
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        if request.method != "GET" or not redis_enabled() or request.url.path in SKIP_PATHS:
-            return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET" or scope["path"] in SKIP_PATHS:
+            await self.app(scope, receive, send)
+            return
 
+        request = Request(scope)
         handle = _handle_from_path(request.url.path)
-        if handle is None:
-            return await call_next(request)
+        if handle is not None and not VALID_HANDLE.match(handle):
+            increment("invalid_handles.malformed")
+            await _invalid_user_response("REJECTED")(scope, receive, send)
+            return
+        if handle is None or not cache_enabled():
+            await self.app(scope, receive, send)
+            return
 
         key = _cache_key(self.platform, request)
-        cached = await get_json(key)
-        if cached is not None:
-            headers = dict(cached.get("headers") or {})
-            headers["X-Cache"] = "HIT"
-            headers.setdefault("Cache-Control", f"public, max-age={settings.cache_ttl_seconds}")
-            return Response(
-                content=decode_body(cached["body"]),
-                status_code=int(cached["status_code"]),
-                headers=headers,
-                media_type=cached.get("media_type") or "application/json",
-            )
-
+        encoding = _accepted_encoding(request)
         invalid_key = f"invalid:{self.platform}:{handle}"
-        invalid_cached = await get_json(invalid_key)
-        if invalid_cached is not None:
-            limited = await self._check_invalid_limits(request, handle)
-            if not limited.allowed:
-                return _rate_limited_response(limited)
-            return JSONResponse(
-                status_code=404,
-                content={"status": "error", "message": "User does not exist"},
-                headers={"X-Cache": "NEGATIVE-HIT"},
-            )
-
-        limited = await self._check_limits(request, handle)
-        if not limited.allowed:
-            return _rate_limited_response(limited)
-
-        response = await call_next(request)
-        body = b""
-        async for chunk in response.body_iterator:
-            body += chunk
-
-        headers = dict(response.headers)
-        headers.pop("content-length", None)
-        headers["X-Cache"] = "MISS"
-
-        invalid_user = _is_invalid_user(response.status_code, body)
-        if invalid_user:
-            await set_json(invalid_key, {"invalid": True}, settings.invalid_user_cache_ttl_seconds)
-        elif response.status_code == 200:
-            headers.setdefault("Cache-Control", f"public, max-age={settings.cache_ttl_seconds}")
+        if scope.get(WARM_SCOPE_KEY):
+            # internal re-render (core.warming): replace the entry, unlimited
+            await self.app(scope, receive, self._caching_send(request, send, key, invalid_key, encoding))
+            return
+        if_none_match = request.headers.get("if-none-match")
+        hit = local_cache.get(variant_key(key, encoding))
+        if hit is not None:
+            increment("cache.l1.hit")
+            self._record_popularity(scope)
+            await self._send_hit(send, hit, if_none_match)
+            return
+        increment("cache.l1.miss")
+
+        invalid_limits = self._invalid_limits(request, handle)
+        # A filtered handle is answered 404 on a miss, so that miss is charged
+        # like a negative-cache hit; a cached response still wins over the filter.
+        filtered = settings.invalid_handle_filter_capacity > 0 and handle in invalid_handles
+        limits = invalid_limits if filtered else self._limits(request, handle)
+        found = await lookup(key, invalid_key, limits, invalid_limits)
+        if found.cached is not None:
+            hit = self._cached_hit(key, found.cached, encoding)
+            if hit is not None:
+                increment("cache.l2.hit")
+                self._record_popularity(scope)
+                local_cache.set(variant_key(key, encoding), hit, len(hit[2]), settings.l1_cache_ttl_seconds)
+                await self._send_hit(send, hit, if_none_match)
+                return
+            # unreadable entry: the lookup did not charge the limits
+            found.limited = await check_rate_limits(limits)
+        increment("cache.l2.miss")
+        if filtered and not found.invalid:
+            increment("invalid_handles.filtered")
+            found.invalid = True
+
+        response = self._early_response(found)
+        if response is not None:
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, self._caching_send(request, send, key, invalid_key, encoding))
+
+    @staticmethod
+    def _record_popularity(scope: Scope) -> None:
+        """Count a served 200 towards warming; 404s and rejections never are."""
+        if settings.cache_warm_top_n > 0 and not scope.get(WARM_SCOPE_KEY):
+            # as in the path: cache keys (and so warming) are case-sensitive
+            popularity.record(scope["path"].strip("/").split("/", 1)[0])
+
+    @staticmethod
+    async def _send_hit(send: Send, hit: CachedHit, if_none_match: str | None) -> None:
+        status_code, headers, body = hit
+        if if_none_match and _etag_matches(if_none_match, next((v for n, v in headers if n == b"etag"), None)):
+            increment("cache.not_modified")
+            await _send_not_modified(send, headers)
+            return
+        await send({"type": "http.response.start", "status": status_code, "headers": list(headers)})
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    def _hit(status_code: int, headers: list[tuple[bytes, bytes]], body: bytes) -> CachedHit:
+        headers = [*headers, (b"content-length", str(len(body)).encode("latin-1")), (b"x-cache", b"HIT")]
+        return status_code, headers, body
+
+    @staticmethod
+    def _expanded(key: str, codec: str, headers: list[tuple[bytes, bytes]], body: bytes) -> bytes:
+        """The codec-expanded body of ``key``'s entry, expanded once per worker.
+
+        The expansion is kept in the local cache under the entry's ETag, so a
+        replaced entry is never answered with a stale body.
+        """
+        etag = next((value for name, value in headers if name == b"etag"), None)
+        memo = local_cache.get(expanded_key(key))
+        if memo is not None and etag is not None and memo[0] == etag:
+            increment("cache.codec.reused")
+            return memo[1]
+        expanded = _CACHE_CODECS[codec][1](body)
+        if etag is not None:
+            local_cache.set(expanded_key(key), (etag, expanded), len(expanded), settings.cache_ttl_seconds)
+        return expanded
+
+    @classmethod
+    def _cached_hit(cls, key: str, value: bytes, encoding: str | None) -> CachedHit | None:
+        """Status, raw headers and body of a cached entry for a client accepting
+        ``encoding``; ``None`` if unreadable.
+
+        Compressed entries go out as stored when the client accepts their
+        encoding and are decompressed otherwise.
+        """
+        try:
+            status_code, headers, body, codec = unpack_response(value)
+            if codec is not None:
+                body = cls._expanded(key, codec, headers, body)
+            stored = next((value.decode("latin-1") for name, value in headers if name == b"content-encoding"), None)
+            if stored is not None and stored != encoding:
+                body = decompress(body, stored)
+                suffix = f'-{stored}"'.encode("latin-1")
+                headers = [
+                    (name, value[: -len(suffix)] + b'"' if name == b"etag" and value.endswith(suffix) else value)
+                    for name, value in headers
+                    if name != b"content-encoding"
+                ]
+        except (KeyError, ValueError):
+            return None
+        return cls._hit(status_code, headers, body)
+
+    @staticmethod
+    def _early_response(found: CacheLookup) -> Response | None:
+        """A rate-limited or negative-cached response; ``None`` to call the app."""
+        if not found.limited.allowed:
+            return rate_limited_response(found.limited)
+        if found.invalid:
+            return _invalid_user_response("NEGATIVE-HIT")
+        return None
+
+    def _caching_send(
+        self,
+        request: Request,
+        send: Send,
+        key: str,
+        invalid_key: str,
+        encoding: str | None,
+    ) -> Send:
+        status_code = 0
+        headers = MutableHeaders()
+        chunks: list[bytes] = []
+        held_start: Message | None = None
+        if_none_match = request.headers.get("if-none-match")
+
+        async def caching_send(message: Message) -> None:
+            nonlocal status_code, headers, held_start
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(raw=list(message.get("headers", [])))
+                headers["X-Cache"] = "MISS"
+                message = {**message, "headers": headers.raw}
+                if status_code == 200:
+                    headers.setdefault("Cache-Control", f"public, max-age={settings.cache_ttl_seconds}")
+                    if cache_encoding() is not None and is_compressible(headers.get("content-type", "")):
+                        headers.add_vary_header("Accept-Encoding")
+                    # held until the whole body is in: it goes out as the stored
+                    # entry will be served, ETag and encoding included
+                    held_start = message
+                    return
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                final = not message.get("more_body", False)
+                if held_start is not None:
+                    if not final:
+                        return
+                    hit = await self._store(request, status_code, headers, b"".join(chunks), key, invalid_key, encoding)
+                    await self._send_miss(send, held_start, headers, hit, if_none_match)
+                    return
+
+            await send(message)
+
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                await self._store(request, status_code, headers, b"".join(chunks), key, invalid_key, encoding)
+
+        return caching_send
+
+    @staticmethod
+    async def _send_miss(
+        send: Send,
+        start: Message,
+        headers: MutableHeaders,
+        hit: CachedHit,
+        if_none_match: str | None,
+    ) -> None:
+        """Send a fresh 200 with the body, ETag and encoding a hit on its entry gets."""
+        _, stored_headers, body = hit
+        for name, value in stored_headers:
+            if name in (b"etag", b"content-encoding"):
+                headers[name.decode("latin-1")] = value.decode("latin-1")
+        headers["Content-Length"] = str(len(body))
+        if _etag_matches(if_none_match, headers["etag"]):
+            increment("cache.not_modified")
+            await _send_not_modified(send, headers.raw)
+            return
+        await send({**start, "headers": headers.raw})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _store(
+        self,
+        request: Request,
+        status_code: int,
+        headers: MutableHeaders,
+        body: bytes,
+        key: str,
+        invalid_key: str,
+        encoding: str | None,
+    ) -> CachedHit | None:
+        """Store a response; for a 200, returns it as a hit for ``encoding`` would be."""
+        handle = _handle_from_path(request.url.path) or ""
+        if _is_invalid_user(status_code, body):
+            marker = json.dumps({"invalid": True}, separators=(",", ":")).encode("utf-8")
+            await write_behind.write(CacheWrite(invalid_key, marker, settings.invalid_user_cache_ttl_seconds))
+            if settings.invalid_handle_filter_capacity > 0:
+                invalid_handles.add(handle)
+                write_behind.defer(invalid_handles.share(get_redis(), invalid_handles_key(self.platform), handle))
+        elif status_code == 200:
+            self._record_popularity(request.scope)
             ttl = _ttl_from_cache_control(headers, settings.cache_ttl_seconds)
-            await set_json(key, self._cached_response(response, body), ttl)
-
-        return Response(
-            content=body,
-            status_code=response.status_code,
-            headers=headers,
-            media_type=response.media_type,
-            background=response.background,
-        )
-
-    async def _check_limits(self, request: Request, handle: str) -> RateLimitResult:
-        ip = _client_ip(request)
-        ip_result = await check_rate_limit(
-            f"ip:{self.platform}:{ip}",
-            settings.rate_limit_ip_requests,
-            settings.rate_limit_window_seconds,
-            "ip",
-        )
-        if not ip_result.allowed:
-            return ip_result
-        return await check_rate_limit(
-            f"handle:{self.platform}:{handle}",
-            settings.rate_limit_handle_requests,
-            settings.rate_limit_window_seconds,
-            "handle",
-        )
-
-    async def _check_invalid_limits(self, request: Request, handle: str) -> RateLimitResult:
-        ip = _client_ip(request)
-        ip_result = await check_rate_limit(
-            f"invalid-ip:{self.platform}:{ip}",
-            settings.invalid_rate_limit_ip_requests,
-            settings.invalid_rate_limit_window_seconds,
-            "invalid-ip",
-        )
-        if not ip_result.allowed:
-            return ip_result
-        return await check_rate_limit(
-            f"invalid-handle:{self.platform}:{handle}",
-            settings.invalid_rate_limit_handle_requests,
-            settings.invalid_rate_limit_window_seconds,
-            "invalid-handle",
-        )
+            codec = getattr(request.state, "cache_codec", None)
+            kept = self._kept_headers(headers)
+            if "etag" not in headers:
+                kept.append((b"etag", _etag(body).encode("latin-1")))
+            if len(body) >= OFFLOAD_COMPACT_BYTES:
+                stored_headers, stored_body, codec = await asyncio.to_thread(self._compact, kept, body, codec)
+            else:
+                stored_headers, stored_body, codec = self._compact(kept, body, codec)
+            if encoding is not None and (b"content-encoding", encoding.encode("latin-1")) in stored_headers:
+                hit = self._hit(status_code, stored_headers, stored_body)
+            else:
+                hit = self._hit(status_code, kept, body)
+            local_cache.set(variant_key(key, encoding), hit, len(hit[2]), min(ttl, settings.l1_cache_ttl_seconds))
+            if codec is not None:
+                # the body the codec's ``expand`` would rebuild on every hit
+                etag = next(value for name, value in stored_headers if name == b"etag")
+                local_cache.set(expanded_key(key), (etag, body), len(body), ttl)
+            entry = pack_response(status_code, stored_headers, stored_body, codec)
+            index_key = handle_index_key(self.platform, handle)
+            await write_behind.write(CacheWrite(key, entry, ttl, index_key), announce=True)
+            return hit
+        return None
+
+    def _limits(self, request: Request, handle: str) -> list[RateLimit]:
+        return [
+            (
+                f"ip:{self.platform}:{_client_ip(request)}",
+                settings.rate_limit_ip_requests,
+                settings.rate_limit_window_seconds,
+                "ip",
+            ),
+            (
+                f"handle:{self.platform}:{handle}",
+                settings.rate_limit_handle_requests,
+                settings.rate_limit_window_seconds,
+                "handle",
+            ),
+        ]
+
+    def _invalid_limits(self, request: Request, handle: str) -> list[RateLimit]:
+        return [
+            (
+                f"invalid-ip:{self.platform}:{_client_ip(request)}",
+                settings.invalid_rate_limit_ip_requests,
+                settings.invalid_rate_limit_window_seconds,
+                "invalid-ip",
+            ),
+            (
+                f"invalid-handle:{self.platform}:{handle}",
+                settings.invalid_rate_limit_handle_requests,
+                settings.invalid_rate_limit_window_seconds,
+                "invalid-handle",
+            ),
+        ]
+
+    @staticmethod
+    def _kept_headers(headers: MutableHeaders) -> list[tuple[bytes, bytes]]:
+        kept = [(name, value) for name, value in headers.raw if name.lower() in CACHED_HEADERS]
+        if "content-type" not in headers:
+            kept.append((b"content-type", b"application/json"))
+        return kept
 
     @staticmethod
-    def _cached_response(response: Response, body: bytes) -> dict:
-        headers = {
-            key: value
-            for key, value in response.headers.items()
-            if key.lower() in {"content-type", "cache-control"}
-        }
-        return {
-            "status_code": response.status_code,
-            "headers": headers,
-            "media_type": response.media_type or "application/json",
-            "body": encode_body(body),
-        }
+    def _compact(
+        kept: list[tuple[bytes, bytes]],
+        body: bytes,
+        codec: str | None,
+    ) -> tuple[list[tuple[bytes, bytes]], bytes, str | None]:
+        """Headers, body and codec to store: the route's codec if it applies,
+        otherwise the body compressed with ``cache_encoding()`` when that helps."""
+        if codec in _CACHE_CODECS:
+            try:
+                return kept, _CACHE_CODECS[codec][0](body), codec
+            except ValueError:
+                pass
+        encoding = cache_encoding()
+        content_type = next((value.decode("latin-1") for name, value in kept if name == b"content-type"), "")
+        if encoding is not None and len(body) >= settings.cache_compression_min_bytes and is_compressible(content_type):
+            compressed = compress(body, encoding)
+            if len(compressed) < len(body):
+                headers = [(name, _encoded_etag(value, encoding) if name == b"etag" else value) for name, value in kept]
+                return [*headers, (b"content-encoding", encoding.encode("latin-1"))], compressed, None
+        return kept, body, None
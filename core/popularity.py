@@ -0,0 +1,114 @@
+"""Decaying per-handle request counts, to pick the handles worth keeping warm.
+
+Forward decay: a request at time ``t`` adds ``2 ** ((t - landmark) /
+half_life)`` to its handle's score, so each half-life doubles the weight of
+new requests instead of rewriting every old score. Once weights pass
+``2 ** 32`` the scores are scaled down and the landmark moves to now.
+
+The middleware only bumps an in-process counter; ``flush`` adds the batch to
+a Redis sorted set shared by all workers (or to local scores without Redis).
+"""
+
+import heapq
+import time
+from collections import Counter
+from collections.abc import Callable
+
+from core.config import cache_rate_limit_settings as settings
+from core.metrics import increment, register_gauge
+
+
+# KEYS: sorted set, landmark. ARGV: half-life seconds, max members, then
+# (handle, count) pairs.
+_RECORD_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local landmark = tonumber(redis.call('GET', KEYS[2]))
+if not landmark then
+    landmark = now
+    redis.call('SET', KEYS[2], string.format('%.6f', now))
+end
+local exponent = (now - landmark) / tonumber(ARGV[1])
+if exponent > 32 then
+    redis.call('ZUNIONSTORE', KEYS[1], 1, KEYS[1], 'WEIGHTS', 2 ^ -exponent)
+    redis.call('SET', KEYS[2], string.format('%.6f', now))
+    exponent = 0
+end
+local weight = 2 ^ exponent
+for i = 3, #ARGV, 2 do
+    redis.call('ZINCRBY', KEYS[1], tonumber(ARGV[i + 1]) * weight, ARGV[i])
+end
+redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -tonumber(ARGV[2]) - 1)
+"""
+
+_script = None
+_script_client = None
+
+
+def _record_script(client):
+    global _script, _script_client
+    if _script is None or _script_client is not client:
+        _script = client.register_script(_RECORD_SCRIPT)
+        _script_client = client
+    return _script
+
+
+class PopularityTracker:
+    def __init__(self, half_life_seconds: float, max_members: int, clock: Callable[[], float] = time.time) -> None:
+        self.half_life_seconds = half_life_seconds
+        self.max_members = max_members
+        self.clock = clock
+        self.pending: Counter[str] = Counter()
+        # forward-decayed scores when there is no Redis
+        self.scores: dict[str, float] = {}
+        self.landmark = clock()
+
+    def record(self, handle: str) -> None:
+        self.pending[handle] += 1
+
+    async def flush(self, client, key: str) -> None:
+        """Add the pending counts to the scores under ``key`` (local ones when ``client`` is None)."""
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, Counter()
+        if client is None:
+            self._add_locally(batch)
+            return
+        args = [self.half_life_seconds, self.max_members]
+        for handle, count in batch.items():
+            args.extend([handle, count])
+        try:
+            await _record_script(client)(keys=[key, f"{key}:landmark"], args=args)
+        except Exception:
+            increment("popularity.flush_errors")
+
+    async def top(self, client, key: str, count: int) -> list[str]:
+        """The ``count`` highest-scored handles, most popular first."""
+        if client is None:
+            return heapq.nlargest(count, self.scores, key=self.scores.__getitem__)
+        try:
+            return list(await client.zrevrange(key, 0, count - 1))
+        except Exception:
+            return []
+
+    def _add_locally(self, batch: Counter[str]) -> None:
+        now = self.clock()
+        exponent = (now - self.landmark) / self.half_life_seconds
+        if exponent > 32:
+            scale = 2.0 ** -exponent
+            self.scores = {handle: score * scale for handle, score in self.scores.items()}
+            self.landmark, exponent = now, 0.0
+        weight = 2.0 ** exponent
+        for handle, count in batch.items():
+            self.scores[handle] = self.scores.get(handle, 0.0) + count * weight
+        if len(self.scores) > self.max_members:
+            kept = heapq.nlargest(self.max_members, self.scores.items(), key=lambda item: item[1])
+            self.scores = dict(kept)
+
+
+def popularity_key(platform: str) -> str:
+    return f"popularity:{platform}"
+
+
+popularity = PopularityTracker(settings.popularity_half_life_seconds, settings.popularity_max_handles)
+register_gauge("popularity.pending", lambda: sum(popularity.pending.values()))
@@ -1,8 +1,89 @@
+import asyncio
+import math
 import time
+from collections.abc import Sequence
 from dataclasses import dataclass
 
-from core.cache import get_redis
+from core.cache import LocalStore, get_local_store, get_redis, redis_enabled
+from core.cache_backends import MemoryStore
 from core.config import cache_rate_limit_settings as settings
+from core.metrics import increment, register_gauge
+
+
+# key, limit, window_seconds, label
+RateLimit = tuple[str, int, int, str]
+
+# GCRA over ``count`` (backoff, violations, tat) key triples starting at
+# KEYS[first_key], with limit and window seconds pairs starting at
+# ARGV[first_arg], plus the escalating backoff of repeated violations; ARGV[1]
+# and ARGV[2] are the backoff base and max seconds. Stops at the first limit
+# that denies, so later ones are not charged. Times are server milliseconds.
+#
+# Returns {allowed, index (1-based) of the deciding limit, retry_after
+# seconds, remaining, reset_at ms}.
+GCRA_FUNCTION = """
+local function check_limits(first_key, first_arg, count)
+    local time = redis.call('TIME')
+    local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+    local backoff_base = tonumber(ARGV[1])
+    local backoff_max = tonumber(ARGV[2])
+    local reply = {1, 0, 0, 0, now}
+
+    for i = 1, count do
+        local k = first_key + 3 * (i - 1)
+        local a = first_arg + 2 * (i - 1)
+        local backoff_key, violations_key, tat_key = KEYS[k], KEYS[k + 1], KEYS[k + 2]
+        local limit = tonumber(ARGV[a])
+        local window = tonumber(ARGV[a + 1]) * 1000
+
+        local backoff_ttl = redis.call('PTTL', backoff_key)
+        if backoff_ttl > 0 then
+            return {0, i, math.ceil(backoff_ttl / 1000), 0, now + backoff_ttl}
+        end
+
+        local emission = window / math.max(limit, 1)
+        local tat = math.max(tonumber(redis.call('GET', tat_key)) or now, now)
+        local new_tat = tat + emission
+        if limit < 1 or new_tat - window > now then
+            local violations = redis.call('INCR', violations_key)
+            redis.call('EXPIRE', violations_key, backoff_max)
+            local backoff = math.min(backoff_base * 2 ^ (violations - 1), backoff_max)
+            redis.call('SET', backoff_key, '1', 'EX', backoff)
+            return {0, i, backoff, 0, now + backoff * 1000}
+        end
+
+        redis.call('SET', tat_key, string.format('%.3f', new_tat), 'PX', math.ceil(new_tat - now))
+        redis.call('DEL', violations_key)
+        reply = {1, i, 0, math.floor((window - (new_tat - now)) / emission), new_tat}
+    end
+    return reply
+end
+"""
+
+_GCRA_SCRIPT = GCRA_FUNCTION + "return check_limits(1, 3, #KEYS / 3)"
+
+# KEYS: GCRA tat keys. ARGV: (admitted, emission ms) pairs in the same order.
+# Adds requests admitted by a worker to each shared GCRA and replies with every
+# key's backlog (tat - now) in ms, so workers need not share Redis' clock.
+_SYNC_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local reply = {}
+for i = 1, #KEYS do
+    local tat = math.max(tonumber(redis.call('GET', KEYS[i])) or now, now)
+    tat = tat + tonumber(ARGV[2 * i - 1]) * tonumber(ARGV[2 * i])
+    if tat > now then
+        redis.call('SET', KEYS[i], string.format('%.3f', tat), 'PX', math.ceil(tat - now))
+    end
+    reply[i] = math.floor(tat - now)
+end
+return reply
+"""
+
+_script = None
+_script_client = None
+_sync_script = None
+_sync_script_client = None
 
 
 @dataclass
@@ -15,39 +96,195 @@ class RateLimitResult:
     reset_at: int | None = None
 
 
-async def check_rate_limit(key: str, limit: int, window_seconds: int, label: str) -> RateLimitResult:
+def _gcra_script(client):
+    global _script, _script_client
+    if _script is None or _script_client is not client:
+        _script = client.register_script(_GCRA_SCRIPT)
+        _script_client = client
+    return _script
+
+
+def _registered_sync_script(client):
+    global _sync_script, _sync_script_client
+    if _sync_script is None or _sync_script_client is not client:
+        _sync_script = client.register_script(_SYNC_SCRIPT)
+        _sync_script_client = client
+    return _sync_script
+
+
+def limit_keys_and_args(limits: Sequence[RateLimit]) -> tuple[list[str], list[int]]:
+    """KEYS and limit/window ARGV for ``GCRA_FUNCTION``'s ``check_limits``."""
+    keys: list[str] = []
+    args: list[int] = []
+    for key, limit, window_seconds, _ in limits:
+        keys.extend([f"backoff:{key}", f"violations:{key}", f"gcra:{key}"])
+        args.extend([limit, window_seconds])
+    return keys, args
+
+
+def backoff_args() -> list[int]:
+    return [settings.rate_limit_backoff_base_seconds, settings.rate_limit_backoff_max_seconds]
+
+
+def limit_result(limits: Sequence[RateLimit], reply: Sequence[int]) -> RateLimitResult:
+    allowed, index, retry_after, remaining, reset_at_ms = reply
+    if not int(index):
+        return RateLimitResult(allowed=True)
+    _, limit, _, label = limits[int(index) - 1]
+    reset_at = -(-int(reset_at_ms) // 1000)
+    return RateLimitResult(bool(allowed), int(retry_after), label, limit, int(remaining), reset_at)
+
+
+def check_limits_locally(store: LocalStore, limits: Sequence[RateLimit]) -> RateLimitResult:
+    """``GCRA_FUNCTION`` for a local store, on the same keys."""
+    backoff_base, backoff_max = backoff_args()
+    result = RateLimitResult(allowed=True)
+    with store.transaction():
+        now = time.time() * 1000
+        for key, limit, window_seconds, label in limits:
+            backoff_key, violations_key, tat_key = f"backoff:{key}", f"violations:{key}", f"gcra:{key}"
+            backoff_ttl = store.ttl(backoff_key)
+            if backoff_ttl > 0:
+                retry_after = math.ceil(backoff_ttl)
+                return RateLimitResult(False, retry_after, label, limit, 0, math.ceil(now / 1000 + backoff_ttl))
+
+            window = window_seconds * 1000
+            emission = window / max(limit, 1)
+            tat = max(float(store.get(tat_key) or now), now)
+            new_tat = tat + emission
+            if limit < 1 or new_tat - window > now:
+                violations = int(store.get(violations_key) or 0) + 1
+                store.set(violations_key, str(violations).encode(), backoff_max)
+                backoff = min(backoff_base * 2 ** (violations - 1), backoff_max)
+                store.set(backoff_key, b"1", backoff)
+                return RateLimitResult(False, backoff, label, limit, 0, math.ceil(now / 1000) + backoff)
+
+            store.set(tat_key, f"{new_tat:.3f}".encode(), (new_tat - now) / 1000)
+            store.delete(violations_key)
+            remaining = math.floor((window - (new_tat - now)) / emission)
+            result = RateLimitResult(True, 0, label, limit, remaining, math.ceil(new_tat / 1000))
+    return result
+
+
+class LocalRateLimiter:
+    """``check_limits_locally`` in process memory, synced to Redis in batches.
+
+    Requests are admitted against a local copy of each limit's GCRA state.
+    ``sync`` adds the admissions since the last sync to the shared state in
+    Redis (the same ``gcra:`` keys the exact script uses) and adopts the
+    result, so limits stay roughly global across workers. A key that has
+    ``rate_limit_sync_max_pending`` unsynced admissions syncs before admitting
+    more, which bounds how far one worker can run ahead of the others.
+    Backoffs after violations stay local to the worker.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.store = MemoryStore(max_entries)
+        # key -> (admitted since the last sync, emission interval ms)
+        self.pending: dict[str, tuple[int, float]] = {}
+        self._lock = asyncio.Lock()
+
+    async def check(self, client, limits: Sequence[RateLimit]) -> RateLimitResult:
+        max_pending = settings.rate_limit_sync_max_pending
+        if any(self.pending.get(key, (0, 0.0))[0] >= max_pending for key, _, _, _ in limits):
+            await self.sync(client)
+
+        result = check_limits_locally(self.store, limits)
+        if result.allowed:
+            charged = len(limits)
+        else:
+            charged = next(index for index, limit in enumerate(limits) if limit[3] == result.limited_by)
+        for key, limit, window_seconds, _ in limits[:charged]:
+            admitted = self.pending.get(key, (0, 0.0))[0]
+            self.pending[key] = (admitted + 1, window_seconds * 1000 / max(limit, 1))
+        return result
+
+    async def sync(self, client) -> None:
+        """Push pending admissions to Redis and take over the shared backlogs.
+
+        Errors drop the batch: limits then hold per worker until Redis is back.
+        """
+        async with self._lock:
+            if not self.pending:
+                return
+            batch, self.pending = self.pending, {}
+            args = [value for admitted, emission in batch.values() for value in (admitted, f"{emission:.3f}")]
+            try:
+                backlogs = await _registered_sync_script(client)(keys=[f"gcra:{key}" for key in batch], args=args)
+            except Exception:
+                increment("rate_limit.sync_errors")
+                return
+            increment("rate_limit.syncs")
+
+            now = time.time() * 1000
+            with self.store.transaction():
+                for (key, (_, emission)), backlog in zip(batch.items(), backlogs):
+                    # admissions made while the script ran are not in Redis yet
+                    tat = now + int(backlog) + self.pending.get(key, (0, 0.0))[0] * emission
+                    if tat > now:
+                        self.store.set(f"gcra:{key}", f"{tat:.3f}".encode(), (tat - now) / 1000)
+                    else:
+                        self.store.delete(f"gcra:{key}")
+
+
+local_rate_limiter = LocalRateLimiter(settings.cache_memory_max_entries)
+register_gauge("rate_limit.pending", lambda: sum(admitted for admitted, _ in local_rate_limiter.pending.values()))
+
+
+def hybrid_rate_limits() -> bool:
+    return settings.rate_limit_mode == "hybrid"
+
+
+async def sync_rate_limits_periodically(limiter: LocalRateLimiter = local_rate_limiter) -> None:
+    try:
+        while True:
+            await asyncio.sleep(settings.rate_limit_sync_interval_seconds)
+            client = get_redis()
+            if client is not None:
+                await limiter.sync(client)
+    finally:
+        client = get_redis()
+        if client is not None:
+            await limiter.sync(client)
+
+
+def start_rate_limit_sync() -> asyncio.Task | None:
+    if not redis_enabled() or not hybrid_rate_limits():
+        return None
+    return asyncio.create_task(sync_rate_limits_periodically())
+
+
+async def check_rate_limits(limits: Sequence[RateLimit]) -> RateLimitResult:
+    """Check and charge several limits atomically, in one round trip.
+
+    Each limit is a GCRA with a burst of ``limit`` requests that refills
+    evenly over ``window_seconds``. Going over it starts a backoff that
+    doubles with each consecutive violation (see ``rate_limit_backoff_*``).
+    The result describes the first limit that denied, or the last one.
+    In hybrid mode Redis only sees batched syncs (see ``LocalRateLimiter``).
+    """
     client = get_redis()
-    if client is None:
+    if not limits:
         return RateLimitResult(allowed=True)
+    if client is None:
+        store = get_local_store()
+        if store is None:
+            return RateLimitResult(allowed=True)
+        try:
+            return check_limits_locally(store, limits)
+        except Exception:
+            return RateLimitResult(allowed=True)
 
-    backoff_key = f"backoff:{key}"
-    violations_key = f"violations:{key}"
-    counter_key = f"rl:{key}"
-    now = int(time.time())
+    if hybrid_rate_limits():
+        return await local_rate_limiter.check(client, limits)
 
+    keys, args = limit_keys_and_args(limits)
     try:
-        retry_after = await client.ttl(backoff_key)
-        if retry_after and retry_after > 0:
-            return RateLimitResult(False, retry_after, label, limit, 0, now + retry_after)
-
-        count = await client.incr(counter_key)
-        if count == 1:
-            await client.expire(counter_key, window_seconds)
-
-        ttl = await client.ttl(counter_key)
-        reset_at = now + max(ttl, 0)
-        remaining = max(limit - count, 0)
-        if count <= limit:
-            await client.delete(violations_key)
-            return RateLimitResult(True, 0, label, limit, remaining, reset_at)
-
-        violations = await client.incr(violations_key)
-        await client.expire(violations_key, settings.rate_limit_backoff_max_seconds)
-        backoff = min(
-            settings.rate_limit_backoff_base_seconds * (2 ** max(violations - 1, 0)),
-            settings.rate_limit_backoff_max_seconds,
-        )
-        await client.setex(backoff_key, backoff, "1")
-        return RateLimitResult(False, backoff, label, limit, 0, now + backoff)
+        reply = await _gcra_script(client)(keys=keys, args=backoff_args() + args)
     except Exception:
         return RateLimitResult(allowed=True)
+    return limit_result(limits, reply)
+
+
+async def check_rate_limit(key: str, limit: int, window_seconds: int, label: str) -> RateLimitResult:
+    return await check_rate_limits([(key, limit, window_seconds, label)])
@@ -0,0 +1,40 @@
+"""Re-render cached responses by sending GETs through the app itself.
+
+Warm requests carry ``WARM_SCOPE_KEY``, so ``CacheRateLimitMiddleware``
+skips the lookup and the rate limits and stores whatever the app returns.
+"""
+
+from starlette.types import ASGIApp, Message
+
+from core.middleware import WARM_SCOPE_KEY
+
+
+async def warm(app: ASGIApp, path: str, query_string: str = "") -> int:
+    """GET ``path`` through ``app``, discarding the body; returns the status."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("utf-8"),
+        "query_string": query_string.encode("latin-1"),
+        "root_path": "",
+        "headers": [(b"host", b"warm"), (b"accept-encoding", b"gzip")],
+        "client": ("127.0.0.1", 0),
+        "server": ("warm", 80),
+        WARM_SCOPE_KEY: True,
+    }
+    status = 0
+
+    async def receive() -> Message:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Message) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
@@ -0,0 +1,66 @@
+"""Redis cache writes taken off the response path.
+
+The middleware hands its writes (entries, invalid markers, the invalidation
+announcements that follow them) to ``write_behind`` and returns. One
+background task writes them in submission order: whatever queued up while
+the previous batch was in flight goes out as the next pipeline, so a burst
+of misses costs a round trip or two instead of one per response.
+
+Local stores are written immediately: there is no latency to hide.
+"""
+
+import asyncio
+from collections.abc import Awaitable
+
+from core.cache import CacheWrite, redis_available, write_many
+from core.config import cache_rate_limit_settings as settings
+from core.local_cache import INSTANCE_ID, INVALIDATION_CHANNEL
+from core.metrics import increment, register_gauge
+
+
+class WriteBehind:
+    def __init__(self, max_pending: int, max_batch: int = 100) -> None:
+        self.max_pending = max_pending
+        self.max_batch = max_batch
+        # (write, key to announce once written)
+        self.pending: list[tuple[CacheWrite, str | None]] = []
+        self._flusher: asyncio.Task | None = None
+        self._deferred: set[asyncio.Task] = set()
+
+    async def write(self, write: CacheWrite, announce: bool = False) -> None:
+        """Queue ``write``; ``announce`` tells the other workers' local caches once it lands."""
+        if not redis_available():
+            await write_many([write])
+            return
+        self.pending.append((write, write.key if announce else None))
+        if len(self.pending) > self.max_pending:
+            # a dropped write is only a later miss
+            del self.pending[0]
+            increment("cache.write_behind.dropped")
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush())
+
+    def defer(self, work: Awaitable[None]) -> None:
+        """Run other background work, such as sharing a confirmed-invalid handle."""
+        task = asyncio.ensure_future(work)
+        self._deferred.add(task)
+        task.add_done_callback(self._deferred.discard)
+
+    async def _flush(self) -> None:
+        while self.pending:
+            batch, self.pending = self.pending[: self.max_batch], self.pending[self.max_batch :]
+            messages = []
+            if settings.cache_invalidation_pubsub:
+                messages = [(INVALIDATION_CHANNEL, f"{INSTANCE_ID} {key}") for _, key in batch if key is not None]
+            await write_many([write for write, _ in batch], messages)
+            increment("cache.write_behind.batches")
+            increment("cache.write_behind.writes", len(batch))
+
+    async def drain(self) -> None:
+        """Wait until everything queued so far is written, e.g. on shutdown."""
+        while self._deferred or (self._flusher is not None and not self._flusher.done()):
+            await asyncio.gather(*self._deferred, *([self._flusher] if self._flusher else []), return_exceptions=True)
+
+
+write_behind = WriteBehind(settings.cache_write_behind_max_pending)
+register_gauge("cache.write_behind.pending", lambda: len(write_behind.pending))
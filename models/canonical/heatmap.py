@@ -29,7 +29,7 @@ class Heatmap(BaseModel):
     # (every year since account creation, descending) even when the daily grid
     # is sliced to ``view``.
     availableYears: List[int] = Field(default_factory=list)
-    view: str = "all"  # all | last_365 | year
+    view: str = "all"  # all | last_365 | year | range
     year: Optional[int] = None
     startDate: Optional[str] = None
     endDate: Optional[str] = None
@@ -3,8 +3,10 @@ from routes.badges import router as badges_router
 from routes.contests import router as contests_router
 from routes.heatmap import router as heatmap_router
 from routes.legacy import router as legacy_router
+from routes.metrics import router as metrics_router
 from routes.profile import router as profile_router
 from routes.rating import router as rating_router
+from routes.refresh import router as refresh_router
 from routes.stats import router as stats_router
 from routes.summary import router as summary_router
 
@@ -14,8 +16,10 @@ __all__ = [
     "docs_router",
     "heatmap_router",
     "legacy_router",
+    "metrics_router",
     "profile_router",
     "rating_router",
+    "refresh_router",
     "stats_router",
     "summary_router",
 ]
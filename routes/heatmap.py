@@ -1,39 +1,117 @@
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import JSONResponse
+from datetime import date
 
-from models.canonical import make_envelope
-from services import canonical_mapper
-from services.heatmap import get_user_heatmap
-from services.heatmap_window import normalize_view, window_heatmap
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response
+
+from models.canonical import Heatmap, make_envelope
+from services.heatmap import get_heatmap_source, heatmap_delta
+from services.heatmap_codec import MEDIA_TYPE, encode_heatmaps
+from services.heatmap_window import normalize_view
 
 
 router = APIRouter(tags=["Canonical"])
 
+MAX_WINDOWS = 12
+
+
+def _parse_year(raw: str, param: str) -> int:
+    try:
+        parsed = int(raw)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid year in {param}: {raw.strip()!r}.")
+    if not 2000 <= parsed <= 2100:
+        raise HTTPException(status_code=400, detail="Years must be between 2000 and 2100.")
+    return parsed
+
+
+def _requested_windows(view: str | None, views: str | None, years: str | None, year: int | None) -> list[tuple[str, int | None]]:
+    """Normalized, de-duplicated (view, year) pairs for a multi-window request.
+
+    ``views`` entries are a view or a ``view:year`` pair (``year:2023``). The
+    plain ``year`` parameter is only accepted when a single view is requested.
+    """
+    requested: list[tuple[str | None, int | None]] = [(view, None)] if view is not None else []
+    if views is not None:
+        entries = [entry.strip() for entry in views.split(",") if entry.strip()]
+        if not entries:
+            raise HTTPException(status_code=422, detail="views must name at least one view.")
+        for entry in entries:
+            name, sep, raw = entry.partition(":")
+            requested.append((name, _parse_year(raw, "views") if sep else None))
+
+    if year is not None:
+        if len(requested) > 1:
+            raise HTTPException(
+                status_code=422,
+                detail="year applies to a single view; pass view:year pairs in views instead.",
+            )
+        name, own = requested[0] if requested else (None, None)
+        requested = [(name, year if own is None else own)]
+
+    windows = [normalize_view(name, own) for name, own in requested]
+    windows.extend(("year", _parse_year(raw, "years")) for raw in (years or "").split(",") if raw.strip())
+
+    windows = list(dict.fromkeys(windows))
+    if len(windows) > MAX_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_WINDOWS} heatmap windows per request.")
+    return windows
+
+
+def _respond(request: Request, username: str, heatmaps: list[Heatmap], many: bool, cursor: str, since: date | None):
+    headers = {"Vary": "Accept"}
+    if MEDIA_TYPE in request.headers.get("accept", ""):
+        headers["X-Heatmap-Cursor"] = cursor
+        if since is not None:
+            headers["X-Heatmap-Since"] = since.isoformat()
+        return Response(encode_heatmaps(heatmaps), media_type=MEDIA_TYPE, headers=headers)
+
+    # Lets the response cache store this envelope through the heatmap codec.
+    request.state.cache_codec = "heatmap"
+    data = [heatmap.model_dump() for heatmap in heatmaps] if many else heatmaps[0]
+    extra = {"cursor": cursor, "since": since.isoformat() if since else None}
+    return JSONResponse(make_envelope(username, data, legacy=extra), headers=headers)
+
 
 @router.get("/{username}/heatmap")
 async def get_submission_heatmap(
+    request: Request,
     username: str,
-    view: str = Query("all", description="all | last_365 | year"),
+    view: str | None = Query(default=None, description="all | last_365 | year (default all)"),
+    views: str | None = Query(default=None, description="Comma-separated views or view:year pairs, returned together as a list"),
+    years: str | None = Query(default=None, description="Comma-separated years, each returned as a year window"),
     range: str | None = Query(default=None, description="Deprecated alias for view (all|last365days|year)"),
     year: int | None = Query(default=None, ge=2000, le=2100),
     month: int | None = Query(default=None, ge=1, le=12, description="Deprecated; not applied to the canonical block"),
+    from_: date | None = Query(default=None, alias="from", description="Range start (YYYY-MM-DD); overrides view"),
+    to: date | None = Query(default=None, description="Range end (YYYY-MM-DD, inclusive); overrides view"),
+    days: bool = Query(default=False, description="Include dailyContributions for from/to ranges"),
+    since: date | None = Query(default=None, description="Only return days on or after this date (YYYY-MM-DD)"),
+    cursor: str | None = Query(default=None, description="Cursor from a previous response; 304 when nothing changed"),
+    tz: str | None = Query(default=None, description="IANA timezone for day boundaries, e.g. Asia/Kolkata (default UTC)"),
 ):
     try:
-        # ``range`` is the deprecated GFG param; ``view`` is the unified one.
-        requested = range if range is not None else view
-        view_n, year_n = normalize_view(requested, year)
-
-        # Fetch the full history once and window locally so yearlyContributions
-        # and availableYears always describe every year since account creation.
-        heatmap_data = await get_user_heatmap(username, range_name="all")
-        available_years = [int(y) for y in heatmap_data.get("availableYears", []) or []]
-        heatmap = window_heatmap(
-            canonical_mapper.heatmap_from(heatmap_data),
-            view_n,
-            year_n,
-            available_years=available_years or None,
-        )
-        return make_envelope(username, heatmap)
+        many = views is not None or years is not None
+        ranged = not many and (from_ is not None or to is not None)
+        if many:
+            windows = _requested_windows(range or view, views, years, year)
+        else:
+            # ``range`` is the deprecated GFG param; ``view`` is the unified one.
+            # Windows are projected from one cached full-history base, so
+            # yearlyContributions and availableYears always describe every year
+            # since account creation.
+            windows = [] if ranged else [normalize_view(range if range is not None else view, year)]
+
+        # One fetch per request: every window and the cursor come from it.
+        source = await get_heatmap_source(username, tz)
+        if ranged:
+            heatmaps = [source.range(from_, to, include_days=days)]
+        else:
+            heatmaps = [source.window(v, y) for v, y in windows]
+
+        heatmaps, next_cursor, since_n = heatmap_delta(source, heatmaps, since, cursor)
+        if heatmaps is None:
+            return Response(status_code=304)
+        return _respond(request, username, heatmaps, many, next_cursor, since_n)
     except HTTPException as e:
         return JSONResponse(
             status_code=e.status_code,
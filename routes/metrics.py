@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Header
+
+from core.auth import require_bearer
+from core.config import cache_rate_limit_settings as settings
+from core.metrics import snapshot
+
+
+router = APIRouter(tags=["Operations"])
+
+# Outside the /{username} namespace, so no GFG handle is shadowed.
+METRICS_PATH = "/_internal/metrics"
+
+
+@router.get(METRICS_PATH)
+async def get_metrics(authorization: str | None = Header(default=None)):
+    """Process-local cache counters, with hit ratios per tier.
+
+    Needs ``Authorization: Bearer $METRICS_TOKEN``.
+    """
+    require_bearer(authorization, settings.metrics_token, "metrics")
+    return snapshot()
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Header, Request
+
+from core.auth import require_bearer
+from core.cache import get_redis, purge_index
+from core.config import cache_rate_limit_settings as settings
+from core.invalid_handles import invalid_handles, invalid_handles_key
+from core.local_cache import delete_variants, local_cache, publish_invalidation
+from core.middleware import handle_index_key, rate_limited_response
+from core.rate_limit import check_rate_limits
+from services.client import profile_key
+from services.submission_store import store_key
+from services.warmer import PLATFORM, rewarm_user
+
+
+router = APIRouter(tags=["Operations"])
+
+
+@router.post("/{username}/refresh")
+async def refresh_user(username: str, request: Request, authorization: str | None = Header(default=None)):
+    """Purge every cached response and upstream payload of a user, then re-warm them.
+
+    Needs ``Authorization: Bearer $CACHE_REFRESH_TOKEN`` and has its own rate
+    limit per handle.
+    """
+    require_bearer(authorization, settings.cache_refresh_token, "refresh")
+
+    handle = username.lower()
+    limited = await check_rate_limits(
+        [
+            (
+                f"refresh:{PLATFORM}:{handle}",
+                settings.refresh_rate_limit_requests,
+                settings.refresh_rate_limit_window_seconds,
+                "refresh",
+            )
+        ]
+    )
+    if not limited.allowed:
+        return rate_limited_response(limited)
+
+    purged = await purge_index(
+        handle_index_key(PLATFORM, handle),
+        [f"invalid:{PLATFORM}:{handle}", store_key(handle), profile_key(handle)],
+    )
+    for key in purged:
+        delete_variants(local_cache, key)
+        await publish_invalidation(key)
+    # the handle may have been created since it was confirmed missing
+    invalid_handles.discard(handle)
+    await invalid_handles.share(get_redis(), invalid_handles_key(PLATFORM), handle, cleared=True)
+
+    warmed = await rewarm_user(request.app, username)
+    return {"status": "success", "username": username, "purged": len(purged), "warmed": warmed}
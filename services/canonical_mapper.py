@@ -1,14 +1,13 @@
 """Builds the canonical cross-platform card for GeeksforGeeks.
 
 Profile + difficulty breakdown come from ``get_detailed_user_data`` and the
-heatmap from ``get_user_heatmap`` (active-day list, with computed streaks).
+heatmap from ``get_windowed_heatmap`` (cached per-day count array, with computed streaks).
 GeeksforGeeks exposes no contests, rating, badges or per-topic tags publicly, so
 those sections stay empty. See ../CANONICAL_SCHEMA.md.
 """
 
 import asyncio
 from datetime import date, datetime, timedelta, timezone
-from math import ceil
 from typing import Any, Dict, Optional
 
 from models.canonical.badges import Badges
@@ -20,8 +19,8 @@ from models.canonical.rating import Rating
 from models.canonical.stats import Stats
 from models.canonical.summary import Summary
 from services import topics
-from services.heatmap import get_user_heatmap
-from services.heatmap_window import window_heatmap
+from services.heatmap import get_windowed_heatmap
+from services.heatmap_engine import heatmap_level
 from services.profile import get_detailed_user_data
 
 STANDARD_DIFFICULTIES = ["school", "basic", "easy", "medium", "hard"]
@@ -52,12 +51,6 @@ async def stats_from(detailed: Dict[str, Any]) -> Stats:
     )
 
 
-def _level(count: int, max_daily: int) -> int:
-    if count <= 0 or max_daily <= 0:
-        return 0
-    return min(4, max(1, ceil((count / max_daily) * 4)))
-
-
 def heatmap_from(heatmap_data: Dict[str, Any]) -> Heatmap:
     entries = heatmap_data.get("heatmap", []) or []
     date_counts: dict[date, int] = {}
@@ -118,7 +111,7 @@ def heatmap_from(heatmap_data: Dict[str, Any]) -> Heatmap:
             HeatDay(
                 date=d.isoformat(),
                 count=date_counts[d],
-                level=_level(date_counts[d], max_daily),
+                level=heatmap_level(date_counts[d], max_daily),
             )
             for d in active_dates
         ],
@@ -143,17 +136,16 @@ def summary_from(card: Card) -> Summary:
 
 
 async def build_card(username: str) -> Card:
-    detailed, heatmap_data = await asyncio.gather(
+    detailed, heatmap = await asyncio.gather(
         get_detailed_user_data(username),
-        get_user_heatmap(username, range_name="all"),
+        get_windowed_heatmap(username, "all", None),
     )
-    available_years = [int(y) for y in (heatmap_data.get("availableYears") or [])]
     return Card(
         username=username,
         profile=profile_from(detailed, username),
         stats=await stats_from(detailed),
         contests=Contests(),
         rating=Rating(),
-        heatmap=window_heatmap(heatmap_from(heatmap_data), "all", None, available_years=available_years or None),
+        heatmap=heatmap,
         badges=Badges(),
     )
@@ -5,6 +5,8 @@ import httpx
 from fastapi import HTTPException
 
 from config import settings
+from core.cache import get_json, set_json
+from core.config import cache_rate_limit_settings
 
 API_URL = "https://geeks-for-geeks-api.vercel.app/{username}"
 PROFILE_URL = "https://authapi.geeksforgeeks.org/api-get/user-profile-info/"
@@ -69,3 +71,66 @@ async def _request_json(method: str, url: str, **kwargs: Any) -> Dict[str, Any]:
         )
 
     return payload
+
+async def get_submission_data(username: str) -> Dict[str, Any]:
+    """The raw GFG submissions payload of ``username`` (``result[difficulty][id]``)."""
+    payload = await _request_json(
+        "POST",
+        SUBMISSIONS_URL,
+        json={"handle": username, "requestType": "", "year": "", "month": ""},
+    )
+
+    if payload.get("status") == "failed":
+        raise HTTPException(
+            status_code=404,
+            detail=f"User '{username}' not found on GeeksForGeeks",
+        )
+
+    result = payload.get("result")
+    if result is None:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Could not extract solved problem data for user '{username}'.",
+        )
+
+    return payload
+
+
+async def _fetch_profile_data(username: str) -> Dict[str, Any]:
+    payload = await _request_json(
+        "GET",
+        PROFILE_URL,
+        params={
+            "handle": username,
+            "article_count": "false",
+            "redirect": "true",
+        },
+    )
+
+    user_info = payload.get("data")
+    if not user_info:
+        raise HTTPException(
+            status_code=404,
+            detail=f"User profile information not found for '{username}'.",
+        )
+
+    return user_info
+
+
+def profile_key(username: str) -> str:
+    return f"profile:gfg:{username.lower()}"
+
+
+async def get_profile_data(username: str) -> Dict[str, Any]:
+    """The user's profile info, from the cache or one upstream fetch."""
+    cached = await get_json(profile_key(username))
+    if cached is not None:
+        return cached
+    return await refresh_profile_data(username)
+
+
+async def refresh_profile_data(username: str) -> Dict[str, Any]:
+    """Fetch the user's profile info upstream and replace the cached copy."""
+    user_info = await _fetch_profile_data(username)
+    await set_json(profile_key(username), user_info, cache_rate_limit_settings.profile_cache_ttl_seconds)
+    return user_info
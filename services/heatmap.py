@@ -1,17 +1,30 @@
 import asyncio
-from collections import Counter
-from datetime import datetime, timedelta, timezone
-from typing import Any, Dict
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-import httpx
 from fastapi import HTTPException
 
 from config import settings
+from core.local_cache import publish_invalidation, register_invalidation_handler
+from models.canonical.heatmap import Heatmap
+from services.client import get_profile_data
+from services.heatmap_engine import (
+    BaseHeatmap,
+    DayCounts,
+    SubmissionTimes,
+    project,
+    project_range,
+    window_counts,
+)
+from services.heatmap_window import normalize_view
+from services.submission_store import SubmissionStore, get_submission_store
 
 API_URL = "https://geeks-for-geeks-api.vercel.app/{username}"
-PROFILE_URL = "https://authapi.geeksforgeeks.org/api-get/user-profile-info/"
-SUBMISSIONS_URL = "https://practiceapi.geeksforgeeks.org/api/v1/user/problems/submissions/"
-STANDARD_DIFFICULTIES = ["school", "basic", "easy", "medium", "hard"]
 HEADERS = {
     "Accept": "application/json, text/plain, */*",
     "Origin": "https://www.geeksforgeeks.org",
@@ -19,149 +32,243 @@ HEADERS = {
     "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
 }
 
-async def _request_json(method: str, url: str, **kwargs: Any) -> Dict[str, Any]:
-    headers = {"User-Agent": settings.user_agent, "Accept": "application/json"}
+def _string_or_default(value: Any, default: str = "") -> str:
+    if value is None or value == "":
+        return default
 
-    try:
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await client.request(
-                method,
-                url,
-                headers=headers,
-                timeout=settings.request_timeout,
-                **kwargs,
-            )
-    except httpx.TimeoutException:
-        raise HTTPException(
-            status_code=504,
-            detail="Request to GeeksForGeeks timed out. Please try again later.",
-        )
-    except httpx.RequestError:
+    return str(value)
+
+def _parse_profile_created_date(profile_data: Dict[str, Any]) -> datetime:
+    created_at = profile_data.get("created_date")
+    if not created_at:
         raise HTTPException(
-            status_code=503,
-            detail=(
-                "Failed to connect to GeeksForGeeks. The service might be down "
-                "or your internet connection is unstable."
-            ),
+            status_code=422,
+            detail="Could not determine the GeeksForGeeks account creation date.",
         )
 
     try:
-        payload = response.json()
+        return datetime.strptime(created_at, "%Y-%m-%d %H:%M:%S")
     except ValueError:
         raise HTTPException(
             status_code=422,
-            detail="Failed to parse GeeksForGeeks response.",
-        )
-
-    if response.status_code in {400, 404, 406}:
-        message = str(payload.get("message", "")).lower()
-        if "user not found" in message or "valid user details" in message:
-            raise HTTPException(
-                status_code=404,
-                detail=(
-                    f"User '{kwargs.get('params', {}).get('handle') or kwargs.get('json', {}).get('handle')}' "
-                    "not found on GeeksForGeeks"
-                ),
-            )
-
-    if response.is_error:
-        detail = payload.get("message") or response.reason_phrase
-        raise HTTPException(
-            status_code=response.status_code,
-            detail=f"GeeksForGeeks API error: {detail}",
-        )
-
-    return payload
-
-async def _get_profile_data(username: str) -> Dict[str, Any]:
-    payload = await _request_json(
-        "GET",
-        PROFILE_URL,
-        params={
-            "handle": username,
-            "article_count": "false",
-            "redirect": "true",
-        },
-    )
-
-    user_info = payload.get("data")
-    if not user_info:
-        raise HTTPException(
-            status_code=404,
-            detail=f"User profile information not found for '{username}'.",
+            detail="Invalid GeeksForGeeks account creation date format.",
         )
 
-    return user_info
-
-async def _get_submission_data(username: str) -> Dict[str, Any]:
-    payload = await _request_json(
-        "POST",
-        SUBMISSIONS_URL,
-        json={"handle": username, "requestType": "", "year": "", "month": ""},
+def build_submission_times(
+    store: SubmissionStore,
+    created_at: datetime,
+    source: tzinfo = timezone.utc,
+) -> SubmissionTimes:
+    """Submission instants as UTC epochs; GFG's naive timestamps are read in ``source``."""
+    return SubmissionTimes.from_wall_clock(
+        store.wall_clock_epochs(),
+        int(created_at.replace(tzinfo=timezone.utc).timestamp()),
+        source,
     )
 
-    if payload.get("status") == "failed":
+def resolve_timezone(name: str | None) -> tzinfo:
+    """``tzinfo`` for an IANA timezone name; ``None`` and ``UTC`` mean UTC."""
+    if name is None or name.upper() == "UTC":
+        return timezone.utc
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError, OSError):
         raise HTTPException(
-            status_code=404,
-            detail=f"User '{username}' not found on GeeksForGeeks",
+            status_code=400,
+            detail=f"Unknown timezone '{name}'. Use an IANA name such as Asia/Kolkata.",
         )
 
-    result = payload.get("result")
-    if result is None:
+async def _fetch_submission_times(username: str) -> SubmissionTimes:
+    if username == "favicon.ico":
         raise HTTPException(
-            status_code=422,
-            detail=f"Could not extract solved problem data for user '{username}'.",
+            status_code=400,
+            detail="Invalid username: favicon.ico is not a valid GeeksForGeeks username",
         )
 
-    return payload
-
-def _build_solved_stats(submission_payload: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
-    solved_stats: Dict[str, Dict[str, Any]] = {}
-
-    for difficulty, problems in submission_payload.get("result", {}).items():
-        questions = []
-
-        for details in problems.values():
-            question_info = {
-                "question": details.get("pname", ""),
-                "questionUrl": f"https://www.geeksforgeeks.org/problems/{details.get('slug', '')}",
-                "difficulty": difficulty,
-            }
-            questions.append(question_info)
-
-        solved_stats[difficulty.lower()] = {"count": len(questions), "questions": questions}
-
-    for difficulty in STANDARD_DIFFICULTIES:
-        solved_stats.setdefault(difficulty.lower(), {"count": 0, "questions": []})
-
-    return solved_stats
-
-def _iter_submission_details(submission_payload: Dict[str, Any]):
-    for problems in submission_payload.get("result", {}).values():
-        for details in problems.values():
-            yield details
+    profile_data, store = await asyncio.gather(
+        get_profile_data(username),
+        get_submission_store(username),
+    )
+    created_at = _parse_profile_created_date(profile_data)
+    return build_submission_times(store, created_at, resolve_timezone(settings.gfg_timezone))
+
+async def get_user_submission_times(username: str) -> SubmissionTimes:
+    """Account creation and submission instants for ``username`` (one upstream fetch)."""
+    return await _fetch_submission_times(username)
+
+# A user rarely asks for more than a couple of zones; bound it anyway.
+_ZONES_PER_USER = 8
+
+@dataclass
+class _CachedBase:
+    base: BaseHeatmap
+    windows: Dict[Tuple[str, Optional[int], int], Heatmap] = field(default_factory=dict)
+
+@dataclass
+class _CachedUser:
+    expires_at: float
+    times: SubmissionTimes
+    bases: "OrderedDict[str, _CachedBase]" = field(default_factory=OrderedDict)
+
+# username -> submission epochs plus, per timezone, the immutable base heatmap
+# and the windows already projected from it.
+_BASE_CACHE: "OrderedDict[str, _CachedUser]" = OrderedDict()
+
+async def _cached_user(username: str) -> _CachedUser:
+    key = username.lower()
+    entry = _BASE_CACHE.get(key)
+    if entry is not None and entry.expires_at > time.monotonic():
+        _BASE_CACHE.move_to_end(key)
+        return entry
+
+    times = await get_user_submission_times(username)
+    entry = _CachedUser(time.monotonic() + settings.heatmap_cache_ttl_seconds, times)
+    _BASE_CACHE[key] = entry
+    _BASE_CACHE.move_to_end(key)
+    while len(_BASE_CACHE) > settings.heatmap_cache_size:
+        _BASE_CACHE.popitem(last=False)
+    return entry
+
+def forget_user(username: str) -> None:
+    """Drop the user's cached epochs and bases, e.g. before a forced refresh."""
+    _BASE_CACHE.pop(username.lower(), None)
+
+# Invalidation messages naming this prefix make every worker forget the user.
+BASE_INVALIDATION_PREFIX = "heatmap-base:gfg:"
+register_invalidation_handler(BASE_INVALIDATION_PREFIX, forget_user)
+
+async def forget_user_everywhere(username: str) -> None:
+    """``forget_user`` here and, over the invalidation channel, in every other worker."""
+    forget_user(username)
+    await publish_invalidation(BASE_INVALIDATION_PREFIX + username.lower())
+
+async def _cached_base(username: str, zone: tzinfo = timezone.utc) -> _CachedBase:
+    user = await _cached_user(username)
+    key = str(zone)
+    entry = user.bases.get(key)
+    if entry is not None:
+        user.bases.move_to_end(key)
+        return entry
+
+    # Re-bucketing the cached epochs; no upstream call.
+    entry = _CachedBase(BaseHeatmap.build(user.times.day_counts(zone, datetime.now(zone).date())))
+    user.bases[key] = entry
+    while len(user.bases) > _ZONES_PER_USER:
+        user.bases.popitem(last=False)
+    return entry
+
+@dataclass
+class HeatmapSource:
+    """One user's day counts in one timezone, fetched once per request.
+
+    Every window, range and the delta cursor of a request are derived from it.
+    ``cached`` is the shared base (and its memoized windows) when the heatmap
+    cache is on.
+    """
+
+    counts: DayCounts
+    today: date
+    cached: Optional[_CachedBase] = None
+
+    def window(self, view: str = "all", year: int | None = None) -> Heatmap:
+        """Canonical heatmap window; memoized per (view, year, local day) when cached.
+
+        The result may be shared between requests; callers must not mutate it.
+        """
+        view, year = normalize_view(view, year)
+        if self.cached is None:
+            return window_counts(self.counts, view, year, today=self.today)
+        window_key = (view, year, self.today.toordinal())
+        heatmap = self.cached.windows.get(window_key)
+        if heatmap is None:
+            heatmap = project(self.cached.base, view, year, today=self.today)
+            self.cached.windows[window_key] = heatmap
+        return heatmap
+
+    def range(self, start: date | None = None, end: date | None = None, include_days: bool = False) -> Heatmap:
+        """Heatmap rollups for an arbitrary inclusive date range.
+
+        ``start`` defaults to account creation and ``end`` to today. Ranges are
+        answered from the base's prefix sums, so they are not memoized.
+        """
+        base = self.cached.base if self.cached is not None else BaseHeatmap.build(self.counts)
+        start = start or date.fromordinal(self.counts.start)
+        end = end or self.today
+        if start > end:
+            raise HTTPException(
+                status_code=400,
+                detail="The from date must not be after the to date.",
+            )
+        return project_range(base, start, end, include_days, today=self.today)
 
-def _string_or_default(value: Any, default: str = "") -> str:
-    if value is None or value == "":
-        return default
+async def get_heatmap_source(username: str, tz: str | None = None) -> HeatmapSource:
+    """Day counts for ``username`` in ``tz`` (default UTC), from at most one upstream fetch."""
+    zone = resolve_timezone(tz)
+    if settings.heatmap_cache_size <= 0:
+        # Nothing will be reused, so skip the full-history base entirely.
+        today = datetime.now(zone).date()
+        return HeatmapSource((await get_user_submission_times(username)).day_counts(zone, today), today)
 
-    return str(value)
-
-def _parse_profile_created_date(profile_data: Dict[str, Any]) -> datetime:
-    created_at = profile_data.get("created_date")
-    if not created_at:
-        raise HTTPException(
-            status_code=422,
-            detail="Could not determine the GeeksForGeeks account creation date.",
-        )
+    entry = await _cached_base(username, zone)
+    return HeatmapSource(entry.base.counts, datetime.now(zone).date(), entry)
 
+async def get_windowed_heatmap(
+    username: str,
+    view: str = "all",
+    year: int | None = None,
+    tz: str | None = None,
+) -> Heatmap:
+    """Canonical heatmap window, memoized per (user, timezone, view, year, local day)."""
+    return (await get_heatmap_source(username, tz)).window(view, year)
+
+def _encode_cursor(counts: DayCounts, today: date) -> str:
+    # Days before ``today`` are settled; ``today`` itself can still grow, so the
+    # next delta starts there. The overall max is carried along because levels
+    # of settled days are rescaled whenever it changes.
+    today_ordinal = today.toordinal()
+    return f"{today_ordinal:x}.{counts.max():x}.{counts.fingerprint(today_ordinal)}.{counts.fingerprint()}"
+
+def _decode_cursor(cursor: str) -> Tuple[int, int, str, str]:
     try:
-        return datetime.strptime(created_at, "%Y-%m-%d %H:%M:%S")
+        ordinal, max_daily, settled, full = cursor.split(".")
+        return int(ordinal, 16), int(max_daily, 16), settled, full
     except ValueError:
-        raise HTTPException(
-            status_code=422,
-            detail="Invalid GeeksForGeeks account creation date format.",
-        )
+        raise HTTPException(status_code=400, detail="Invalid heatmap cursor.")
+
+def heatmap_delta(
+    source: HeatmapSource,
+    heatmaps: List[Heatmap],
+    since: date | None = None,
+    cursor: str | None = None,
+) -> Tuple[Optional[List[Heatmap]], str, Optional[date]]:
+    """Trim a request's ``heatmaps`` to what changed for a polling client.
+
+    Returns ``(heatmaps, next_cursor, since)``. ``heatmaps`` is ``None`` when
+    ``cursor`` shows the client is already current. When the cursor's settled
+    history no longer matches (GFG moved an old submission), the full windows
+    are returned and ``since`` is ``None``; the same happens when the overall
+    maximum moved, since that rescales every day's level. Rollups always
+    describe the whole window.
+    """
+    counts = source.counts
+    next_cursor = _encode_cursor(counts, source.today)
+
+    if cursor is not None:
+        cursor_ordinal, max_daily, settled, full = _decode_cursor(cursor)
+        if full == counts.fingerprint():
+            return None, next_cursor, None
+        unchanged = max_daily == counts.max() and settled == counts.fingerprint(cursor_ordinal)
+        since = date.fromordinal(cursor_ordinal) if unchanged else None
+
+    if since is None:
+        return heatmaps, next_cursor, None
+    since_iso = since.isoformat()
+    trimmed = []
+    for heatmap in heatmaps:
+        days = heatmap.dailyContributions
+        first = bisect_left(days, since_iso, key=lambda day: day.date)
+        trimmed.append(heatmap.model_copy(update={"dailyContributions": days[first:]}))
+    return trimmed, next_cursor, since
 
 async def get_user_heatmap(
     username: str,
@@ -169,12 +276,6 @@ async def get_user_heatmap(
     year: int | None = None,
     month: int | None = None,
 ) -> Dict[str, Any]:
-    if username == "favicon.ico":
-        raise HTTPException(
-            status_code=400,
-            detail="Invalid username: favicon.ico is not a valid GeeksForGeeks username",
-        )
-
     if range_name not in {"all", "last365days", "year"}:
         raise HTTPException(
             status_code=422,
@@ -193,13 +294,9 @@ async def get_user_heatmap(
             detail="Month must be between 1 and 12.",
         )
 
-    profile_data, submission_payload = await asyncio.gather(
-        _get_profile_data(username),
-        _get_submission_data(username),
-    )
-    created_dt = _parse_profile_created_date(profile_data)
-    created_date = created_dt.date()
     today = datetime.utcnow().date()
+    counts = (await get_user_submission_times(username)).day_counts(timezone.utc, today)
+    created_date = date.fromordinal(counts.start)
     available_years = list(range(today.year, created_date.year - 1, -1))
 
     if year is not None and year not in available_years:
@@ -239,27 +336,9 @@ async def get_user_heatmap(
         if from_date < created_date:
             from_date = created_date
 
-    heatmap_counts: Counter[str] = Counter()
-
-    for details in _iter_submission_details(submission_payload):
-        submitted_at = details.get("user_subtime")
-        if not submitted_at:
-            continue
-
-        try:
-            submitted_dt = datetime.strptime(submitted_at, "%Y-%m-%d %H:%M:%S")
-        except ValueError:
-            continue
-
-        submitted_date = submitted_dt.date()
-        if submitted_date < from_date or submitted_date > to_date:
-            continue
-
-        heatmap_counts[submitted_date.isoformat()] += 1
-
     heatmap = [
-        {"date": date, "count": count}
-        for date, count in sorted(heatmap_counts.items())
+        {"date": date.fromordinal(ordinal).isoformat(), "count": counts.count_on(ordinal)}
+        for ordinal in counts.active_ordinals(from_date.toordinal(), to_date.toordinal() + 1)
     ]
 
     return {
@@ -270,6 +349,6 @@ async def get_user_heatmap(
         "toDate": to_date.isoformat(),
         "availableYears": available_years,
         "totalActiveDays": len(heatmap),
-        "totalSubmissions": sum(heatmap_counts.values()),
+        "totalSubmissions": counts.total(from_date.toordinal(), to_date.toordinal() + 1),
         "heatmap": heatmap,
     }
@@ -0,0 +1,358 @@
+"""Compact binary encoding of canonical ``Heatmap`` payloads.
+
+A multi-year heatmap as JSON is mostly ``{"date","count","level"}`` objects,
+~45 bytes per active day. Here each window is a handful of varints plus:
+
+    daily   start ordinal, span, a bitset of active days over the span,
+            one varint count per active day and 2-bit levels (level - 1)
+
+so ten years of history fit in a few KB. Days that do not fit that shape
+(unsorted, zero counts, levels outside 1..4) fall back to a per-day varint
+list; the encoding is lossless either way.
+
+Buffers are ``MAGIC``, a varint window count, then the windows, and are
+served as-is to clients sending ``Accept: application/x-gfg-heatmap``. Each
+window is, in order (all unsigned LEB128 varints unless noted)::
+
+    totalSubmissions totalActiveDays currentStreak longestStreak maxDailySubmissions
+    firstActiveDate lastActiveDate startDate endDate   date ordinals, 0 = null
+    view                                               index into VIEWS, or
+                                                       len(VIEWS) + n then n UTF-8 bytes
+    year                                               0 = null
+    availableYears                                     count, then years
+    yearlyContributions                                count, then year/total/active
+    dailyContributions                                 count, then if count:
+        0 start span bitset[ceil(span/8)] counts... levels[ceil(count/4)]
+        1 (date delta zigzag, count, level)...
+
+``compact_envelope`` / ``expand_envelope`` wrap a rendered JSON envelope
+whose ``data`` is one heatmap or a list of them, so the response cache can
+store the compact form and still replay the exact JSON bytes.
+"""
+
+import json
+from datetime import date
+from itertools import chain
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from models.canonical.heatmap import HeatDay, Heatmap
+
+MEDIA_TYPE = "application/x-gfg-heatmap"
+MAGIC = b"GFGHM\x01"
+ENVELOPE_MAGIC = b"GFGHE\x01"
+VIEWS = ("all", "last_365", "year", "range")
+
+_DENSE = 0
+_LIST = 1
+# set bit offsets of every byte value, for scanning the active-day bitset
+_BITS = tuple(tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256))
+# the four 2-bit levels packed in every byte value
+_LEVELS = tuple(tuple((value >> shift & 3) + 1 for shift in (0, 2, 4, 6)) for value in range(256))
+# ordinal -> ISO date; distinct days served are bounded, the cap guards the rest
+_ISO_DAYS: Dict[int, str] = {}
+_ISO_DAYS_MAX = 50_000
+
+
+def _write(out: bytearray, value: int) -> None:
+    if value < 0:
+        raise ValueError("Negative value in heatmap.")
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read(buffer: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        try:
+            byte = buffer[pos]
+        except IndexError:
+            raise ValueError("Truncated heatmap.")
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _take(buffer: bytes, pos: int, size: int) -> Tuple[bytes, int]:
+    if pos + size > len(buffer):
+        raise ValueError("Truncated heatmap.")
+    return buffer[pos:pos + size], pos + size
+
+
+def _ordinal(value: Optional[str]) -> int:
+    if value is None:
+        return 0
+    parsed = date.fromisoformat(value)
+    if parsed.isoformat() != value:
+        raise ValueError(f"Non-canonical date {value!r}.")
+    return parsed.toordinal()
+
+
+def _iso(ordinal: int) -> Optional[str]:
+    return _day_iso(ordinal) if ordinal else None
+
+
+def _day_iso(ordinal: int) -> str:
+    iso = _ISO_DAYS.get(ordinal)
+    if iso is None:
+        iso = date.fromordinal(ordinal).isoformat()
+        if len(_ISO_DAYS) < _ISO_DAYS_MAX:
+            _ISO_DAYS[ordinal] = iso
+    return iso
+
+
+def _is_dense(ordinals: List[int], days: Sequence[HeatDay]) -> bool:
+    return (
+        all(a < b for a, b in zip(ordinals, ordinals[1:]))
+        and all(day.count >= 0 and 1 <= day.level <= 4 for day in days)
+    )
+
+
+def _encode_days(out: bytearray, days: Sequence[HeatDay]) -> None:
+    _write(out, len(days))
+    if not days:
+        return
+    ordinals = [_ordinal(day.date) for day in days]
+    if not _is_dense(ordinals, days):
+        _write(out, _LIST)
+        previous = 0
+        for ordinal, day in zip(ordinals, days):
+            delta = ordinal - previous
+            _write(out, delta * 2 if delta >= 0 else -delta * 2 - 1)
+            _write(out, day.count)
+            _write(out, day.level)
+            previous = ordinal
+        return
+
+    start = ordinals[0]
+    span = ordinals[-1] - start + 1
+    bitset = bytearray((span + 7) // 8)
+    for ordinal in ordinals:
+        offset = ordinal - start
+        bitset[offset >> 3] |= 1 << (offset & 7)
+    levels = bytearray((len(days) + 3) // 4)
+    for i, day in enumerate(days):
+        levels[i >> 2] |= (day.level - 1) << ((i & 3) * 2)
+
+    _write(out, _DENSE)
+    _write(out, start)
+    _write(out, span)
+    out += bitset
+    for day in days:
+        _write(out, day.count)
+    out += levels
+
+
+def _decode_days(buffer: bytes, pos: int) -> Tuple[List[Tuple[str, int, int]], int]:
+    count, pos = _read(buffer, pos)
+    if not count:
+        return [], pos
+    layout, pos = _read(buffer, pos)
+    days: List[Tuple[str, int, int]] = []
+    if layout == _LIST:
+        ordinal = 0
+        for _ in range(count):
+            zigzag, pos = _read(buffer, pos)
+            ordinal += zigzag >> 1 if not zigzag & 1 else -((zigzag + 1) >> 1)
+            value, pos = _read(buffer, pos)
+            level, pos = _read(buffer, pos)
+            days.append((_iso(ordinal), value, level))
+        return days, pos
+    if layout != _DENSE:
+        raise ValueError("Unknown heatmap day layout.")
+
+    start, pos = _read(buffer, pos)
+    span, pos = _read(buffer, pos)
+    bitset, pos = _take(buffer, pos, (span + 7) // 8)
+    ordinals = [
+        start + (index << 3) + bit
+        for index, byte in enumerate(bitset) if byte
+        for bit in _BITS[byte]
+    ]
+    if len(ordinals) != count:
+        raise ValueError("Heatmap bitset does not match its day count.")
+    counts = buffer[pos:pos + count]
+    if len(counts) == count and max(counts) < 0x80:
+        # every count fits in one varint byte, the usual case
+        pos += count
+    else:
+        counts = []
+        for _ in range(count):
+            value, pos = _read(buffer, pos)
+            counts.append(value)
+    levels, pos = _take(buffer, pos, (count + 3) // 4)
+    levels = list(chain.from_iterable(map(_LEVELS.__getitem__, levels)))[:count]
+    return list(zip(map(_day_iso, ordinals), counts, levels)), pos
+
+
+def _encode_one(out: bytearray, heatmap: Heatmap) -> None:
+    for value in (
+        heatmap.totalSubmissions,
+        heatmap.totalActiveDays,
+        heatmap.currentStreak,
+        heatmap.longestStreak,
+        heatmap.maxDailySubmissions,
+    ):
+        _write(out, value)
+    for value in (heatmap.firstActiveDate, heatmap.lastActiveDate, heatmap.startDate, heatmap.endDate):
+        _write(out, _ordinal(value))
+
+    if heatmap.view in VIEWS:
+        _write(out, VIEWS.index(heatmap.view))
+    else:
+        view = heatmap.view.encode("utf-8")
+        _write(out, len(VIEWS) + len(view))
+        out += view
+    if heatmap.year is not None and heatmap.year <= 0:
+        raise ValueError("Heatmap year must be positive.")
+    _write(out, heatmap.year or 0)
+
+    _write(out, len(heatmap.availableYears))
+    for year in heatmap.availableYears:
+        _write(out, year)
+    _write(out, len(heatmap.yearlyContributions))
+    for rollup in heatmap.yearlyContributions:
+        _write(out, rollup.year)
+        _write(out, rollup.totalSubmissions)
+        _write(out, rollup.activeDays)
+    _encode_days(out, heatmap.dailyContributions)
+
+
+def _decode_one(buffer: bytes, pos: int) -> Tuple[Dict[str, Any], int]:
+    """One window shaped like ``Heatmap.model_dump()``, days as (date, count, level)."""
+    scalars = []
+    for _ in range(9):
+        value, pos = _read(buffer, pos)
+        scalars.append(value)
+    total, active, current, longest, max_daily = scalars[:5]
+    first, last, start, end = map(_iso, scalars[5:])
+
+    view_code, pos = _read(buffer, pos)
+    if view_code < len(VIEWS):
+        view = VIEWS[view_code]
+    else:
+        raw, pos = _take(buffer, pos, view_code - len(VIEWS))
+        view = raw.decode("utf-8")
+    year, pos = _read(buffer, pos)
+
+    available_count, pos = _read(buffer, pos)
+    available_years = []
+    for _ in range(available_count):
+        value, pos = _read(buffer, pos)
+        available_years.append(value)
+    yearly_count, pos = _read(buffer, pos)
+    yearly = []
+    for _ in range(yearly_count):
+        values = []
+        for _ in range(3):
+            value, pos = _read(buffer, pos)
+            values.append(value)
+        yearly.append({"year": values[0], "totalSubmissions": values[1], "activeDays": values[2]})
+    days, pos = _decode_days(buffer, pos)
+
+    heatmap = {
+        "totalSubmissions": total,
+        "totalActiveDays": active,
+        "currentStreak": current,
+        "longestStreak": longest,
+        "maxDailySubmissions": max_daily,
+        "firstActiveDate": first,
+        "lastActiveDate": last,
+        "dailyContributions": days,
+        "yearlyContributions": yearly,
+        "availableYears": available_years,
+        "view": view,
+        "year": year or None,
+        "startDate": start,
+        "endDate": end,
+    }
+    return heatmap, pos
+
+
+def encode_heatmaps(heatmaps: Sequence[Heatmap]) -> bytes:
+    out = bytearray(MAGIC)
+    _write(out, len(heatmaps))
+    for heatmap in heatmaps:
+        _encode_one(out, heatmap)
+    return bytes(out)
+
+
+def _decode_dumps(buffer: bytes) -> List[Dict[str, Any]]:
+    if not buffer.startswith(MAGIC):
+        raise ValueError("Not an encoded heatmap.")
+    count, pos = _read(buffer, len(MAGIC))
+    heatmaps = []
+    for _ in range(count):
+        heatmap, pos = _decode_one(buffer, pos)
+        heatmaps.append(heatmap)
+    if pos != len(buffer):
+        raise ValueError("Trailing bytes after encoded heatmaps.")
+    return heatmaps
+
+
+def decode_heatmaps(buffer: bytes) -> List[Heatmap]:
+    """Inverse of ``encode_heatmaps``; raises ``ValueError`` on malformed input."""
+    heatmaps = []
+    for heatmap in _decode_dumps(buffer):
+        heatmap["dailyContributions"] = [
+            {"date": day, "count": count, "level": level} for day, count, level in heatmap["dailyContributions"]
+        ]
+        heatmaps.append(Heatmap.model_validate(heatmap))
+    return heatmaps
+
+
+def _render(value: Any) -> bytes:
+    # Byte-for-byte what starlette's JSONResponse.render produces.
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+_DAYS_SLOT = b'"dailyContributions":[]'
+_DATA_SLOT = b'"data":null}'
+
+
+def _render_heatmap(heatmap: Dict[str, Any]) -> bytes:
+    # The day list dominates; format it directly rather than through dicts and
+    # json.dumps, then splice it into the (unique, unescaped) empty-list slot.
+    days = heatmap["dailyContributions"]
+    heatmap["dailyContributions"] = []
+    rendered = _render(heatmap)
+    body = ",".join('{"date":"%s","count":%d,"level":%d}' % day for day in days).encode("ascii")
+    return rendered.replace(_DAYS_SLOT, b'"dailyContributions":[' + body + b"]", 1)
+
+
+def compact_envelope(body: bytes) -> bytes:
+    """Compact form of a rendered heatmap envelope; ``ValueError`` if it would not round-trip."""
+    envelope = json.loads(body)
+    data = envelope.get("data") if isinstance(envelope, dict) else None
+    many = isinstance(data, list)
+    if data is None:
+        raise ValueError("Envelope has no heatmap data.")
+    heatmaps = [Heatmap.model_validate(item) for item in (data if many else [data])]
+    envelope["data"] = None
+
+    head = _render(envelope)
+    if not head.endswith(_DATA_SLOT):
+        raise ValueError("Envelope data is not the last key.")
+    out = bytearray(ENVELOPE_MAGIC)
+    _write(out, len(head))
+    out += head
+    out.append(1 if many else 0)
+    out += encode_heatmaps(heatmaps)
+    compact = bytes(out)
+    if expand_envelope(compact) != body:
+        raise ValueError("Envelope does not round-trip through the heatmap codec.")
+    return compact
+
+
+def expand_envelope(buffer: bytes) -> bytes:
+    if not buffer.startswith(ENVELOPE_MAGIC):
+        raise ValueError("Not a compact heatmap envelope.")
+    size, pos = _read(buffer, len(ENVELOPE_MAGIC))
+    head, pos = _take(buffer, pos, size)
+    many, pos = _take(buffer, pos, 1)
+    rendered = [_render_heatmap(heatmap) for heatmap in _decode_dumps(buffer[pos:])]
+    data = b"[" + b",".join(rendered) + b"]" if many == b"\x01" else rendered[0]
+    return head[:-len(_DATA_SLOT)] + b'"data":' + data + b"}"
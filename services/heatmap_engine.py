@@ -0,0 +1,469 @@
+"""Array-backed daily submission counts for the canonical heatmap.
+
+Submissions are bucketed once into a contiguous ``array('I')`` indexed by day
+offset from account creation. Every rollup the canonical ``Heatmap`` needs
+(totals, max, yearly buckets, streaks and the ``all`` | ``last_365`` | ``year``
+windows) is then a slice or a single pass over that array instead of repeated
+parsing, sorting and rescanning of per-day dicts.
+
+Range totals and active-day counts come from lazily built prefix sums (O(1)),
+range maxima from a sparse table over 64-day block maxima (O(1)), and first/last active days from
+bisecting the active-day prefix (O(log n)), so arbitrary ``from``/``to`` ranges
+never rescan the day array.
+
+Per-user submission instants are kept as sorted UTC epoch seconds
+(``SubmissionTimes``, an ``array('q')``). Bucketing them into any timezone's
+local days is a shift by that zone's UTC offset, looked up once per active UTC
+day (and per submission only on days with a DST transition), so a new ``tz``
+never needs the upstream payload again.
+
+A ``BaseHeatmap`` bundles the counts with the full-history ``HeatDay`` list and
+yearly rollups, computed once per user and never mutated. ``project`` derives a
+window from it by bisecting into that list, so serving ``view=all``,
+``view=last_365`` and several ``year=`` requests reuses one base. ``project``
+(and ``window_counts``) produce exactly what
+``window_heatmap(canonical_mapper.heatmap_from(...))`` does for the same data.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from functools import cached_property
+from hashlib import blake2b
+from itertools import accumulate, compress
+from math import ceil
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from models.canonical.heatmap import HeatDay, Heatmap, YearContribution
+from services.heatmap_window import normalize_view
+from services.subtime import UNIX_EPOCH_ORDINAL
+
+
+_MAX_BLOCK = 64
+_DAY_SECONDS = 86400
+
+
+def heatmap_level(count: int, max_daily: int) -> int:
+    if count <= 0 or max_daily <= 0:
+        return 0
+    return min(4, max(1, ceil((count / max_daily) * 4)))
+
+
+@dataclass(frozen=True)
+class DayCounts:
+    """Submission counts per day; ``counts[i]`` is the day with ordinal ``start + i``."""
+
+    start: int
+    counts: array
+
+    @classmethod
+    def from_ordinals(cls, ordinals: Iterable[Optional[int]], start: int, end: int) -> "DayCounts":
+        """Bucket day ordinals into ``[start, end]``; ``None`` and ordinals outside are dropped."""
+        size = max(end - start + 1, 0)
+        counts = array("I", bytes(4 * size))
+        # Ordinals start at 1, so filtering falsy values only drops the Nones.
+        for ordinal in filter(None, ordinals):
+            offset = ordinal - start
+            if 0 <= offset < size:
+                counts[offset] += 1
+        return cls(start, counts)
+
+    @property
+    def end(self) -> int:
+        """Ordinal one past the last tracked day."""
+        return self.start + len(self.counts)
+
+    def _bounds(self, lo: Optional[int], hi: Optional[int]) -> Tuple[int, int]:
+        size = len(self.counts)
+        low = 0 if lo is None else min(max(lo - self.start, 0), size)
+        high = size if hi is None else min(max(hi - self.start, 0), size)
+        return low, max(low, high)
+
+    @cached_property
+    def _prefix_totals(self) -> array:
+        return array("Q", accumulate(self.counts, initial=0))
+
+    @cached_property
+    def _prefix_active(self) -> array:
+        return array("I", accumulate(map(bool, self.counts), initial=0))
+
+    @cached_property
+    def _block_max(self) -> List[List[int]]:
+        # Per-block maxima plus a sparse table over them: levels[k][i] is the
+        # max of blocks i .. i + 2**k - 1. Tiny to build, O(1) to query.
+        counts = self.counts
+        blocks = [max(counts[i:i + _MAX_BLOCK]) for i in range(0, len(counts), _MAX_BLOCK)]
+        levels = [blocks]
+        step = 1
+        while 2 * step <= len(blocks):
+            previous = levels[-1]
+            levels.append(list(map(max, previous[:len(previous) - step], previous[step:])))
+            step *= 2
+        return levels
+
+    def total(self, lo: Optional[int] = None, hi: Optional[int] = None) -> int:
+        low, high = self._bounds(lo, hi)
+        prefix = self._prefix_totals
+        return prefix[high] - prefix[low]
+
+    def max(self, lo: Optional[int] = None, hi: Optional[int] = None) -> int:
+        low, high = self._bounds(lo, hi)
+        first_block = -(-low // _MAX_BLOCK)
+        last_block = high // _MAX_BLOCK
+        if first_block >= last_block:
+            return max(self.counts[low:high], default=0)
+
+        level = (last_block - first_block).bit_length() - 1
+        table = self._block_max[level]
+        # partial blocks at either edge hold fewer than _MAX_BLOCK days each
+        return max(
+            table[first_block],
+            table[last_block - (1 << level)],
+            max(self.counts[low:first_block * _MAX_BLOCK], default=0),
+            max(self.counts[last_block * _MAX_BLOCK:high], default=0),
+        )
+
+    def active_days(self, lo: Optional[int] = None, hi: Optional[int] = None) -> int:
+        low, high = self._bounds(lo, hi)
+        prefix = self._prefix_active
+        return prefix[high] - prefix[low]
+
+    def first_active(self, lo: Optional[int] = None, hi: Optional[int] = None) -> Optional[int]:
+        low, high = self._bounds(lo, hi)
+        prefix = self._prefix_active
+        if prefix[high] == prefix[low]:
+            return None
+        return self.start + bisect_right(prefix, prefix[low]) - 1
+
+    def last_active(self, lo: Optional[int] = None, hi: Optional[int] = None) -> Optional[int]:
+        low, high = self._bounds(lo, hi)
+        prefix = self._prefix_active
+        if prefix[high] == prefix[low]:
+            return None
+        return self.start + bisect_left(prefix, prefix[high]) - 1
+
+    def active_ordinals(self, lo: Optional[int] = None, hi: Optional[int] = None) -> List[int]:
+        low, high = self._bounds(lo, hi)
+        return list(compress(range(self.start + low, self.start + high), self.counts[low:high]))
+
+    def fingerprint(self, hi: Optional[int] = None) -> str:
+        """Short digest of the start day and every count before ordinal ``hi``."""
+        _, high = self._bounds(None, hi)
+        digest = blake2b(self.start.to_bytes(4, "little"), digest_size=8)
+        digest.update(memoryview(self.counts)[:high])
+        return digest.hexdigest()
+
+    def count_on(self, ordinal: int) -> int:
+        offset = ordinal - self.start
+        return self.counts[offset] if 0 <= offset < len(self.counts) else 0
+
+    def current_streak(self, today: int, lo: Optional[int] = None, hi: Optional[int] = None) -> int:
+        """Consecutive active days ending today (or yesterday) inside ``[lo, hi)``."""
+        low = self.start if lo is None else max(lo, self.start)
+        high = self.end if hi is None else min(hi, self.end)
+
+        def active(ordinal: int) -> bool:
+            return low <= ordinal < high and self.count_on(ordinal) > 0
+
+        cursor = today if active(today) else today - 1
+        streak = 0
+        while active(cursor):
+            streak += 1
+            cursor -= 1
+        return streak
+
+    def yearly(self) -> List[YearContribution]:
+        """Per-year totals for every year with at least one active day, ascending."""
+        if not self.counts:
+            return []
+        rollups = []
+        first_year = date.fromordinal(self.start).year
+        last_year = date.fromordinal(self.end - 1).year
+        for year in range(first_year, last_year + 1):
+            lo = date(year, 1, 1).toordinal()
+            hi = date(year + 1, 1, 1).toordinal() if year < 9999 else self.end
+            active = self.active_days(lo, hi)
+            if active:
+                rollups.append(YearContribution(year=year, totalSubmissions=self.total(lo, hi), activeDays=active))
+        return rollups
+
+    def available_years(self, today: date) -> List[int]:
+        """Every year from account creation to ``today``, newest first."""
+        return list(range(today.year, date.fromordinal(self.start).year - 1, -1))
+
+
+def _offset_at(zone: tzinfo, epoch: int, wall_clock: bool) -> int:
+    moment = datetime.fromtimestamp(epoch, timezone.utc)
+    # ``wall_clock`` epochs are a local reading in ``zone`` encoded as if UTC.
+    moment = moment.replace(tzinfo=zone) if wall_clock else moment.astimezone(zone)
+    return int(moment.utcoffset().total_seconds())
+
+
+def _utc_offsets(epochs: Iterable[int], zone: tzinfo, wall_clock: bool = False) -> Iterator[int]:
+    """UTC offset of ``zone`` (in seconds) at each epoch; ``epochs`` should be sorted."""
+    fixed = zone.utcoffset(None)
+    day = first = last = None
+    for epoch in epochs:
+        if fixed is not None:
+            yield int(fixed.total_seconds())
+            continue
+        if epoch // _DAY_SECONDS != day:
+            day = epoch // _DAY_SECONDS
+            first = _offset_at(zone, day * _DAY_SECONDS, wall_clock)
+            last = _offset_at(zone, day * _DAY_SECONDS + _DAY_SECONDS - 1, wall_clock)
+        yield first if first == last else _offset_at(zone, epoch, wall_clock)
+
+
+def _local_ordinals(epochs: Iterable[int], zone: tzinfo) -> Iterator[int]:
+    for epoch, offset in zip(epochs, _utc_offsets(epochs, zone)):
+        yield (epoch + offset) // _DAY_SECONDS + UNIX_EPOCH_ORDINAL
+
+
+@dataclass(frozen=True)
+class SubmissionTimes:
+    """Account creation and every submission as UTC epoch seconds (sorted)."""
+
+    created: int
+    epochs: array
+
+    @classmethod
+    def from_wall_clock(
+        cls,
+        epochs: Iterable[Optional[int]],
+        created: int,
+        source: tzinfo = timezone.utc,
+    ) -> "SubmissionTimes":
+        """Build from wall-clock readings in ``source``; ``None`` entries are dropped."""
+        readings = sorted(epoch for epoch in epochs if epoch is not None)
+        shifted = sorted(map(int.__sub__, readings, _utc_offsets(readings, source, wall_clock=True)))
+        created -= next(_utc_offsets([created], source, wall_clock=True))
+        return cls(created, array("q", shifted))
+
+    def day_counts(self, zone: tzinfo, today: date) -> DayCounts:
+        """Counts per local day in ``zone`` from account creation through ``today``.
+
+        Works a UTC day at a time: when the offset is constant over the day,
+        its submissions split at the one local midnight inside it, found by
+        bisection, so the cost scales with active days rather than submissions.
+        """
+        start = next(_local_ordinals([self.created], zone))
+        size = max(today.toordinal() - start + 1, 0)
+        counts = array("I", bytes(4 * size))
+        epochs = self.epochs
+        fixed = zone.utcoffset(None)
+
+        def add(ordinal: int, amount: int) -> None:
+            offset = ordinal - start
+            if amount and 0 <= offset < size:
+                counts[offset] += amount
+
+        low = 0
+        while low < len(epochs):
+            midnight = epochs[low] // _DAY_SECONDS * _DAY_SECONDS
+            high = bisect_left(epochs, midnight + _DAY_SECONDS, low)
+            if fixed is not None:
+                first = last = int(fixed.total_seconds())
+            else:
+                first = _offset_at(zone, midnight, False)
+                last = _offset_at(zone, midnight + _DAY_SECONDS - 1, False)
+
+            if first == last:
+                cut = midnight + (_DAY_SECONDS if first > 0 else 0) - first
+                split = bisect_left(epochs, cut, low, high)
+                add((cut - 1 + first) // _DAY_SECONDS + UNIX_EPOCH_ORDINAL, split - low)
+                add((cut + first) // _DAY_SECONDS + UNIX_EPOCH_ORDINAL, high - split)
+            else:
+                # a DST transition falls inside this UTC day
+                for ordinal in _local_ordinals(epochs[low:high], zone):
+                    add(ordinal, 1)
+            low = high
+        return DayCounts(start, counts)
+
+
+def _heat_days(counts: DayCounts, ordinals: Iterable[int]) -> Tuple[HeatDay, ...]:
+    # Levels are scaled against the whole history so colours stay stable across views.
+    max_overall = counts.max()
+    return tuple(
+        HeatDay(
+            date=date.fromordinal(ordinal).isoformat(),
+            count=counts.count_on(ordinal),
+            level=heatmap_level(counts.count_on(ordinal), max_overall),
+        )
+        for ordinal in ordinals
+    )
+
+
+def _runs(ordinals: Iterable[int]) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+    """Inclusive (starts, ends) of every run of consecutive days in sorted ``ordinals``."""
+    starts: List[int] = []
+    ends: List[int] = []
+    for ordinal in ordinals:
+        if ends and ordinal == ends[-1] + 1:
+            ends[-1] = ordinal
+        else:
+            starts.append(ordinal)
+            ends.append(ordinal)
+    return tuple(starts), tuple(ends)
+
+
+def _longest_run(runs: Tuple[Tuple[int, ...], Tuple[int, ...]], lo: int, hi: int) -> int:
+    """Longest of ``runs`` inside ``[lo, hi)``, clipping runs at the edges."""
+    starts, ends = runs
+    longest = 0
+    for index in range(bisect_left(ends, lo), len(starts)):
+        if starts[index] >= hi:
+            break
+        longest = max(longest, min(ends[index], hi - 1) - max(starts[index], lo) + 1)
+    return longest
+
+
+@dataclass(frozen=True)
+class BaseHeatmap:
+    """Immutable full-history heatmap shared by every window of one user."""
+
+    counts: DayCounts
+    days: Tuple[HeatDay, ...]
+    day_ordinals: Tuple[int, ...]
+    yearly: Tuple[YearContribution, ...]
+
+    @cached_property
+    def _runs(self) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+        return _runs(self.day_ordinals)
+
+    def longest_streak(self, lo: int, hi: int) -> int:
+        """Longest run of active days inside ``[lo, hi)``, clipping runs at the edges."""
+        return _longest_run(self._runs, lo, hi)
+
+    @classmethod
+    def build(cls, counts: DayCounts) -> "BaseHeatmap":
+        ordinals = tuple(counts.active_ordinals())
+        return cls(counts, _heat_days(counts, ordinals), ordinals, tuple(counts.yearly()))
+
+
+def _view_bounds(
+    counts: DayCounts, view: str, year: Optional[int], today: date
+) -> Tuple[int, int, Optional[str], Optional[str]]:
+    """Ordinal bounds ``[lo, hi)`` plus the start/end labels for a normalized view."""
+    if view == "year":
+        return date(year, 1, 1).toordinal(), date(year, 12, 31).toordinal() + 1, f"{year}-01-01", f"{year}-12-31"
+    if view == "last_365":
+        today_ordinal = today.toordinal()
+        return today_ordinal - 364, today_ordinal + 1, (today - timedelta(days=364)).isoformat(), today.isoformat()
+    # all: labels follow the first/last active day
+    return counts.start, counts.end, None, None
+
+
+def _window(
+    counts: DayCounts,
+    bounds: Tuple[int, int, Optional[str], Optional[str]],
+    days: List[HeatDay],
+    longest_streak: int,
+    yearly: List[YearContribution],
+    view: str,
+    year: Optional[int],
+    available_years: Optional[List[int]],
+    today: date,
+) -> Heatmap:
+    """The windowed ``Heatmap`` for a normalized view from its ``_view_bounds`` and active ``days``."""
+    lo, hi, start, end = bounds
+    if view == "all" and days:
+        start, end = days[0].date, days[-1].date
+    return Heatmap(
+        totalSubmissions=counts.total(lo, hi),
+        totalActiveDays=len(days),
+        currentStreak=counts.current_streak(today.toordinal(), lo, hi),
+        longestStreak=longest_streak,
+        maxDailySubmissions=counts.max(lo, hi),
+        firstActiveDate=days[0].date if days else None,
+        lastActiveDate=days[-1].date if days else None,
+        dailyContributions=days,
+        yearlyContributions=yearly,
+        availableYears=available_years or counts.available_years(today),
+        view=view,
+        year=year,
+        startDate=start,
+        endDate=end,
+    )
+
+
+def project(
+    base: BaseHeatmap,
+    view: str = "all",
+    year: Optional[int] = None,
+    available_years: Optional[List[int]] = None,
+    today: Optional[date] = None,
+) -> Heatmap:
+    """Derive the windowed canonical ``Heatmap`` for ``view`` from ``base``.
+
+    ``base`` is left untouched; the result shares its ``HeatDay`` and
+    ``YearContribution`` instances, so treat it as read-only.
+    """
+    view, year = normalize_view(view, year)
+    today = today or datetime.now(timezone.utc).date()
+    bounds = lo, hi, _, _ = _view_bounds(base.counts, view, year, today)
+    first = bisect_left(base.day_ordinals, lo)
+    days = list(base.days[first:bisect_left(base.day_ordinals, hi, first)])
+    return _window(base.counts, bounds, days, base.longest_streak(lo, hi), list(base.yearly), view, year, available_years, today)
+
+
+def window_counts(
+    counts: DayCounts,
+    view: str = "all",
+    year: Optional[int] = None,
+    available_years: Optional[List[int]] = None,
+    today: Optional[date] = None,
+) -> Heatmap:
+    """Build one windowed canonical ``Heatmap`` straight from ``counts``.
+
+    Unlike ``project`` this never builds the full-history day list: only the
+    window's ``HeatDay`` entries are created, which is cheaper when the window
+    is used once and no ``BaseHeatmap`` is cached.
+    """
+    view, year = normalize_view(view, year)
+    today = today or datetime.now(timezone.utc).date()
+    bounds = lo, hi, _, _ = _view_bounds(counts, view, year, today)
+    active = counts.active_ordinals(lo, hi)
+    days = list(_heat_days(counts, active))
+    return _window(counts, bounds, days, _longest_run(_runs(active), lo, hi), counts.yearly(), view, year, available_years, today)
+
+
+def project_range(
+    base: BaseHeatmap,
+    start: date,
+    end: date,
+    include_days: bool = False,
+    available_years: Optional[List[int]] = None,
+    today: Optional[date] = None,
+) -> Heatmap:
+    """Rollups for the inclusive ``[start, end]`` range (``view="range"``).
+
+    Totals, active days and the maximum are O(1); first/last active days are
+    O(log n). ``dailyContributions`` is only filled when ``include_days``.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    counts = base.counts
+    lo, hi = start.toordinal(), end.toordinal() + 1
+
+    first_active = counts.first_active(lo, hi)
+    last_active = counts.last_active(lo, hi)
+    days: List[HeatDay] = []
+    if include_days:
+        first = bisect_left(base.day_ordinals, lo)
+        days = list(base.days[first:bisect_left(base.day_ordinals, hi, first)])
+
+    return Heatmap(
+        totalSubmissions=counts.total(lo, hi),
+        totalActiveDays=counts.active_days(lo, hi),
+        currentStreak=counts.current_streak(today.toordinal(), lo, hi),
+        longestStreak=base.longest_streak(lo, hi),
+        maxDailySubmissions=counts.max(lo, hi),
+        firstActiveDate=date.fromordinal(first_active).isoformat() if first_active is not None else None,
+        lastActiveDate=date.fromordinal(last_active).isoformat() if last_active is not None else None,
+        dailyContributions=days,
+        yearlyContributions=list(base.yearly),
+        availableYears=available_years or counts.available_years(today),
+        view="range",
+        startDate=start.isoformat(),
+        endDate=end.isoformat(),
+    )
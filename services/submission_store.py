@@ -0,0 +1,224 @@
+"""Columnar snapshot of one user's solved problems.
+
+GFG's submissions payload is ``result[difficulty][problem_id] -> details``.
+``SubmissionStore`` flattens it once per fetch into parallel arrays, one row
+per solved problem in payload order:
+
+    difficulty   array('B')  code into ``difficulties`` (payload keys, in order)
+    epochs       array('q')  ``user_subtime`` as wall-clock epoch seconds
+                             (``MISSING_EPOCH`` when absent or unparsable)
+    problem      array('I')  index into the ``slugs`` / ``names`` tables
+
+Stats counts are a ``bytes.count`` per code, listings a single pass over the
+columns and heatmap inputs a lazily built epoch order, so none of them walk
+the nested dicts again.
+
+``to_bytes`` / ``from_bytes`` give a compact little-endian encoding for the
+cache::
+
+    header        magic, rows, difficulty_count, problem_count, reported_count
+    difficulty    rows bytes
+    epochs        rows * i64
+    problem       rows * u32
+    strings       difficulty names, slugs, names; each as count + 1 u32
+                  offsets followed by the UTF-8 blob
+"""
+
+import struct
+import sys
+from array import array
+from dataclasses import dataclass
+from functools import cached_property
+from itertools import compress
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+from core.cache import get_bytes, set_bytes
+from core.config import cache_rate_limit_settings
+from services.client import get_submission_data
+from services.subtime import subtime_epoch
+
+STANDARD_DIFFICULTIES = ["school", "basic", "easy", "medium", "hard"]
+MAGIC = b"GFGSUBS1"
+MISSING_EPOCH = -(2 ** 63)
+_HEADER = struct.Struct("<8sIIIq")
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def _pack(typecode: str, values) -> bytes:
+    packed = array(typecode, values)
+    if not _LITTLE_ENDIAN:
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack(typecode: str, buffer: bytes, offset: int, count: int) -> Tuple[array, int]:
+    values = array(typecode)
+    end = offset + values.itemsize * count
+    if end > len(buffer):
+        raise ValueError("Truncated submission store.")
+    values.frombytes(buffer[offset:end])
+    if not _LITTLE_ENDIAN:
+        values.byteswap()
+    return values, end
+
+
+def _text(value: Any) -> str:
+    """GFG sends ``null`` for some slugs and names; store those as empty strings."""
+    return "" if value is None else str(value)
+
+
+def _pack_strings(strings: Sequence[str]) -> bytes:
+    encoded = [value.encode("utf-8") for value in strings]
+    offsets = [0]
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    return _pack("I", offsets) + b"".join(encoded)
+
+
+def _unpack_strings(buffer: bytes, offset: int, count: int) -> Tuple[Tuple[str, ...], int]:
+    offsets, offset = _unpack("I", buffer, offset, count + 1)
+    end = offset + offsets[-1]
+    if end > len(buffer):
+        raise ValueError("Truncated submission store.")
+    blob = buffer[offset:end]
+    return tuple(blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(count)), end
+
+
+@dataclass(frozen=True)
+class SubmissionStore:
+    difficulties: Tuple[str, ...]
+    difficulty: array
+    epochs: array
+    problem: array
+    slugs: Tuple[str, ...]
+    names: Tuple[str, ...]
+    reported_count: int = 0
+
+    @classmethod
+    def from_payload(cls, submission_payload: Dict[str, Any]) -> "SubmissionStore":
+        difficulties: List[str] = []
+        difficulty = array("B")
+        epochs = array("q")
+        problem = array("I")
+        problem_index: Dict[Tuple[str, str], int] = {}
+
+        for name, problems in submission_payload.get("result", {}).items():
+            code = len(difficulties)
+            difficulties.append(name)
+            for details in problems.values():
+                key = (_text(details.get("slug")), _text(details.get("pname")))
+                index = problem_index.setdefault(key, len(problem_index))
+                epoch = subtime_epoch(details.get("user_subtime"))
+                difficulty.append(code)
+                epochs.append(MISSING_EPOCH if epoch is None else epoch)
+                problem.append(index)
+
+        slugs, names = zip(*problem_index) if problem_index else ((), ())
+        try:
+            reported_count = int(submission_payload.get("count", 0) or 0)
+        except (TypeError, ValueError):
+            reported_count = 0
+        return cls(tuple(difficulties), difficulty, epochs, problem, tuple(slugs), tuple(names), reported_count)
+
+    def __len__(self) -> int:
+        return len(self.difficulty)
+
+    def to_bytes(self) -> bytes:
+        return b"".join(
+            [
+                _HEADER.pack(MAGIC, len(self), len(self.difficulties), len(self.slugs), self.reported_count),
+                self.difficulty.tobytes(),
+                _pack("q", self.epochs),
+                _pack("I", self.problem),
+                _pack_strings(self.difficulties),
+                _pack_strings(self.slugs),
+                _pack_strings(self.names),
+            ]
+        )
+
+    @classmethod
+    def from_bytes(cls, buffer: bytes) -> "SubmissionStore":
+        """Decode ``to_bytes`` output; raises ``ValueError`` on anything else."""
+        if len(buffer) < _HEADER.size:
+            raise ValueError("Truncated submission store.")
+        magic, rows, difficulty_count, problem_count, reported_count = _HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError("Not a submission store.")
+        offset = _HEADER.size
+        difficulty, offset = _unpack("B", buffer, offset, rows)
+        epochs, offset = _unpack("q", buffer, offset, rows)
+        problem, offset = _unpack("I", buffer, offset, rows)
+        difficulties, offset = _unpack_strings(buffer, offset, difficulty_count)
+        slugs, offset = _unpack_strings(buffer, offset, problem_count)
+        names, _ = _unpack_strings(buffer, offset, problem_count)
+        return cls(difficulties, difficulty, epochs, problem, slugs, names, reported_count)
+
+    @cached_property
+    def _by_time(self) -> Tuple[array, array]:
+        """Rows with a timestamp ordered by epoch, and those epochs."""
+        order = sorted(
+            compress(range(len(self)), (epoch != MISSING_EPOCH for epoch in self.epochs)),
+            key=self.epochs.__getitem__,
+        )
+        return array("I", order), array("q", map(self.epochs.__getitem__, order))
+
+    def count_by_difficulty(self) -> Dict[str, int]:
+        """Solved count per lower-cased difficulty, standard ones always present."""
+        codes = self.difficulty.tobytes()
+        counts = {name.lower(): codes.count(code) for code, name in enumerate(self.difficulties)}
+        for name in STANDARD_DIFFICULTIES:
+            counts.setdefault(name, 0)
+        return counts
+
+    @cached_property
+    def _urls(self) -> Tuple[str, ...]:
+        return tuple(f"https://www.geeksforgeeks.org/problems/{slug}" for slug in self.slugs)
+
+    def solved_stats(self) -> Dict[str, Dict[str, Any]]:
+        """``solvedStats`` as ``/profile`` serves it: per difficulty, the count and questions."""
+        names, slugs, urls, difficulties = self.names, self.slugs, self._urls, self.difficulties
+        buckets: List[List[Dict[str, str]]] = [[] for _ in difficulties]
+        for code, index in zip(self.difficulty, self.problem):
+            buckets[code].append(
+                {
+                    "question": names[index],
+                    "questionUrl": urls[index],
+                    "difficulty": difficulties[code],
+                    "slug": slugs[index],
+                }
+            )
+
+        solved_stats: Dict[str, Dict[str, Any]] = {}
+        for name, questions in zip(difficulties, buckets):
+            solved_stats[name.lower()] = {"count": len(questions), "questions": questions}
+        for name in STANDARD_DIFFICULTIES:
+            solved_stats.setdefault(name.lower(), {"count": 0, "questions": []})
+        return solved_stats
+
+    def wall_clock_epochs(self) -> Iterator[int]:
+        """Every parsed ``user_subtime`` (wall-clock seconds), in submission-time order."""
+        return iter(self._by_time[1])
+
+
+def store_key(username: str) -> str:
+    return f"submissions:gfg:{username.lower()}"
+
+
+async def get_submission_store(username: str) -> SubmissionStore:
+    """The user's submissions, from the bytes cache or one upstream fetch."""
+    key = store_key(username)
+    cached = await get_bytes(key)
+    if cached is not None:
+        try:
+            return SubmissionStore.from_bytes(cached)
+        except ValueError:
+            pass
+
+    return await refresh_submission_store(username)
+
+
+async def refresh_submission_store(username: str) -> SubmissionStore:
+    """Fetch the user's submissions upstream and replace the cached copy."""
+    store = SubmissionStore.from_payload(await get_submission_data(username))
+    await set_bytes(store_key(username), store.to_bytes(), cache_rate_limit_settings.submission_store_ttl_seconds)
+    return store
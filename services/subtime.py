@@ -0,0 +1,92 @@
+"""Fast parsing of GFG's ``user_subtime`` submission timestamps.
+
+GFG always sends ``YYYY-MM-DD HH:MM:SS``. ``datetime.strptime`` handles that
+through a regex match and a dozen conversions per call, and the heatmap calls
+it once per solved problem. ``subtime_ordinal`` validates the fixed layout
+with slicing and looks the date prefix up in a table of already-seen days, so
+most calls are a couple of string slices and a dict hit. Anything that does
+not fit the fixed layout falls back to ``strptime``, so results are identical.
+
+``subtime_epoch`` does the same for the full timestamp, returning seconds
+since 1970-01-01 with the wall-clock reading taken as UTC; callers shift it
+into the source timezone.
+"""
+
+from datetime import date, datetime
+from typing import Dict, Optional
+
+SUBTIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+UNIX_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+_HOURS = {f"{hour:02d}": hour * 3600 for hour in range(24)}
+_MINUTES = {f"{minute:02d}": minute * 60 for minute in range(60)}
+_SECONDS = {f"{second:02d}": second for second in range(60)}
+
+# Distinct submission days are bounded (a few thousand since GFG launched);
+# the cap only guards against pathological input.
+_DAY_ORDINALS: Dict[str, int] = {}
+_DAY_ORDINALS_MAX = 50_000
+
+
+def _strict_date_ordinal(prefix: str) -> Optional[int]:
+    year, month, day = prefix[0:4], prefix[5:7], prefix[8:10]
+    digits = year + month + day
+    if not (prefix[4] == "-" and prefix[7] == "-" and digits.isascii() and digits.isdigit()):
+        raise LookupError(prefix)
+    try:
+        return date(int(year), int(month), int(day)).toordinal()
+    except ValueError:
+        return None
+
+
+def _strptime_ordinal(value: str) -> Optional[int]:
+    try:
+        return datetime.strptime(value, SUBTIME_FORMAT).toordinal()
+    except ValueError:
+        return None
+
+
+def _fixed_layout(value: str) -> bool:
+    return (
+        len(value) == 19
+        and value[10] == " "
+        and value[13] == ":"
+        and value[16] == ":"
+        and value[11:13] in _HOURS
+        and value[14:16] in _MINUTES
+        and value[17:19] in _SECONDS
+    )
+
+
+def subtime_ordinal(value) -> Optional[int]:
+    """Day ordinal of a ``user_subtime`` string, or ``None`` if it is not valid."""
+    if not isinstance(value, str) or not value:
+        return None
+    if not _fixed_layout(value):
+        return _strptime_ordinal(value)
+
+    prefix = value[:10]
+    ordinal = _DAY_ORDINALS.get(prefix)
+    if ordinal is not None:
+        return ordinal
+    try:
+        ordinal = _strict_date_ordinal(prefix)
+    except LookupError:
+        return _strptime_ordinal(value)
+    if ordinal is not None and len(_DAY_ORDINALS) < _DAY_ORDINALS_MAX:
+        _DAY_ORDINALS[prefix] = ordinal
+    return ordinal
+
+
+def subtime_epoch(value) -> Optional[int]:
+    """Seconds since the Unix epoch of a ``user_subtime`` string read as UTC, or ``None``."""
+    ordinal = subtime_ordinal(value)
+    if ordinal is None:
+        return None
+    if _fixed_layout(value):
+        seconds = _HOURS[value[11:13]] + _MINUTES[value[14:16]] + _SECONDS[value[17:19]]
+    else:
+        parsed = datetime.strptime(value, SUBTIME_FORMAT)
+        seconds = parsed.hour * 3600 + parsed.minute * 60 + parsed.second
+    return (ordinal - UNIX_EPOCH_ORDINAL) * 86400 + seconds
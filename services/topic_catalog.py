@@ -0,0 +1,241 @@
+"""Prebuilt, memory-mapped slug -> topic-tag catalog.
+
+``services/topics.py`` otherwise learns each problem's tags from GFG's practice
+API one request at a time, so a cold instance pays for every slug it has not
+seen yet. This module writes those tags once, offline, into a compact binary
+file that every worker can ``mmap`` and share.
+
+File layout (all integers little-endian ``u32``)::
+
+    header          magic, slug_count, tag_count, ref_count
+    slug_offsets    slug_count + 1   byte offsets into the slug blob
+    ref_offsets     slug_count + 1   offsets into ``tag_refs`` per slug
+    tag_offsets     tag_count + 1    byte offsets into the tag blob
+    tag_refs        ref_count        indexes into the tag table
+    slug blob       UTF-8 slugs, sorted bytewise
+    tag blob        UTF-8 tag names, sorted
+
+Build one with::
+
+    python -m services.topic_catalog --slugs slugs.txt -o data/topic_catalog.bin
+    python -m services.topic_catalog --cassette problems.jsonl -o data/topic_catalog.bin
+
+A cassette is JSON lines of ``{"slug": ..., "response": <practiceapi payload>}``.
+"""
+
+import argparse
+import asyncio
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from config import settings
+
+MAGIC = b"GFGTAGS1"
+_HEADER = struct.Struct("<8sIII")
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+_UNSET = object()
+_catalog = _UNSET
+
+
+def _u32_bytes(values: Iterable[int]) -> bytes:
+    packed = array("I", values)
+    if not _LITTLE_ENDIAN:
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _u32_view(buffer, offset: int, count: int):
+    end = offset + 4 * count
+    if end > len(buffer):
+        raise ValueError("Topic catalog is truncated.")
+    view = memoryview(buffer)[offset:end]
+    if _LITTLE_ENDIAN:
+        return view.cast("I")
+    swapped = array("I", view.tobytes())
+    swapped.byteswap()
+    return swapped
+
+
+def encode_catalog(entries: Mapping[str, Iterable[str]]) -> bytes:
+    """Serialize ``slug -> tags`` into the catalog format."""
+    encoded = sorted((slug.encode("utf-8"), list(tags)) for slug, tags in entries.items() if slug)
+    tag_names = sorted({tag for _, tags in encoded for tag in tags})
+    tag_index = {tag: i for i, tag in enumerate(tag_names)}
+
+    slug_offsets = [0]
+    ref_offsets = [0]
+    tag_refs: List[int] = []
+    for slug, tags in encoded:
+        slug_offsets.append(slug_offsets[-1] + len(slug))
+        tag_refs.extend(tag_index[tag] for tag in tags)
+        ref_offsets.append(len(tag_refs))
+
+    encoded_tags = [tag.encode("utf-8") for tag in tag_names]
+    tag_offsets = [0]
+    for tag in encoded_tags:
+        tag_offsets.append(tag_offsets[-1] + len(tag))
+
+    return b"".join(
+        [
+            _HEADER.pack(MAGIC, len(encoded), len(tag_names), len(tag_refs)),
+            _u32_bytes(slug_offsets),
+            _u32_bytes(ref_offsets),
+            _u32_bytes(tag_offsets),
+            _u32_bytes(tag_refs),
+            b"".join(slug for slug, _ in encoded),
+            b"".join(encoded_tags),
+        ]
+    )
+
+
+def write_catalog(path: str, entries: Mapping[str, Iterable[str]]) -> int:
+    """Atomically write a catalog file and return its size in bytes."""
+    data = encode_catalog(entries)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as handle:
+        handle.write(data)
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+class TopicCatalog:
+    """Read-only view over a catalog buffer (usually an ``mmap``)."""
+
+    def __init__(self, buffer) -> None:
+        if len(buffer) < _HEADER.size:
+            raise ValueError("Topic catalog is truncated.")
+        magic, slug_count, tag_count, ref_count = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a topic catalog file.")
+
+        offset = _HEADER.size
+        self._slug_offsets = _u32_view(buffer, offset, slug_count + 1)
+        offset += 4 * (slug_count + 1)
+        self._ref_offsets = _u32_view(buffer, offset, slug_count + 1)
+        offset += 4 * (slug_count + 1)
+        tag_offsets = _u32_view(buffer, offset, tag_count + 1)
+        offset += 4 * (tag_count + 1)
+        self._tag_refs = _u32_view(buffer, offset, ref_count)
+        offset += 4 * ref_count
+
+        self._buffer = buffer
+        self._slug_base = offset
+        tag_base = offset + self._slug_offsets[slug_count]
+        if tag_base + tag_offsets[tag_count] > len(buffer):
+            raise ValueError("Topic catalog is truncated.")
+        # The tag vocabulary is a few hundred names; decode it once.
+        self._tags: Tuple[str, ...] = tuple(
+            bytes(buffer[tag_base + tag_offsets[i]:tag_base + tag_offsets[i + 1]]).decode("utf-8")
+            for i in range(tag_count)
+        )
+        self._count = slug_count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _slug_at(self, index: int) -> bytes:
+        start = self._slug_base + self._slug_offsets[index]
+        end = self._slug_base + self._slug_offsets[index + 1]
+        return self._buffer[start:end]
+
+    def get(self, slug: str) -> Optional[List[str]]:
+        """Tags for ``slug``, or ``None`` when the catalog does not know it."""
+        target = slug.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            mid = (low + high) // 2
+            if self._slug_at(mid) < target:
+                low = mid + 1
+            else:
+                high = mid
+        if low == self._count or self._slug_at(low) != target:
+            return None
+        refs = self._tag_refs[self._ref_offsets[low]:self._ref_offsets[low + 1]]
+        return [self._tags[ref] for ref in refs]
+
+
+def open_catalog(path: str) -> TopicCatalog:
+    with open(path, "rb") as handle:
+        mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    return TopicCatalog(mapped)
+
+
+def _resolve_path(path: str) -> str:
+    if os.path.isabs(path):
+        return path
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(root, path)
+
+
+def get_catalog() -> Optional[TopicCatalog]:
+    """The process-wide catalog, mapped on first use; ``None`` if unavailable."""
+    global _catalog
+    if _catalog is _UNSET:
+        path = settings.topic_catalog_path
+        try:
+            _catalog = open_catalog(_resolve_path(path)) if path else None
+        except (OSError, ValueError):
+            _catalog = None
+    return _catalog
+
+
+def _entries_from_cassette(path: str) -> Dict[str, List[str]]:
+    from services.topics import _tags_from_payload
+
+    entries: Dict[str, List[str]] = {}
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            slug = record.get("slug")
+            if slug:
+                entries[slug] = _tags_from_payload(record.get("response") or {})
+    return entries
+
+
+async def _entries_from_slugs(slugs: List[str]) -> Dict[str, List[str]]:
+    from services.topics import _CONCURRENCY, _request_topic_tags
+
+    semaphore = asyncio.Semaphore(_CONCURRENCY)
+
+    async def _bounded(slug: str) -> Optional[List[str]]:
+        async with semaphore:
+            return await _request_topic_tags(slug)
+
+    results = await asyncio.gather(*(_bounded(slug) for slug in slugs))
+    # Slugs whose fetch failed are left out so the live API can retry them.
+    return {slug: tags for slug, tags in zip(slugs, results) if tags is not None}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build the GFG topic-tag catalog.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--slugs", help="File with one problem slug per line")
+    source.add_argument("--cassette", help="JSON lines of recorded practiceapi responses")
+    parser.add_argument("-o", "--output", default=settings.topic_catalog_path, help="Catalog file to write")
+    args = parser.parse_args(argv)
+
+    if args.cassette:
+        entries = _entries_from_cassette(args.cassette)
+    else:
+        with open(args.slugs, encoding="utf-8") as handle:
+            slugs = sorted({line.strip() for line in handle if line.strip()})
+        entries = asyncio.run(_entries_from_slugs(slugs))
+
+    size = write_catalog(_resolve_path(args.output), entries)
+    print(f"Wrote {len(entries)} problems ({size} bytes) to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
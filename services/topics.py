@@ -2,16 +2,18 @@
 
 GFG's solved-problem list (``services/profile.py::get_detailed_user_data``)
 gives a slug per problem but no topic tags. Each problem's tags are fetched
-individually from GFG's practice API and tallied into a topic breakdown. See
-../CANONICAL_SCHEMA.md.
+individually from GFG's practice API and tallied into a topic breakdown, unless
+the prebuilt catalog (``services/topic_catalog.py``) already knows the slug.
+See ../CANONICAL_SCHEMA.md.
 """
 
 import asyncio
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 import httpx
 
 from models.canonical.stats import TopicCount
+from services.topic_catalog import get_catalog
 
 PROBLEM_URL = "https://practiceapi.geeksforgeeks.org/api/v1/problems/{slug}/"
 HEADERS = {
@@ -28,22 +30,35 @@ _TAG_CACHE: Dict[str, List[str]] = {}
 _CONCURRENCY = 10
 
 
+def _tags_from_payload(payload: Dict[str, Any]) -> List[str]:
+    return list(payload.get("results", {}).get("tags", {}).get("topic_tags", []) or [])
+
+
+async def _request_topic_tags(slug: str) -> Optional[List[str]]:
+    """Fetch a problem's tags from GFG; ``None`` when the request failed."""
+    try:
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            response = await client.get(PROBLEM_URL.format(slug=slug), headers=HEADERS)
+        if response.status_code != 200:
+            return None
+        return _tags_from_payload(response.json())
+    except (httpx.HTTPError, ValueError):
+        return None
+
+
 async def _fetch_topic_tags(slug: str) -> List[str]:
     if not slug:
         return []
     if slug in _TAG_CACHE:
         return _TAG_CACHE[slug]
 
-    tags: List[str] = []
-    try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(PROBLEM_URL.format(slug=slug), headers=HEADERS)
-        if response.status_code == 200:
-            payload: Dict[str, Any] = response.json()
-            tags = list(payload.get("results", {}).get("tags", {}).get("topic_tags", []) or [])
-    except (httpx.HTTPError, ValueError):
-        tags = []
+    catalog = get_catalog()
+    if catalog is not None:
+        tags = catalog.get(slug)
+        if tags is not None:
+            return tags
 
+    tags = await _request_topic_tags(slug) or []
     _TAG_CACHE[slug] = tags
     return tags
 
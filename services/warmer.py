@@ -0,0 +1,95 @@
+"""Re-fetching a user's upstream data and re-rendering their common responses.
+
+Used by ``POST /{username}/refresh`` and by the background warmer, which
+keeps the most requested handles (``core.popularity``) from ever going cold:
+each is re-warmed ``CACHE_WARM_MARGIN_SECONDS`` before its entries expire,
+by one worker (a ``claim`` per handle), within a shared outbound budget.
+Only the bare ``WARM_PATHS`` are re-rendered: variants with a query string
+(``?view=``, ``?tz=``) stay cold until requested.
+"""
+
+import asyncio
+import time
+from typing import Dict
+
+from starlette.types import ASGIApp
+
+from core.cache import cache_enabled, claim, get_redis, increment_counter, release
+from core.config import cache_rate_limit_settings as settings
+from core.metrics import increment
+from core.popularity import popularity, popularity_key
+from core.warming import warm
+from services import heatmap as heatmap_service
+from services.client import refresh_profile_data
+from services.submission_store import refresh_submission_store
+
+PLATFORM = "gfg"
+# Re-rendered for a warmed user, relative to /{username}.
+WARM_PATHS = ("", "/profile", "/stats", "/heatmap", "/stats/svg")
+
+
+async def rewarm_user(app: ASGIApp, username: str) -> Dict[str, int]:
+    """Fetch the profile and submissions once, then re-render ``WARM_PATHS``
+    into the cache from those copies.
+
+    Every worker drops its heatmap base for the user first. Returns the status
+    of each path.
+    """
+    await heatmap_service.forget_user_everywhere(username)
+    await asyncio.gather(refresh_profile_data(username), refresh_submission_store(username))
+    paths = [f"/{username}{path}" for path in WARM_PATHS]
+    statuses = await asyncio.gather(*(warm(app, path) for path in paths))
+    return dict(zip(paths, statuses))
+
+
+def _budget_key() -> str:
+    # one counter per minute: an exhausted budget is back at the next minute
+    return f"warmer:{PLATFORM}:{int(time.time() // 60)}"
+
+
+async def warm_popular_handles(app: ASGIApp) -> int:
+    """One warming round over the top handles; returns how many were warmed.
+
+    A handle whose claim is still held was warmed recently (here or by
+    another worker). Once the budget is spent the round stops and gives the
+    last claim back, so that handle is first in line next round.
+    """
+    client = get_redis()
+    key = popularity_key(PLATFORM)
+    await popularity.flush(client, key)
+    claim_seconds = max(settings.cache_ttl_seconds - settings.cache_warm_margin_seconds, 60)
+    warmed = 0
+    for handle in await popularity.top(client, key, settings.cache_warm_top_n):
+        claim_key = f"warm:{PLATFORM}:{handle}"
+        if not await claim(claim_key, claim_seconds):
+            continue
+        spent = await increment_counter(_budget_key(), 60)
+        if spent is not None and spent > settings.cache_warm_budget_per_minute:
+            increment("cache.warm.over_budget")
+            await release(claim_key)
+            break
+        try:
+            await rewarm_user(app, handle)
+        except Exception:
+            increment("cache.warm.errors")
+            continue
+        warmed += 1
+    increment("cache.warm.handles", warmed)
+    return warmed
+
+
+async def warm_periodically(app: ASGIApp) -> None:
+    while True:
+        await asyncio.sleep(settings.cache_warm_interval_seconds)
+        try:
+            await warm_popular_handles(app)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            increment("cache.warm.errors")
+
+
+def start_cache_warmer(app: ASGIApp) -> asyncio.Task | None:
+    if settings.cache_warm_top_n <= 0 or not cache_enabled():
+        return None
+    return asyncio.create_task(warm_periodically(app))
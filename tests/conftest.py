@@ -0,0 +1,5 @@
+import os
+
+# Without REDIS_URL the app now caches in memory; keep tests independent of
+# each other unless they install a backend themselves.
+os.environ.setdefault("CACHE_BACKEND", "none")
@@ -0,0 +1,112 @@
+"""Caching, negative caching and rate limiting work on the local backends."""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from starlette.responses import JSONResponse
+
+from core import cache, middleware
+from core.cache_backends import MemoryStore, SqliteStore
+from core.local_cache import LocalCache
+from core.middleware import CacheRateLimitMiddleware
+from core.rate_limit import check_limits_locally, check_rate_limits
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStore(max_entries=100)
+    return SqliteStore(str(tmp_path / "cache.sqlite3"))
+
+
+def test_store_basics(store):
+    store.set("a", b"\x00one", 60)
+    store.set("gone", b"x", 0)
+    assert store.get("a") == b"\x00one"
+    assert store.get("gone") is None and store.ttl("gone") == 0
+    assert 59 < store.ttl("a") <= 60
+    store.delete("a")
+    assert store.get("a") is None
+
+
+def test_memory_store_is_bounded():
+    store = MemoryStore(max_entries=2)
+    for key in "abc":
+        store.set(key, key.encode(), 60)
+    assert [store.get(key) for key in "abc"] == [None, b"b", b"c"]
+
+
+def test_local_limits_keep_escalating_backoff(store):
+    limits = [("ip:gfg:1.2.3.4", 100, 60, "ip"), ("handle:gfg:alice", 3, 60, "handle")]
+    results = [check_limits_locally(store, limits) for _ in range(3)]
+    assert [(r.allowed, r.limited_by, r.remaining) for r in results] == [
+        (True, "handle", 2),
+        (True, "handle", 1),
+        (True, "handle", 0),
+    ]
+
+    denied = check_limits_locally(store, limits)
+    assert (denied.allowed, denied.limited_by, denied.retry_after) == (False, "handle", 5)
+    during_backoff = check_limits_locally(store, limits)
+    assert (during_backoff.allowed, 0 < during_backoff.retry_after <= 5) == (False, True)
+
+    store.delete("backoff:handle:gfg:alice")  # as if it expired, still over the limit
+    again = check_limits_locally(store, limits)
+    assert (again.allowed, again.retry_after) == (False, 10)
+
+
+def test_middleware_without_redis(monkeypatch):
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+        if scope["path"].startswith("/ghost"):
+            response = JSONResponse({"status": "error", "message": "User does not exist"}, status_code=404)
+        else:
+            response = JSONResponse({"status": "success", "path": scope["path"]})
+        await response(scope, receive, send)
+
+    monkeypatch.setattr(cache.settings, "cache_backend", "memory")
+    monkeypatch.setattr(cache, "_local_store", MemoryStore(max_entries=100))
+    monkeypatch.setattr(middleware, "local_cache", LocalCache(max_entries=0, max_bytes=0))
+    monkeypatch.setattr(middleware.settings, "rate_limit_handle_requests", 3)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=CacheRateLimitMiddleware(app, "gfg"))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.get("/alice/profile")
+            second = await client.get("/alice/profile")
+            ghost = [await client.get("/ghost/profile") for _ in range(2)]
+            limited = [await client.get(f"/alice/stats?n={n}") for n in range(3)]
+        return first, second, ghost, limited
+
+    first, second, ghost, limited = asyncio.run(scenario())
+    assert (first.headers["x-cache"], second.headers["x-cache"]) == ("MISS", "HIT")
+    assert second.json() == first.json()
+    assert [r.headers.get("x-cache") for r in ghost] == ["MISS", "NEGATIVE-HIT"]
+    assert [r.status_code for r in limited] == [200, 200, 429]
+    assert limited[-1].json()["limitedBy"] == "handle"
+    assert calls == ["/alice/profile", "/ghost/profile", "/alice/stats", "/alice/stats"]
+
+
+def test_sqlite_lock_contention_fails_open_quickly(monkeypatch, tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    other_worker = SqliteStore(path)
+    store = SqliteStore(path, busy_timeout=0.05)
+    store.set("cache:gfg:alice", b"entry", 60)
+    monkeypatch.setattr(cache.settings, "cache_backend", "sqlite")
+    monkeypatch.setattr(cache, "_local_store", store)
+
+    async def scenario():
+        limits = [("handle:gfg:alice", 1, 60, "handle")]
+        return [await check_rate_limits(limits) for _ in range(2)], await cache.claim("warm:gfg:alice", 60)
+
+    with other_worker.transaction():  # holds the write lock throughout
+        started = time.perf_counter()
+        limited, claimed = asyncio.run(scenario())
+        elapsed = time.perf_counter() - started
+    assert all(result.allowed for result in limited) and not claimed
+    assert elapsed < 1
+    assert store.get("cache:gfg:alice") == b"entry"  # WAL readers are not blocked
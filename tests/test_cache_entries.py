@@ -0,0 +1,317 @@
+"""Cached responses are stored as binary entries and replayed byte for byte,
+from the local cache first and Redis second."""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+from starlette.responses import Response, StreamingResponse
+
+from core import metrics, middleware, write_behind
+from core.cache import pack_response, unpack_response
+from core.compression import accepts_encoding
+from core.local_cache import LocalCache
+from core.middleware import CacheRateLimitMiddleware
+from core.lookup import CacheLookup
+from core.rate_limit import RateLimitResult
+
+SVG = '<svg xmlns="http://www.w3.org/2000/svg"><text>✓ \x00 ünïcode</text></svg>'.encode("utf-8")
+
+
+def test_pack_response_round_trip():
+    headers = [(b"content-type", b"image/svg+xml"), (b"cache-control", b"public, max-age=86400")]
+    for codec in [None, "heatmap"]:
+        packed = pack_response(200, headers, SVG, codec)
+        assert unpack_response(packed) == (200, headers, SVG, codec)
+        assert packed.endswith(SVG)  # stored verbatim, no base64
+
+    packed = pack_response(200, headers, SVG)
+    for broken in [b"", packed[:20], b'{"body": "PHN2Zz4="}', b"XXXX" + packed[4:]]:
+        with pytest.raises(ValueError):
+            unpack_response(broken)
+
+
+def test_hit_replays_stored_bytes(monkeypatch):
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+        response = Response(SVG, media_type="image/svg+xml", headers={"Cache-Control": "public, max-age=86400"})
+        await response(scope, receive, send)
+
+    store = {}
+    ttls = []
+
+    async def fake_lookup(key, invalid_key, limits, invalid_limits):
+        return CacheLookup(cached=store.get(key))
+
+    async def fake_write_many(writes, messages=()):
+        for write in writes:
+            store[write.key] = write.value
+            ttls.append(write.ttl_seconds)
+
+    async def allow(*args):
+        return RateLimitResult(allowed=True)
+
+    monkeypatch.setattr(middleware, "cache_enabled", lambda: True)
+    monkeypatch.setattr(middleware, "lookup", fake_lookup)
+    monkeypatch.setattr(write_behind, "write_many", fake_write_many)
+    monkeypatch.setattr(middleware, "check_rate_limits", allow)
+    local = LocalCache(max_entries=8, max_bytes=1 << 20)
+    monkeypatch.setattr(middleware, "local_cache", local)
+    metrics.reset()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=CacheRateLimitMiddleware(app, "gfg"))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            miss = await client.get("/alice/badge")
+            local_hit = await client.get("/alice/badge")
+            local.clear()
+            hit = await client.get("/alice/badge")
+            (key,) = store
+            store[key] = b'{"status_code": 200, "body": "PHN2Zz4="}'  # pre-binary entry
+            local.clear()
+            stale = await client.get("/alice/badge")
+        return miss, local_hit, hit, stale
+
+    miss, local_hit, hit, stale = asyncio.run(scenario())
+    assert calls == ["/alice/badge", "/alice/badge"]
+    assert [r.headers["x-cache"] for r in (miss, local_hit, hit, stale)] == ["MISS", "HIT", "HIT", "MISS"]
+    for response in (local_hit, hit):
+        assert response.content == miss.content == SVG
+        assert response.headers["content-type"] == miss.headers["content-type"]
+        assert response.headers["cache-control"] == "public, max-age=86400"
+        assert response.headers["content-length"] == str(len(SVG))
+    assert ttls == [86400, 86400]
+
+    counts = metrics.snapshot()
+    assert (counts["cache.l1.hit"], counts["cache.l1.miss"]) == (1, 3)
+    assert (counts["cache.l2.hit"], counts["cache.l2.miss"]) == (1, 2)
+    assert counts["cache.l1.hit_ratio"] == 0.25
+
+
+
+def test_codec_entries_are_expanded_once_per_version(monkeypatch):
+    expanded = []
+
+    def expand(body):
+        expanded.append(body)
+        return body.lower()
+
+    async def app(scope, receive, send):
+        scope.setdefault("state", {})["cache_codec"] = "lower"
+        await Response(b'{"v":%d}' % len(store), media_type="application/json")(scope, receive, send)
+
+    store = {}
+
+    async def fake_lookup(key, invalid_key, limits, invalid_limits):
+        return CacheLookup(cached=store.get(key))
+
+    async def fake_write_many(writes, messages=()):
+        for write in writes:
+            store[write.key] = write.value
+
+    monkeypatch.setitem(middleware._CACHE_CODECS, "lower", (bytes.upper, expand))
+    monkeypatch.setattr(middleware, "cache_enabled", lambda: True)
+    monkeypatch.setattr(middleware, "lookup", fake_lookup)
+    monkeypatch.setattr(write_behind, "write_many", fake_write_many)
+    # responses never stay in the local cache, so every hit reads the entry
+    monkeypatch.setattr(middleware.settings, "l1_cache_ttl_seconds", 0)
+    local = LocalCache(max_entries=8, max_bytes=1 << 20)
+    monkeypatch.setattr(middleware, "local_cache", local)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=CacheRateLimitMiddleware(app, "gfg"))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = [await client.get("/alice/heatmap") for _ in range(3)]
+            local.clear()  # another worker, or the memo evicted
+            responses += [await client.get("/alice/heatmap") for _ in range(2)]
+            (key,) = store
+            store[key] = pack_response(200, [(b"content-type", b"application/json"), (b"etag", b'"v2"')], b'{"V":2}', "lower")
+            responses.append(await client.get("/alice/heatmap"))
+        return responses
+
+    responses = asyncio.run(scenario())
+    assert [r.headers["x-cache"] for r in responses] == ["MISS"] + ["HIT"] * 5
+    assert [r.content for r in responses] == [b'{"v":0}'] * 5 + [b'{"v":2}']
+    # primed by the miss, rebuilt once after the clear and once for the new entry
+    assert expanded == [b'{"V":0}', b'{"V":2}']
+    assert responses[-1].headers["etag"] == '"v2"'
+
+    now = [0.0]
+    cache = LocalCache(max_entries=3, max_bytes=100, clock=lambda: now[0])
+    for key in "abc":
+        cache.set(key, key.upper(), 30, ttl_seconds=10)
+    assert cache.get("a") == "A"  # a is now most recent
+
+    cache.set("d", "D", 30, ttl_seconds=10)  # over 100 bytes: evicts b
+    assert [cache.get(key) for key in "abcd"] == ["A", None, "C", "D"]
+    assert (len(cache), cache.size, cache.evictions) == (3, 90, 1)
+
+    cache.set("big", "X", 101, ttl_seconds=10)
+    assert cache.get("big") is None and len(cache) == 3
+
+    cache.set("short", "S", 1, ttl_seconds=1)  # evicts a, least recently read
+    now[0] = 1.0
+    assert [cache.get(key) for key in ["short", "a", "d"]] == [None, None, "D"]
+    now[0] = 10.0
+    assert cache.get("d") is None and len(cache) == 1
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("gzip, deflate, br", True),
+        ("br;q=1.0, gzip;q=0.5", True),
+        ("gzip;q=0", False),
+        ("*", True),
+        ("*;q=0", False),
+        ("identity", False),
+        ("", False),
+    ],
+)
+def test_accepts_encoding(header, expected):
+    assert accepts_encoding(header, "gzip") is expected
+
+
+def test_compressed_entries_served_as_is(monkeypatch):
+    body = json.dumps({"status": "success", "data": [{"question": f"Problem {n}"} for n in range(500)]}).encode()
+
+    async def app(scope, receive, send):
+        await Response(body, media_type="application/json")(scope, receive, send)
+
+    store = {}
+
+    async def fake_lookup(key, invalid_key, limits, invalid_limits):
+        return CacheLookup(cached=store.get(key))
+
+    async def fake_write_many(writes, messages=()):
+        for write in writes:
+            store[write.key] = write.value
+
+    monkeypatch.setattr(middleware, "cache_enabled", lambda: True)
+    monkeypatch.setattr(middleware, "lookup", fake_lookup)
+    monkeypatch.setattr(write_behind, "write_many", fake_write_many)
+    monkeypatch.setattr(middleware, "local_cache", LocalCache(max_entries=0, max_bytes=0))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=CacheRateLimitMiddleware(app, "gfg"))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            miss = await client.get("/alice/profile", headers={"Accept-Encoding": "gzip"})
+            gzipped = await client.get("/alice/profile", headers={"Accept-Encoding": "gzip"})
+            plain = await client.get("/alice/profile", headers={"Accept-Encoding": "identity"})
+        return miss, gzipped, plain
+
+    miss, gzipped, plain = asyncio.run(scenario())
+    (entry,) = store.values()
+    _, headers, stored, _ = unpack_response(entry)
+    assert (b"content-encoding", b"gzip") in headers
+    assert len(entry) * 5 < len(body)
+
+    assert "Accept-Encoding" in miss.headers["vary"]
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.num_bytes_downloaded == len(stored)
+    assert "content-encoding" not in plain.headers
+    assert plain.num_bytes_downloaded == len(body)
+    assert miss.content == gzipped.content == plain.content == body
+
+
+def test_if_none_match_gets_304_on_hits_and_misses(monkeypatch):
+    body = json.dumps({"status": "success", "data": ["x" * 40] * 100}).encode()
+
+    async def app(scope, receive, send):
+        await Response(body, media_type="application/json")(scope, receive, send)
+
+    store = {}
+
+    async def fake_lookup(key, invalid_key, limits, invalid_limits):
+        return CacheLookup(cached=store.get(key))
+
+    async def fake_write_many(writes, messages=()):
+        for write in writes:
+            store[write.key] = write.value
+
+    local = LocalCache(max_entries=8, max_bytes=1 << 20)
+    monkeypatch.setattr(middleware, "cache_enabled", lambda: True)
+    monkeypatch.setattr(middleware, "lookup", fake_lookup)
+    monkeypatch.setattr(write_behind, "write_many", fake_write_many)
+    monkeypatch.setattr(middleware, "local_cache", local)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=CacheRateLimitMiddleware(app, "gfg"))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            plain = {"Accept-Encoding": "identity"}
+            first = await client.get("/alice/stats?a=1", headers=plain)
+            etag = first.headers["etag"]
+            fresh = await client.get("/alice/stats?a=2", headers={**plain, "If-None-Match": etag})
+            local_hit = await client.get("/alice/stats?a=1", headers={**plain, "If-None-Match": f"W/{etag}"})
+            local.clear()
+            redis_hit = await client.get("/alice/stats?a=1", headers={**plain, "If-None-Match": f'"nope", {etag}'})
+            changed = await client.get("/alice/stats?a=1", headers={**plain, "If-None-Match": '"nope"'})
+            gzipped = await client.get("/alice/stats?a=1", headers={"Accept-Encoding": "gzip"})
+            gzip_304 = await client.get(
+                "/alice/stats?a=1",
+                headers={"Accept-Encoding": "gzip", "If-None-Match": gzipped.headers["etag"]},
+            )
+        return first, fresh, local_hit, redis_hit, changed, gzipped, gzip_304
+
+    first, fresh, local_hit, redis_hit, changed, gzipped, gzip_304 = asyncio.run(scenario())
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and first.content == body
+    for response, cache in [(fresh, "MISS"), (local_hit, "HIT"), (redis_hit, "HIT"), (gzip_304, "HIT")]:
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["x-cache"] == cache
+        assert "content-type" not in response.headers
+    assert fresh.headers["etag"] == local_hit.headers["etag"] == redis_hit.headers["etag"] == etag
+    assert (changed.status_code, changed.headers["etag"], changed.content) == (200, etag, body)
+
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.headers["etag"] == etag[:-1] + '-gzip"'
+    assert gzip_304.headers["etag"] == gzipped.headers["etag"]
+
+
+def test_streamed_misses_get_the_etag_of_their_entry(monkeypatch):
+    body = json.dumps({"status": "success", "data": ["y" * 40] * 100}).encode()
+
+    async def app(scope, receive, send):
+        async def chunks():
+            for start in range(0, len(body), 1000):
+                yield body[start:start + 1000]
+
+        await StreamingResponse(chunks(), media_type="application/json")(scope, receive, send)
+
+    store = {}
+
+    async def fake_lookup(key, invalid_key, limits, invalid_limits):
+        return CacheLookup(cached=store.get(key))
+
+    async def fake_write_many(writes, messages=()):
+        for write in writes:
+            store[write.key] = write.value
+
+    local = LocalCache(max_entries=8, max_bytes=1 << 20)
+    monkeypatch.setattr(middleware, "cache_enabled", lambda: True)
+    monkeypatch.setattr(middleware, "lookup", fake_lookup)
+    monkeypatch.setattr(write_behind, "write_many", fake_write_many)
+    monkeypatch.setattr(middleware, "local_cache", local)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=CacheRateLimitMiddleware(app, "gfg"))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            gzip = {"Accept-Encoding": "gzip"}
+            miss = await client.get("/alice/stats", headers=gzip)
+            revalidated = await client.get("/alice/stats", headers={**gzip, "If-None-Match": miss.headers["etag"]})
+            local.clear()
+            hit = await client.get("/alice/stats", headers=gzip)
+            plain_miss = await client.get("/alice/stats?p=1", headers={"Accept-Encoding": "identity"})
+        return miss, revalidated, hit, plain_miss
+
+    miss, revalidated, hit, plain_miss = asyncio.run(scenario())
+    assert miss.headers["x-cache"] == "MISS" and miss.content == body
+    assert miss.headers["content-encoding"] == hit.headers["content-encoding"] == "gzip"
+    assert miss.headers["etag"] == hit.headers["etag"] == revalidated.headers["etag"]
+    assert revalidated.status_code == 304
+    assert plain_miss.headers["etag"] == miss.headers["etag"].replace("-gzip", "")
+    assert "content-encoding" not in plain_miss.headers and plain_miss.content == body
@@ -0,0 +1,56 @@
+"""An unreachable Redis trips the breaker; calls then use the local fallback at once."""
+
+import asyncio
+import time
+
+from core import cache
+from core.circuit_breaker import CircuitBreaker
+from core.metrics import snapshot
+
+
+def test_breaker_opens_probes_and_closes():
+    now = [0.0]
+    breaker = CircuitBreaker("test", failure_threshold=2, cooldown_seconds=10, clock=lambda: now[0])
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    now[0] = 10
+    assert breaker.allow() and breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()  # one probe at a time
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    now[0] = 20
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.state_code() == 0
+
+
+def test_unreachable_redis_falls_back_to_memory(monkeypatch):
+    now = [0.0]
+    breaker = CircuitBreaker("redis", failure_threshold=2, cooldown_seconds=10, clock=lambda: now[0])
+    monkeypatch.setattr(cache, "redis_breaker", breaker)
+    monkeypatch.setattr(cache.settings, "cache_backend", "redis")
+    monkeypatch.setattr(cache.settings, "redis_url", "redis://127.0.0.1:1/0")
+    monkeypatch.setattr(cache, "_client", None)
+    monkeypatch.setattr(cache, "_bytes_client", None)
+    monkeypatch.setattr(cache, "_fallback_store", None)
+
+    async def scenario():
+        started = time.perf_counter()
+        for n in range(3):
+            await cache.set_json(f"k{n}", {"n": n}, 60)
+        value = await cache.get_json("k2")
+        return value, time.perf_counter() - started
+
+    value, elapsed = asyncio.run(scenario())
+    # two refused connections open the breaker; the rest never touch the socket
+    assert breaker.state == CircuitBreaker.OPEN and breaker.failures == 2
+    assert value == {"n": 2} and elapsed < 2
+    assert cache.get_redis() is None and snapshot()["redis.breaker.state"] == 2
+
+    now[0] = 10  # the probe fails too and re-opens it
+    asyncio.run(cache.get_json("k2"))
+    assert breaker.state == CircuitBreaker.OPEN and breaker.failures == 3
@@ -0,0 +1,138 @@
+"""The compact heatmap encoding must round-trip the canonical JSON exactly."""
+
+import asyncio
+import random
+from datetime import date
+
+import httpx
+import pytest
+from starlette.responses import JSONResponse
+
+import app as app_module
+from core import middleware, write_behind
+from core.cache import unpack_response
+from core.local_cache import LocalCache
+from core.lookup import CacheLookup
+from models.canonical import make_envelope
+from models.canonical.heatmap import HeatDay, Heatmap
+from services import heatmap as heatmap_service
+from services.heatmap_codec import (
+    MEDIA_TYPE,
+    compact_envelope,
+    decode_heatmaps,
+    encode_heatmaps,
+    expand_envelope,
+)
+from services.heatmap_engine import BaseHeatmap, DayCounts, SubmissionTimes, project
+
+
+def _base(seed: int = 4, years: int = 8) -> BaseHeatmap:
+    rng = random.Random(seed)
+    today = date.today()
+    start = today.toordinal() - 365 * years
+    ordinals = [
+        ordinal
+        for ordinal in range(start, today.toordinal() + 1)
+        if rng.random() < 0.5
+        for _ in range(rng.choice([1, 1, 2, 3, 200]))
+    ]
+    return BaseHeatmap.build(DayCounts.from_ordinals(ordinals, start, today.toordinal()))
+
+
+def _dumps(heatmaps):
+    return [heatmap.model_dump() for heatmap in heatmaps]
+
+
+def test_round_trip_matches_json_form():
+    base = _base()
+    today = date.today()
+    windows = [
+        project(base, "all", None),
+        project(base, "last_365", None),
+        project(base, "year", today.year - 3),
+        Heatmap(),
+        Heatmap(view="custom ✓", year=2024, firstActiveDate="2024-02-29"),
+        # irregular days take the per-day fallback layout
+        Heatmap(dailyContributions=[
+            HeatDay(date="2024-03-02", count=0, level=0),
+            HeatDay(date="2024-03-01", count=5, level=7),
+        ]),
+    ]
+    encoded = encode_heatmaps(windows)
+    assert _dumps(decode_heatmaps(encoded)) == _dumps(windows)
+
+    with pytest.raises(ValueError):
+        decode_heatmaps(encoded[:-1])
+    with pytest.raises(ValueError):
+        decode_heatmaps(b"nope" + encoded)
+
+
+@pytest.mark.parametrize("many", [False, True])
+def test_envelope_compaction_is_byte_exact_and_small(many):
+    base = _base(seed=8)
+    heatmaps = [project(base, "all", None), project(base, "last_365", None)]
+    data = _dumps(heatmaps) if many else heatmaps[0]
+    body = JSONResponse(make_envelope("alice", data, legacy={"cursor": "c", "since": None})).body
+
+    compact = compact_envelope(body)
+    assert expand_envelope(compact) == body
+    assert len(compact) * 10 < len(body)
+
+
+def test_envelope_without_heatmap_is_rejected():
+    body = JSONResponse(make_envelope("alice", {"count": 0})).body
+    with pytest.raises(ValueError):
+        compact_envelope(body)
+
+
+def test_wire_format_and_compact_cache(monkeypatch):
+    counts = _base(seed=2, years=3).counts
+    epoch = date(1970, 1, 1).toordinal()
+    times = SubmissionTimes.from_wall_clock(
+        [(o - epoch) * 86400 + 3600 for o in counts.active_ordinals() for _ in range(counts.count_on(o))],
+        (counts.start - epoch) * 86400,
+    )
+
+    async def fake_times(username):
+        return times
+
+    store = {}
+
+    async def fake_lookup(key, invalid_key, limits, invalid_limits):
+        return CacheLookup(cached=store.get(key))
+
+    async def fake_write_many(writes, messages=()):
+        for write in writes:
+            store[write.key] = write.value
+
+    monkeypatch.setattr(heatmap_service, "get_user_submission_times", fake_times)
+    monkeypatch.setattr(middleware, "cache_enabled", lambda: True)
+    monkeypatch.setattr(middleware, "lookup", fake_lookup)
+    monkeypatch.setattr(write_behind, "write_many", fake_write_many)
+    monkeypatch.setattr(middleware, "local_cache", LocalCache(max_entries=8, max_bytes=1 << 20))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            miss = await client.get("/alice/heatmap?view=last_365")
+            hit = await client.get("/alice/heatmap?view=last_365")
+            binary = await client.get("/alice/heatmap?view=last_365", headers={"Accept": MEDIA_TYPE})
+        return miss, hit, binary
+
+    heatmap_service._BASE_CACHE.clear()
+    try:
+        miss, hit, binary = asyncio.run(scenario())
+    finally:
+        heatmap_service._BASE_CACHE.clear()
+
+    assert (miss.headers["x-cache"], hit.headers["x-cache"]) == ("MISS", "HIT")
+    assert hit.content == miss.content
+    assert "Accept" in hit.headers["vary"]
+    # JSON is stored compacted; the binary variant has its own entry, as-is
+    assert [unpack_response(entry)[3] for entry in store.values()] == ["heatmap", None]
+
+    assert binary.headers["x-cache"] == "MISS"
+    assert binary.headers["content-type"] == MEDIA_TYPE
+    assert binary.headers["x-heatmap-cursor"] == miss.json()["cursor"]
+    assert _dumps(decode_heatmaps(binary.content)) == [miss.json()["data"]]
+    assert len(binary.content) * 10 < len(miss.content)
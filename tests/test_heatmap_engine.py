@@ -0,0 +1,299 @@
+"""The array-backed heatmap engine must match the dict-based mapper + window path."""
+
+import asyncio
+import random
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from services import heatmap as heatmap_service
+from services.canonical_mapper import heatmap_from
+from services.heatmap_engine import BaseHeatmap, DayCounts, SubmissionTimes, project, project_range, window_counts
+from services.heatmap_window import window_heatmap
+
+
+def _today():
+    return datetime.now(timezone.utc).date()
+
+
+def _random_counts(seed: int, years: int = 4, density: float = 0.4) -> DayCounts:
+    rng = random.Random(seed)
+    today = _today()
+    created = today - timedelta(days=365 * years)
+    ordinals = []
+    for offset in range((today - created).days + 1):
+        if rng.random() < density:
+            ordinals.extend([created.toordinal() + offset] * rng.randint(1, 9))
+    rng.shuffle(ordinals)
+    return DayCounts.from_ordinals(ordinals, created.toordinal(), today.toordinal())
+
+
+def _times(counts: DayCounts) -> SubmissionTimes:
+    """Submission instants at noon UTC on every counted day."""
+    epoch = date(1970, 1, 1).toordinal()
+    noon = [
+        (ordinal - epoch) * 86400 + 43200
+        for ordinal in counts.active_ordinals()
+        for _ in range(counts.count_on(ordinal))
+    ]
+    return SubmissionTimes.from_wall_clock(noon, (counts.start - epoch) * 86400)
+
+
+def _legacy(counts: DayCounts, view: str, year):
+    entries = [
+        {"date": date.fromordinal(o).isoformat(), "count": counts.count_on(o)}
+        for o in counts.active_ordinals()
+    ]
+    return window_heatmap(
+        heatmap_from({"heatmap": entries}),
+        view,
+        year,
+        available_years=counts.available_years(_today()),
+    )
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+@pytest.mark.parametrize("view,year_offset", [("all", None), ("last_365", None), ("year", 0), ("year", -2), ("year", -9)])
+def test_window_counts_matches_legacy_path(seed, view, year_offset):
+    counts = _random_counts(seed)
+    year = _today().year + year_offset if year_offset is not None else None
+    expected = _legacy(counts, view, year).model_dump()
+    assert window_counts(counts, view, year).model_dump() == expected
+    assert project(BaseHeatmap.build(counts), view, year).model_dump() == expected
+
+
+def test_empty_history():
+    today = _today()
+    counts = DayCounts.from_ordinals([], today.toordinal() - 30, today.toordinal())
+    hm = window_counts(counts, "all")
+    assert hm.totalSubmissions == 0
+    assert hm.dailyContributions == []
+    assert hm.startDate is None and hm.endDate is None
+    assert hm.availableYears[0] == today.year
+
+
+def test_out_of_range_submissions_are_dropped():
+    counts = DayCounts.from_ordinals([9, 10, 10, 12, 13], 10, 12)
+    assert list(counts.counts) == [2, 0, 1]
+    assert counts.total() == 3
+    assert counts.active_days() == 2
+    assert counts.max(11, 13) == 1
+
+
+def test_streaks():
+    base = BaseHeatmap.build(DayCounts.from_ordinals([1, 2, 3, 5, 6, 9], 1, 9))
+    assert base.longest_streak(1, 10) == 3
+    assert base.longest_streak(2, 10) == 2
+    assert base.longest_streak(7, 9) == 0
+    counts = DayCounts.from_ordinals([100, 101, 102, 104], 100, 104)
+    assert counts.current_streak(104) == 1
+    assert counts.current_streak(103) == 3
+    assert counts.current_streak(103, lo=101) == 2
+
+
+def test_projection_leaves_base_untouched():
+    base = BaseHeatmap.build(_random_counts(5))
+    snapshot = [day.model_dump() for day in base.days]
+    year = _today().year - 1
+    first = project(base, "year", year)
+    project(base, "last_365")
+    project(base, "all")
+    assert [day.model_dump() for day in base.days] == snapshot
+    assert project(base, "year", year).model_dump() == first.model_dump()
+
+
+def test_windows_share_one_cached_base(monkeypatch):
+    calls = []
+
+    async def fake_times(username):
+        calls.append(username)
+        return _times(_random_counts(6))
+
+    monkeypatch.setattr(heatmap_service, "get_user_submission_times", fake_times)
+    heatmap_service._BASE_CACHE.clear()
+    try:
+        year = _today().year
+
+        async def scenario():
+            everything = await heatmap_service.get_windowed_heatmap("Alice", "all")
+            recent = await heatmap_service.get_windowed_heatmap("alice", "last365days")
+            this_year = await heatmap_service.get_windowed_heatmap("alice", "year", year)
+            again = await heatmap_service.get_windowed_heatmap("alice", "year", year)
+            return everything, recent, this_year, again
+
+        everything, recent, this_year, again = asyncio.run(scenario())
+    finally:
+        heatmap_service._BASE_CACHE.clear()
+
+    assert calls == ["Alice"]
+    assert (everything.view, recent.view, this_year.view) == ("all", "last_365", "year")
+    assert again is this_year
+
+
+def test_range_queries_match_brute_force():
+    counts = _random_counts(11, years=3, density=0.3)
+    base = BaseHeatmap.build(counts)
+    rng = random.Random(11)
+    for _ in range(300):
+        lo = rng.randrange(counts.start - 20, counts.end + 20)
+        hi = rng.randrange(lo, counts.end + 40)
+        window = [counts.count_on(o) for o in range(lo, hi)]
+        active = [o for o in range(lo, hi) if counts.count_on(o)]
+        assert counts.total(lo, hi) == sum(window)
+        assert counts.max(lo, hi) == max(window, default=0)
+        assert counts.active_days(lo, hi) == len(active)
+        assert counts.first_active(lo, hi) == (active[0] if active else None)
+        assert counts.last_active(lo, hi) == (active[-1] if active else None)
+
+        hm = project_range(base, date.fromordinal(lo), date.fromordinal(hi - 1) if hi > lo else date.fromordinal(lo), include_days=True)
+        if hi > lo:
+            assert [d.date for d in hm.dailyContributions] == [date.fromordinal(o).isoformat() for o in active]
+            assert hm.totalSubmissions == sum(window)
+
+
+def test_range_without_days_skips_daily_list():
+    counts = _random_counts(12)
+    today = _today()
+    hm = project_range(BaseHeatmap.build(counts), today - timedelta(days=180), today)
+    assert hm.view == "range"
+    assert hm.dailyContributions == []
+    assert hm.totalActiveDays == counts.active_days(today.toordinal() - 180, today.toordinal() + 1)
+    assert hm.startDate == (today - timedelta(days=180)).isoformat()
+
+
+def test_cursor_delta_sync(monkeypatch):
+    today = _today()
+    ordinals = [today.toordinal() - offset for offset in range(1, 200, 2)] * 2
+
+    async def fake_times(username):
+        return _times(DayCounts.from_ordinals(ordinals, today.toordinal() - 400, today.toordinal()))
+
+    async def poll(cursor=None):
+        heatmap_service._BASE_CACHE.clear()
+        source = await heatmap_service.get_heatmap_source("alice")
+        heatmaps, next_cursor, since = heatmap_service.heatmap_delta(source, [source.window("last_365")], cursor=cursor)
+        return heatmaps and heatmaps[0], next_cursor, since
+
+    monkeypatch.setattr(heatmap_service, "get_user_submission_times", fake_times)
+    try:
+        full, cursor, since = asyncio.run(poll())
+        assert since is None and len(full.dailyContributions) == 100
+
+        unchanged, same_cursor, _ = asyncio.run(poll(cursor))
+        assert unchanged is None and same_cursor == cursor
+
+        ordinals.append(today.toordinal())
+        delta, next_cursor, since = asyncio.run(poll(cursor))
+        assert since == today
+        assert [d.date for d in delta.dailyContributions] == [today.isoformat()]
+        assert delta.totalSubmissions == 201
+        assert next_cursor != cursor
+
+        # a new daily maximum rescales old levels, so the whole window comes back
+        ordinals.extend([today.toordinal()] * 5)
+        rescaled, _, since = asyncio.run(poll(next_cursor))
+        assert since is None and len(rescaled.dailyContributions) == 101
+    finally:
+        heatmap_service._BASE_CACHE.clear()
+
+
+@pytest.mark.parametrize("cache_size", [0, 16])
+def test_multi_window_request_fetches_once(monkeypatch, cache_size):
+    import httpx
+    from fastapi import FastAPI
+
+    from routes.heatmap import _requested_windows, router
+
+    calls = []
+    counts = _random_counts(4)
+
+    async def fake_times(username):
+        calls.append(username)
+        return _times(counts)
+
+    monkeypatch.setattr(heatmap_service, "get_user_submission_times", fake_times)
+    monkeypatch.setattr(heatmap_service.settings, "heatmap_cache_size", cache_size)
+    heatmap_service._BASE_CACHE.clear()
+    year = _today().year
+    windows = _requested_windows("last365days", None, f"{year - 1}, {year},{year}", None)
+    assert windows == [("last_365", None), ("year", year - 1), ("year", year)]
+    app = FastAPI()
+    app.include_router(router)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            params = {"view": "last365days", "years": f"{year - 1}, {year},{year}"}
+            first = await client.get("/alice/heatmap", params=params)
+            again = await client.get("/alice/heatmap", params={**params, "cursor": first.json()["cursor"]})
+            return first, again
+
+    try:
+        first, again = asyncio.run(scenario())
+    finally:
+        heatmap_service._BASE_CACHE.clear()
+
+    # one fetch per request, cursor included; with the cache on the second is free
+    assert calls == ["alice"] * (2 if cache_size == 0 else 1)
+    assert first.json()["data"] == [window_counts(counts, view, year).model_dump() for view, year in windows]
+    assert again.status_code == 304
+
+
+def test_views_take_their_own_years():
+    from fastapi import HTTPException
+
+    from routes.heatmap import _requested_windows
+
+    assert _requested_windows(None, "all, year:2023,year:2021", None, None) == [
+        ("all", None),
+        ("year", 2023),
+        ("year", 2021),
+    ]
+    assert _requested_windows(None, "year", None, 2022) == [("year", 2022)]
+    for views, year, status in [("", None, 422), (" , ", None, 422), ("all,year", 2023, 422), ("year:1999", None, 400)]:
+        with pytest.raises(HTTPException) as raised:
+            _requested_windows(None, views, None, year)
+        assert raised.value.status_code == status
+
+
+def test_timezones_rebucket_cached_epochs(monkeypatch):
+    from zoneinfo import ZoneInfo
+
+    calls = []
+    start = datetime(2024, 3, 9, tzinfo=timezone.utc)
+    # one submission every 37 minutes across a US DST switch
+    epochs = [int(start.timestamp()) + minute * 60 for minute in range(0, 3 * 24 * 60, 37)]
+
+    async def fake_times(username):
+        calls.append(username)
+        return SubmissionTimes.from_wall_clock(epochs, epochs[0] - 86400)
+
+    monkeypatch.setattr(heatmap_service, "get_user_submission_times", fake_times)
+    heatmap_service._BASE_CACHE.clear()
+    try:
+        for name in ["UTC", "Asia/Kolkata", "America/New_York", "Pacific/Chatham"]:
+            zone = ZoneInfo(name)
+            hm = asyncio.run(heatmap_service.get_windowed_heatmap("alice", "all", tz=name))
+            expected = {}
+            for epoch in epochs:
+                day = datetime.fromtimestamp(epoch, zone).date().isoformat()
+                expected[day] = expected.get(day, 0) + 1
+            assert {d.date: d.count for d in hm.dailyContributions} == expected, name
+    finally:
+        heatmap_service._BASE_CACHE.clear()
+
+    assert calls == ["alice"]
+    with pytest.raises(heatmap_service.HTTPException) as error:
+        heatmap_service.resolve_timezone("Mars/Olympus_Mons")
+    assert error.value.status_code == 400
+
+
+def test_source_timezone_shifts_wall_clock():
+    from zoneinfo import ZoneInfo
+
+    # 2024-06-01 00:30 read as IST is 2024-05-31 19:00 UTC
+    wall = int(datetime(2024, 6, 1, 0, 30, tzinfo=timezone.utc).timestamp())
+    times = SubmissionTimes.from_wall_clock([wall], wall - 86400 * 3, ZoneInfo("Asia/Kolkata"))
+    assert times.epochs[0] == wall - 5 * 3600 - 1800
+    counts = times.day_counts(timezone.utc, date(2024, 6, 2))
+    assert counts.active_ordinals() == [date(2024, 5, 31).toordinal()]
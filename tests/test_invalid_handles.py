@@ -0,0 +1,159 @@
+"""Malformed handles are rejected outright; confirmed-missing ones are answered on a miss without an upstream call."""
+
+import asyncio
+import hashlib
+import time
+
+import httpx
+from starlette.responses import JSONResponse
+
+from core import cache, middleware
+from core.cache import pack_response
+from core.cache_backends import MemoryStore
+from core.invalid_handles import BloomFilter, InvalidHandles
+from core.local_cache import LocalCache
+from core.lookup import CacheLookup
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.001)
+    for n in range(1000):
+        bloom.add(f"typo{n}")
+    assert all(f"typo{n}" in bloom for n in range(1000))
+    assert sum(f"user{n}" in bloom for n in range(20000)) < 100
+
+
+def test_entries_expire_with_generations_and_sync_from_redis():
+    now = [0.0]
+    handles = InvalidHandles(capacity=100, error_rate=0.001, ttl_seconds=300, clock=lambda: now[0])
+    handles.add("ghost")
+    now[0] = 160
+    assert "ghost" in handles  # one rotation: in the previous generation
+    now[0] = 320
+    assert "ghost" not in handles
+
+    confirmed_at = time.time() * 1000
+
+    class FakeClient:
+        async def zrangebyscore(self, key, low, high, withscores):
+            self.args = (key, low, high)
+            return [("bot-probe", confirmed_at)]
+
+    client = FakeClient()
+    asyncio.run(handles.sync(client, "invalid-handles:gfg"))
+    assert "bot-probe" in handles and handles.synced_until == confirmed_at
+    assert client.args[0] == "invalid-handles:gfg" and client.args[1].startswith("(")
+
+
+def test_discarded_handles_stay_cleared_until_their_generations_rotate_out():
+    now = [0.0]
+    handles = InvalidHandles(capacity=100, error_rate=0.001, ttl_seconds=300, clock=lambda: now[0])
+    handles.add("ghost")
+    now[0] = 160
+    handles.add("ghost")  # in both generations now
+    handles.discard("ghost")
+    assert "ghost" not in handles
+    now[0] = 320
+    assert "ghost" not in handles  # still in the previous generation, still cleared
+    handles.add("ghost")  # confirmed missing again
+    assert "ghost" in handles
+
+    class FakeClient:
+        async def zrangebyscore(self, key, low, high, withscores):
+            return [("ghost", time.time() * 1000), ("!ghost", time.time() * 1000 + 1)]
+
+    asyncio.run(handles.sync(FakeClient(), "invalid-handles:gfg"))
+    assert "ghost" not in handles
+
+
+def test_a_full_generation_rotates_early():
+    handles = InvalidHandles(capacity=50, error_rate=0.01, ttl_seconds=300, clock=lambda: 0.0)
+    for n in range(1000):
+        handles.add(f"probe{n}")
+    assert len(handles) <= 100
+    assert sum(f"user{n}" in handles for n in range(10000)) < 400
+
+
+def test_middleware_filters_on_a_miss_only(monkeypatch):
+    handles = InvalidHandles(capacity=100, error_rate=0.001, ttl_seconds=300)
+    handles.add("ghost")
+    monkeypatch.setattr(middleware, "invalid_handles", handles)
+    monkeypatch.setattr(middleware, "local_cache", LocalCache(max_entries=0, max_bytes=0))
+    monkeypatch.setattr(middleware, "cache_enabled", lambda: True)
+
+    async def fake_lookup(cache_key, *args):
+        return CacheLookup(cached=entry if cache_key == cached_key else None)
+
+    monkeypatch.setattr(middleware, "lookup", fake_lookup)
+    app = middleware.CacheRateLimitMiddleware(JSONResponse({}), "gfg")
+    entry = pack_response(200, [(b"content-type", b"application/json")], b"{}")
+    cached_key = "cache:gfg:" + hashlib.sha256(b"GET:/ghost/badge:").hexdigest()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            paths = ("/ghost/stats", "/Ghost", "/ghost/badge", "/%3Cscript%3E/stats", "/a%20b")
+            return [await client.get(path) for path in paths]
+
+    responses = asyncio.run(scenario())
+    assert [r.status_code for r in responses] == [404, 404, 200, 404, 404]
+    assert [r.headers["x-cache"] for r in responses] == ["NEGATIVE-HIT", "NEGATIVE-HIT", "HIT", "REJECTED", "REJECTED"]
+
+
+def test_only_confirmed_missing_users_are_recorded(monkeypatch):
+    handles = InvalidHandles(capacity=100, error_rate=0.001, ttl_seconds=300)
+    monkeypatch.setattr(middleware, "invalid_handles", handles)
+    monkeypatch.setattr(cache.settings, "cache_backend", "memory")
+    monkeypatch.setattr(cache, "_local_store", MemoryStore(max_entries=100))
+    monkeypatch.setattr(middleware, "local_cache", LocalCache(max_entries=0, max_bytes=0))
+
+    async def app(scope, receive, send):
+        if scope["path"] == "/alice/nope":
+            response = JSONResponse({"detail": "Not Found"}, status_code=404)
+        elif scope["path"].startswith("/ghost"):
+            response = JSONResponse({"error": True, "message": "User 'ghost' not found on GeeksForGeeks"}, status_code=404)
+        else:
+            response = JSONResponse({"ok": True})
+        await response(scope, receive, send)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=middleware.CacheRateLimitMiddleware(app, "gfg"))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            paths = ("/alice/stats", "/alice/nope", "/alice/stats", "/alice/profile", "/ghost/stats", "/ghost/profile")
+            return [await client.get(path) for path in paths]
+
+    responses = asyncio.run(scenario())
+    assert [(r.status_code, r.headers["x-cache"]) for r in responses] == [
+        (200, "MISS"),
+        (404, "MISS"),
+        (200, "HIT"),
+        (200, "MISS"),
+        (404, "MISS"),
+        (404, "NEGATIVE-HIT"),
+    ]
+    assert "alice" not in handles and "ghost" in handles
+
+
+def test_filtered_misses_are_charged_to_the_invalid_limits(monkeypatch):
+    handles = InvalidHandles(capacity=100, error_rate=0.001, ttl_seconds=300)
+    handles.add("ghost")
+    monkeypatch.setattr(middleware, "invalid_handles", handles)
+    monkeypatch.setattr(cache.settings, "cache_backend", "memory")
+    monkeypatch.setattr(cache, "_local_store", MemoryStore(max_entries=100))
+    monkeypatch.setattr(middleware, "local_cache", LocalCache(max_entries=0, max_bytes=0))
+    monkeypatch.setattr(middleware.settings, "rate_limit_mode", "exact")
+    monkeypatch.setattr(middleware.settings, "rate_limit_ip_requests", 3)
+    monkeypatch.setattr(middleware.settings, "invalid_rate_limit_handle_requests", 2)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=middleware.CacheRateLimitMiddleware(JSONResponse({}), "gfg"))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            probes = [await client.get(f"/ghost/stats?n={n}") for n in range(4)]
+            served = [await client.get(f"/alice/stats?n={n}") for n in range(3)]
+        return probes, served
+
+    probes, served = asyncio.run(scenario())
+    assert [r.status_code for r in probes] == [404, 404, 429, 429]
+    assert probes[2].json()["limitedBy"] == "invalid-handle"
+    # the probes left the ip budget of well-behaved requests untouched
+    assert [r.status_code for r in served] == [200, 200, 200]
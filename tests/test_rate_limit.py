@@ -0,0 +1,153 @@
+"""Limits (and the cache lookup) are one script call whose reply maps to a result."""
+
+import asyncio
+
+from core import lookup as lookup_module
+from core import rate_limit
+from core.lookup import lookup
+from core.rate_limit import check_rate_limits
+
+
+class FakeClient:
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = []
+        self.registered = 0
+
+    def register_script(self, source):
+        self.registered += 1
+
+        async def script(keys, args):
+            self.calls.append((keys, args))
+            reply = self.replies.pop(0)
+            if isinstance(reply, Exception):
+                raise reply
+            return reply
+
+        return script
+
+
+LIMITS = [("ip:gfg:1.2.3.4", 60, 60, "ip"), ("handle:gfg:alice", 30, 60, "handle")]
+
+
+def test_one_call_for_both_limits(monkeypatch):
+    client = FakeClient(
+        [
+            [1, 2, 0, 29, 1_700_000_002_001],
+            [0, 1, 4, 0, 1_700_000_004_000],
+            ConnectionError("down"),
+        ]
+    )
+    monkeypatch.setattr(rate_limit, "get_redis", lambda: client)
+    monkeypatch.setattr(rate_limit.settings, "rate_limit_mode", "exact")
+    monkeypatch.setattr(rate_limit.settings, "rate_limit_backoff_base_seconds", 2)
+    monkeypatch.setattr(rate_limit.settings, "rate_limit_backoff_max_seconds", 300)
+
+    allowed = asyncio.run(check_rate_limits(LIMITS))
+    assert allowed == rate_limit.RateLimitResult(True, 0, "handle", 30, 29, 1_700_000_003)
+
+    denied = asyncio.run(check_rate_limits(LIMITS))
+    assert denied == rate_limit.RateLimitResult(False, 4, "ip", 60, 0, 1_700_000_004)
+
+    # Redis trouble fails open, as before
+    assert asyncio.run(check_rate_limits(LIMITS)).allowed
+
+    keys, args = client.calls[0]
+    assert keys == [
+        "backoff:ip:gfg:1.2.3.4",
+        "violations:ip:gfg:1.2.3.4",
+        "gcra:ip:gfg:1.2.3.4",
+        "backoff:handle:gfg:alice",
+        "violations:handle:gfg:alice",
+        "gcra:handle:gfg:alice",
+    ]
+    assert args == [2, 300, 60, 60, 30, 60]
+    assert len(client.calls) == 3 and client.registered == 1
+
+
+def test_without_redis_everything_is_allowed(monkeypatch):
+    monkeypatch.setattr(rate_limit, "get_redis", lambda: None)
+    assert asyncio.run(check_rate_limits(LIMITS)).allowed
+
+
+INVALID_LIMITS = [("invalid-ip:gfg:1.2.3.4", 10, 600, "invalid-ip"), ("invalid-handle:gfg:alice", 5, 600, "invalid-handle")]
+
+
+def test_lookup_is_one_call(monkeypatch):
+    client = FakeClient(
+        [
+            [1, b"GCR1entry"],
+            [0, 0, [1, 2, 0, 29, 1_700_000_002_001]],
+            [0, 1, [0, 2, 8, 0, 1_700_000_008_000]],
+            TimeoutError(),
+        ]
+    )
+    monkeypatch.setattr(lookup_module, "get_bytes_redis", lambda: client)
+    monkeypatch.setattr(rate_limit.settings, "rate_limit_mode", "exact")
+
+    def run():
+        return asyncio.run(lookup("cache:gfg:k", "invalid:gfg:alice", LIMITS, INVALID_LIMITS))
+
+    hit = run()
+    assert hit.cached == b"GCR1entry" and hit.limited.allowed and not hit.invalid
+
+    miss = run()
+    assert miss.cached is None and not miss.invalid
+    assert (miss.limited.allowed, miss.limited.limited_by, miss.limited.remaining) == (True, "handle", 29)
+
+    invalid = run()
+    assert invalid.invalid
+    assert (invalid.limited.allowed, invalid.limited.limited_by, invalid.limited.retry_after) == (
+        False,
+        "invalid-handle",
+        8,
+    )
+
+    failed = run()
+    assert failed.cached is None and failed.limited.allowed
+
+    keys, args = client.calls[0]
+    assert keys[:2] == ["cache:gfg:k", "invalid:gfg:alice"]
+    assert keys[2:5] == ["backoff:ip:gfg:1.2.3.4", "violations:ip:gfg:1.2.3.4", "gcra:ip:gfg:1.2.3.4"]
+    assert keys[-1] == "gcra:invalid-handle:gfg:alice" and len(keys) == 14
+    assert args[2:] == [2, 2, 60, 60, 30, 60, 10, 600, 5, 600]
+    assert client.registered == 1
+
+
+def test_hybrid_limits_decide_locally_and_sync_in_batches(monkeypatch):
+    client = FakeClient([[54_000], ConnectionError("down")])
+    limiter = rate_limit.LocalRateLimiter(max_entries=100)
+    monkeypatch.setattr(rate_limit.settings, "rate_limit_sync_max_pending", 3)
+    limits = [("ip:gfg:1.2.3.4", 10, 60, "ip")]
+
+    async def scenario():
+        local = [await limiter.check(client, limits) for _ in range(3)]
+        assert client.calls == []
+        # the fourth request syncs first and learns that other workers used 6 more
+        synced = await limiter.check(client, limits)
+        denied = await limiter.check(client, limits)
+        return local, synced, denied
+
+    local, synced, denied = asyncio.run(scenario())
+    assert all(result.allowed for result in local) and local[-1].remaining == 7
+    assert client.calls == [(["gcra:ip:gfg:1.2.3.4"], [3, "6000.000"])]
+    assert synced.allowed and synced.remaining == 0
+    assert not denied.allowed and denied.limited_by == "ip"
+    assert limiter.pending == {"ip:gfg:1.2.3.4": (1, 6000.0)}
+
+    # a failed sync drops the batch and keeps deciding locally
+    asyncio.run(limiter.sync(client))
+    assert limiter.pending == {}
+
+
+def test_hybrid_lookup_leaves_limits_out_of_the_script(monkeypatch):
+    client = FakeClient([[0, 0, [1, 0, 0, 0, 1_700_000_000_000]]])
+    monkeypatch.setattr(lookup_module, "get_bytes_redis", lambda: client)
+    monkeypatch.setattr(lookup_module, "local_rate_limiter", rate_limit.LocalRateLimiter(max_entries=100))
+    monkeypatch.setattr(rate_limit.settings, "rate_limit_mode", "hybrid")
+
+    miss = asyncio.run(lookup("cache:gfg:k", "invalid:gfg:alice", LIMITS, INVALID_LIMITS))
+    assert (miss.limited.allowed, miss.limited.limited_by, miss.limited.remaining) == (True, "handle", 29)
+    keys, args = client.calls[0]
+    assert keys == ["cache:gfg:k", "invalid:gfg:alice"]
+    assert args[2:] == [0, 0]
@@ -0,0 +1,123 @@
+"""The Lua scripts themselves, run by fakeredis' embedded Lua and checked against
+``check_limits_locally``, their pure-Python counterpart."""
+
+import asyncio
+import dataclasses
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+from core import config, lookup as lookup_module, rate_limit  # noqa: E402
+from core.cache_backends import MemoryStore  # noqa: E402
+from core.lookup import lookup  # noqa: E402
+from core.rate_limit import LocalRateLimiter, check_limits_locally, check_rate_limits  # noqa: E402
+
+LIMITS = [("ip:gfg:1.2.3.4", 5, 60, "ip"), ("handle:gfg:alice", 3, 60, "handle")]
+INVALID_LIMITS = [("invalid-ip:gfg:1.2.3.4", 10, 600, "invalid-ip"), ("invalid-handle:gfg:alice", 2, 600, "invalid-handle")]
+
+
+def _redis(decode_responses=False):
+    return fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=decode_responses)
+
+
+def _decision(result):
+    # reset_at is rounded from each side's own clock reading
+    return dataclasses.replace(result, reset_at=None)
+
+
+@pytest.fixture(autouse=True)
+def exact_limits(monkeypatch):
+    monkeypatch.setattr(rate_limit.settings, "rate_limit_mode", "exact")
+    monkeypatch.setattr(rate_limit.settings, "rate_limit_backoff_base_seconds", 2)
+    monkeypatch.setattr(rate_limit.settings, "rate_limit_backoff_max_seconds", 300)
+
+
+def test_gcra_script_matches_the_python_reference(monkeypatch):
+    client = _redis(decode_responses=True)
+    store = MemoryStore(100)
+    monkeypatch.setattr(rate_limit, "get_redis", lambda: client)
+
+    async def both(limits=LIMITS):
+        return _decision(await check_rate_limits(limits)), _decision(check_limits_locally(store, limits))
+
+    async def scenario():
+        steps = [await both() for _ in range(5)]
+        # the backoff has run out: the next violation doubles it
+        await client.delete("backoff:handle:gfg:alice")
+        store.delete("backoff:handle:gfg:alice")
+        steps.append(await both(LIMITS[1:]))
+        return steps, await client.pttl("gcra:ip:gfg:1.2.3.4")
+
+    steps, ip_backlog = asyncio.run(scenario())
+    for scripted, reference in steps:
+        assert scripted == reference
+    results = [scripted for scripted, _ in steps]
+    assert [r.remaining for r in results[:3]] == [2, 1, 0]
+    assert [(r.allowed, r.limited_by, r.retry_after) for r in results[3:]] == [
+        (False, "handle", 2),
+        (False, "handle", 2),
+        (False, "handle", 4),
+    ]
+    # ip comes first, so it was charged on every call handle then denied
+    assert 5 * 12_000 - 1000 < ip_backlog <= 5 * 12_000
+
+
+def test_lookup_script_matches_the_local_lookup(monkeypatch):
+    client = _redis()
+    store = MemoryStore(100)
+    monkeypatch.setattr(lookup_module, "get_local_store", lambda: store)
+
+    async def both(cache_key="cache:gfg:alice"):
+        monkeypatch.setattr(lookup_module, "get_bytes_redis", lambda: client)
+        scripted = await lookup(cache_key, "invalid:gfg:alice", LIMITS, INVALID_LIMITS)
+        monkeypatch.setattr(lookup_module, "get_bytes_redis", lambda: None)
+        local = await lookup(cache_key, "invalid:gfg:alice", LIMITS, INVALID_LIMITS)
+        scripted.limited, local.limited = _decision(scripted.limited), _decision(local.limited)
+        assert scripted == local
+        return scripted
+
+    async def scenario():
+        miss = await both()
+        await client.set("cache:gfg:alice", b"GCR1entry", ex=60)
+        store.set("cache:gfg:alice", b"GCR1entry", 60)
+        hits = [await both() for _ in range(4)]
+        await client.set("invalid:gfg:alice", b"{}", ex=60)
+        store.set("invalid:gfg:alice", b"{}", 60)
+        invalid = [await both("cache:gfg:other") for _ in range(3)]
+        return miss, hits, invalid
+
+    miss, hits, invalid = asyncio.run(scenario())
+    assert miss.cached is None and not miss.invalid and miss.limited.remaining == 2
+    # hits charge nothing: the handle limit (3) would otherwise have denied
+    assert all(hit.cached == b"GCR1entry" for hit in hits)
+    assert [(r.invalid, r.limited.allowed, r.limited.limited_by) for r in invalid] == [
+        (True, True, "invalid-handle"),
+        (True, True, "invalid-handle"),
+        (True, False, "invalid-handle"),
+    ]
+
+
+def test_sync_script_adds_admissions_to_the_shared_state(monkeypatch):
+    client = _redis(decode_responses=True)
+    limiter = LocalRateLimiter(100)
+    monkeypatch.setattr(rate_limit.settings, "rate_limit_sync_max_pending", 100)
+
+    async def scenario():
+        for _ in range(3):
+            assert (await limiter.check(client, LIMITS[:1])).allowed
+        await limiter.sync(client)
+        return await client.pttl("gcra:ip:gfg:1.2.3.4")
+
+    backlog = asyncio.run(scenario())
+    assert limiter.pending == {}
+    assert 3 * 12_000 - 1000 < backlog <= 3 * 12_000
+
+
+def test_backoff_settings_must_be_positive(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_BACKOFF_BASE_SECONDS", "0")
+    with pytest.raises(ValueError, match="RATE_LIMIT_BACKOFF_BASE_SECONDS"):
+        config._positive_int("RATE_LIMIT_BACKOFF_BASE_SECONDS", "5")
+    monkeypatch.setenv("RATE_LIMIT_BACKOFF_BASE_SECONDS", "3")
+    assert config._positive_int("RATE_LIMIT_BACKOFF_BASE_SECONDS", "5") == 3
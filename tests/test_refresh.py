@@ -0,0 +1,147 @@
+"""Cached responses are indexed per handle so a refresh can purge and re-warm them."""
+
+import asyncio
+
+import httpx
+from starlette.responses import JSONResponse
+
+import app as app_module
+from core import cache, middleware
+from core.cache_backends import MemoryStore
+from core.invalid_handles import InvalidHandles
+from core.local_cache import LocalCache, invalidate
+from core.middleware import CacheRateLimitMiddleware, handle_index_key
+from core.warming import warm
+from routes import refresh
+from services import heatmap as heatmap_service
+from services import warmer
+
+
+def _memory_backend(monkeypatch) -> MemoryStore:
+    store = MemoryStore(max_entries=100)
+    monkeypatch.setattr(cache.settings, "cache_backend", "memory")
+    monkeypatch.setattr(cache, "_local_store", store)
+    monkeypatch.setattr(middleware, "local_cache", LocalCache(max_entries=0, max_bytes=0))
+    return store
+
+
+def test_entries_are_indexed_and_warm_requests_replace_them(monkeypatch):
+    store = _memory_backend(monkeypatch)
+    monkeypatch.setattr(middleware.settings, "rate_limit_handle_requests", 2)
+    renders = []
+
+    async def app(scope, receive, send):
+        renders.append(scope["path"])
+        await JSONResponse({"render": len(renders)})(scope, receive, send)
+
+    wrapped = CacheRateLimitMiddleware(app, "gfg")
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=wrapped)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.get("/Alice/profile")
+            await client.get("/alice/stats?year=2024")
+            # past the handle limit, yet warm requests still render
+            statuses = [await warm(wrapped, "/alice/profile") for _ in range(2)]
+            hit = await client.get("/alice/profile")
+        return statuses, hit
+
+    statuses, hit = asyncio.run(scenario())
+    assert statuses == [200, 200]
+    assert hit.headers["x-cache"] == "HIT" and hit.json() == {"render": 4}
+
+    purged = asyncio.run(cache.purge_index(handle_index_key("gfg", "alice"), ["invalid:gfg:alice"]))
+    # /Alice/profile, /alice/stats and /alice/profile: one index per handle, any case
+    assert len(purged) == 3
+    assert all(store.get(key) is None for key in purged)
+    assert store.get(handle_index_key("gfg", "alice")) is None
+
+
+def test_refresh_endpoint(monkeypatch):
+    store = _memory_backend(monkeypatch)
+    monkeypatch.setattr(refresh.settings, "cache_refresh_token", "s3cret")
+    monkeypatch.setattr(refresh.settings, "refresh_rate_limit_requests", 1)
+    store.set("cache:gfg:one", b"entry", 60)
+    store.set(handle_index_key("gfg", "alice"), b"cache:gfg:one", 60)
+    store.set("invalid:gfg:alice", b"{}", 60)
+    store.set("submissions:gfg:alice", b"stale", 60)
+    store.set("profile:gfg:alice", b"{}", 60)
+    handles = InvalidHandles(capacity=100, error_rate=0.001, ttl_seconds=300)
+    handles.add("alice")
+    monkeypatch.setattr(refresh, "invalid_handles", handles)
+    fetched, warmed = [], []
+
+    async def fake_refresh_store(username):
+        fetched.append(username)
+
+    async def fake_refresh_profile(username):
+        fetched.append(f"{username} profile")
+
+    async def fake_warm(app, path, query_string=""):
+        warmed.append(path)
+        return 200
+
+    monkeypatch.setattr(warmer, "refresh_submission_store", fake_refresh_store)
+    monkeypatch.setattr(warmer, "refresh_profile_data", fake_refresh_profile)
+    monkeypatch.setattr(warmer, "warm", fake_warm)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            anonymous = await client.post("/alice/refresh")
+            wrong = await client.post("/alice/refresh", headers={"Authorization": "Bearer nope"})
+            non_ascii = await client.post("/alice/refresh", headers={"Authorization": "Bearer sécret".encode()})
+            ok = await client.post("/Alice/refresh", headers={"Authorization": "Bearer s3cret"})
+            limited = await client.post("/alice/refresh", headers={"Authorization": "Bearer s3cret"})
+        return anonymous, wrong, non_ascii, ok, limited
+
+    anonymous, wrong, non_ascii, ok, limited = asyncio.run(scenario())
+    assert (anonymous.status_code, wrong.status_code, non_ascii.status_code) == (401, 401, 401)
+    assert ok.status_code == 200 and ok.json()["purged"] == 1
+    assert limited.status_code == 429 and limited.json()["limitedBy"] == "refresh"
+    purged = ("cache:gfg:one", "invalid:gfg:alice", "submissions:gfg:alice", "profile:gfg:alice")
+    assert [store.get(key) for key in purged] == [None] * 4
+    assert "alice" not in handles
+    # each fetched once, however many paths are re-rendered from them
+    assert fetched == ["Alice profile", "Alice"]
+    assert warmed == [f"/Alice{path}" for path in warmer.WARM_PATHS]
+    assert ok.json()["warmed"] == {path: 200 for path in warmed}
+
+
+def test_metrics_endpoint(monkeypatch):
+    monkeypatch.setattr(refresh.settings, "metrics_token", "")
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            disabled = await client.get("/_internal/metrics", headers={"Authorization": "Bearer "})
+            monkeypatch.setattr(refresh.settings, "metrics_token", "m3trics")
+            anonymous = await client.get("/_internal/metrics")
+            wrong = await client.get("/_internal/metrics", headers={"Authorization": "Bearer s3cret"})
+            ok = await client.get("/_internal/metrics", headers={"Authorization": "Bearer m3trics"})
+        return disabled, anonymous, wrong, ok
+
+    disabled, anonymous, wrong, ok = asyncio.run(scenario())
+    assert [r.status_code for r in (disabled, anonymous, wrong, ok)] == [404, 401, 401, 200]
+    assert "cache.l1.entries" in ok.json()
+    # /metrics is an ordinary handle again
+    assert middleware._handle_from_path("/metrics") == "metrics"
+
+
+def test_heatmap_bases_are_forgotten_on_every_worker(monkeypatch):
+    published = []
+
+    async def fake_publish(key):
+        published.append(key)
+
+    monkeypatch.setattr(heatmap_service, "publish_invalidation", fake_publish)
+    monkeypatch.setattr(heatmap_service, "_BASE_CACHE", {"alice": object(), "bob": object()})
+    asyncio.run(heatmap_service.forget_user_everywhere("Alice"))
+    assert list(heatmap_service._BASE_CACHE) == ["bob"]
+
+    # what another worker does with that message
+    local = LocalCache(max_entries=8, max_bytes=1 << 20)
+    local.set("cache:gfg:one", b"entry", 5, 60)
+    for key in (*published, "heatmap-base:gfg:bob"):
+        invalidate(local, key)
+    assert heatmap_service._BASE_CACHE == {} and local.get("cache:gfg:one") == b"entry"
@@ -0,0 +1,149 @@
+"""The columnar submission store must agree with the nested-dict walks it replaces."""
+
+import asyncio
+import random
+from datetime import datetime, timezone
+
+import pytest
+
+from services import profile, submission_store, topics
+from services.submission_store import MISSING_EPOCH, STANDARD_DIFFICULTIES, SubmissionStore
+
+
+def _payload(seed: int = 5, problems: int = 400):
+    rng = random.Random(seed)
+    result = {name: {} for name in ["Basic", "easy", "Medium", "hard", "Unrated"]}
+    for problem_id in range(problems):
+        stamp = (
+            f"20{rng.randint(18, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} "
+            f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}"
+        )
+        details = {"pname": f"Problem ✓ {problem_id}", "slug": f"problem-{problem_id}", "user_subtime": stamp}
+        if rng.random() < 0.05:
+            details.pop("user_subtime")
+        result[rng.choice(list(result))][str(problem_id)] = details
+    return {"result": result, "count": problems}
+
+
+def _profile_solved_stats(submission_payload):
+    """``solvedStats`` as services/profile.py built it from the nested payload."""
+    solved_stats = {}
+    for difficulty, problems in submission_payload.get("result", {}).items():
+        questions = [
+            {
+                "question": details.get("pname", ""),
+                "questionUrl": f"https://www.geeksforgeeks.org/problems/{details.get('slug', '')}",
+                "difficulty": difficulty,
+                "slug": details.get("slug", ""),
+            }
+            for details in problems.values()
+        ]
+        solved_stats[difficulty.lower()] = {"count": len(questions), "questions": questions}
+    for difficulty in STANDARD_DIFFICULTIES:
+        solved_stats.setdefault(difficulty.lower(), {"count": 0, "questions": []})
+    return solved_stats
+
+
+def _epoch(value: str) -> int:
+    return int(datetime.strptime(value, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp())
+
+
+def test_solved_stats_match_nested_walk():
+    payload = _payload()
+    store = SubmissionStore.from_payload(payload)
+    assert store.solved_stats() == _profile_solved_stats(payload)
+    assert store.count_by_difficulty() == {
+        name: stats["count"] for name, stats in _profile_solved_stats(payload).items()
+    }
+    assert store.reported_count == 400
+
+
+def test_null_slugs_and_names_are_empty_strings():
+    payload = {"result": {"Easy": {"1": {"pname": None, "slug": None}, "2": {"pname": "Two", "slug": "two"}}}}
+    store = SubmissionStore.from_payload(payload)
+    assert SubmissionStore.from_bytes(store.to_bytes()) == store
+    assert [(q["question"], q["slug"]) for q in store.solved_stats()["easy"]["questions"]] == [("", ""), ("Two", "two")]
+
+
+def test_profile_problems_keep_slugs_for_topic_analysis(monkeypatch):
+    payload = _payload(seed=4, problems=30)
+
+    async def fake_profile(username):
+        return {"name": "Alice"}
+
+    async def fake_store(username):
+        return SubmissionStore.from_payload(payload)
+
+    async def fake_tags(slug):
+        return ["Arrays"]
+
+    monkeypatch.setattr(profile, "get_profile_data", fake_profile)
+    monkeypatch.setattr(profile, "get_submission_store", fake_store)
+    monkeypatch.setattr(topics, "_fetch_topic_tags", fake_tags)
+
+    async def scenario():
+        detailed = await profile.get_detailed_user_data("alice")
+        return detailed, await topics.build_topic_analysis(detailed["allProblems"])
+
+    detailed, analysis = asyncio.run(scenario())
+    standard = [
+        details
+        for name, problems in payload["result"].items()
+        if name.lower() in STANDARD_DIFFICULTIES
+        for details in problems.values()
+    ]
+    assert sorted(p["slug"] for p in detailed["allProblems"]) == sorted(d["slug"] for d in standard)
+    assert [(t.topic, t.count) for t in analysis] == [("Arrays", len(standard))]
+
+
+def test_bytes_round_trip():
+    store = SubmissionStore.from_payload(_payload(seed=9))
+    decoded = SubmissionStore.from_bytes(store.to_bytes())
+    assert decoded == store
+    assert decoded.solved_stats() == store.solved_stats()
+
+    empty = SubmissionStore.from_payload({"result": {}})
+    assert SubmissionStore.from_bytes(empty.to_bytes()) == empty
+
+    encoded = store.to_bytes()
+    for broken in [b"", encoded[:-3], b"XXXXXXXX" + encoded[8:]]:
+        with pytest.raises(ValueError):
+            SubmissionStore.from_bytes(broken)
+
+
+def test_wall_clock_epochs_are_sorted_and_skip_missing():
+    payload = _payload(seed=2)
+    store = SubmissionStore.from_payload(payload)
+    expected = sorted(
+        _epoch(details["user_subtime"])
+        for problems in payload["result"].values()
+        for details in problems.values()
+        if "user_subtime" in details
+    )
+    assert list(store.wall_clock_epochs()) == expected
+    assert MISSING_EPOCH in store.epochs
+
+
+def test_store_is_cached_as_bytes(monkeypatch):
+    cache = {}
+    fetches = []
+
+    async def fake_get_bytes(key):
+        return cache.get(key)
+
+    async def fake_set_bytes(key, value, ttl_seconds):
+        cache[key] = value
+
+    async def fake_fetch(username):
+        fetches.append(username)
+        return _payload(seed=3, problems=20)
+
+    monkeypatch.setattr(submission_store, "get_bytes", fake_get_bytes)
+    monkeypatch.setattr(submission_store, "set_bytes", fake_set_bytes)
+    monkeypatch.setattr(submission_store, "get_submission_data", fake_fetch)
+
+    first = asyncio.run(submission_store.get_submission_store("Alice"))
+    second = asyncio.run(submission_store.get_submission_store("alice"))
+    assert fetches == ["Alice"]
+    assert list(cache) == ["submissions:gfg:alice"]
+    assert second == first
@@ -0,0 +1,82 @@
+"""``subtime_ordinal`` must agree with ``datetime.strptime`` on every input."""
+
+import random
+from datetime import datetime, timezone
+
+import pytest
+
+from services.subtime import SUBTIME_FORMAT, subtime_epoch, subtime_ordinal
+
+
+def _reference(value):
+    try:
+        return datetime.strptime(value, SUBTIME_FORMAT).toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+_ALPHABET = "0123456789-: T/x٣"
+
+
+def _mutate(rng: random.Random, value: str) -> str:
+    chars = list(value)
+    for _ in range(rng.randint(1, 3)):
+        op = rng.random()
+        position = rng.randrange(len(chars) + 1)
+        if op < 0.4 and chars:
+            chars[min(position, len(chars) - 1)] = rng.choice(_ALPHABET)
+        elif op < 0.7 and chars:
+            del chars[min(position, len(chars) - 1)]
+        else:
+            chars.insert(position, rng.choice(_ALPHABET))
+    return "".join(chars)
+
+
+def _random_stamp(rng: random.Random) -> str:
+    return (
+        f"{rng.randint(1, 9999):04d}-{rng.randint(0, 13):02d}-{rng.randint(0, 32):02d} "
+        f"{rng.randint(0, 25):02d}:{rng.randint(0, 61):02d}:{rng.randint(0, 61):02d}"
+    )
+
+
+def _reference_epoch(value):
+    try:
+        parsed = datetime.strptime(value, SUBTIME_FORMAT)
+    except (TypeError, ValueError):
+        return None
+    return int(parsed.replace(tzinfo=timezone.utc).timestamp())
+
+
+def test_fuzz_against_strptime():
+    rng = random.Random(20240101)
+    for _ in range(20000):
+        value = _random_stamp(rng)
+        if rng.random() < 0.35:
+            value = _mutate(rng, value)
+        assert subtime_ordinal(value) == _reference(value), value
+        assert subtime_epoch(value) == _reference_epoch(value), value
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "2024-02-29 23:59:59",
+        "2023-02-29 10:00:00",
+        "2024-1-5 3:4:5",
+        "2024-01-01 24:00:00",
+        "2024-01-01 23:59:60",
+        "2024-01-01T10:00:00",
+        "2024-01-01 10:00:00 ",
+        "",
+        "0000-01-01 00:00:00",
+    ],
+)
+def test_edge_cases(value):
+    assert subtime_ordinal(value) == _reference(value)
+    assert subtime_epoch(value) == _reference_epoch(value)
+
+
+def test_non_strings_are_rejected():
+    assert subtime_ordinal(None) is None
+    assert subtime_ordinal(1700000000) is None
+    assert subtime_epoch(None) is None
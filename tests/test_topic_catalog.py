@@ -0,0 +1,95 @@
+"""Offline tests for the prebuilt, memory-mapped topic catalog."""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services import topic_catalog, topics  # noqa: E402
+
+
+class TopicCatalogTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "catalog.bin")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_through_mmap(self):
+        entries = {
+            "two-sum": ["Arrays", "Hashing"],
+            "kadane": ["Arrays", "Dynamic Programming"],
+            "reverse-ll": ["Linked List"],
+            "no-tags": [],
+            "ünïcode-slug": ["Strings"],
+        }
+        topic_catalog.write_catalog(self.path, entries)
+        catalog = topic_catalog.open_catalog(self.path)
+
+        self.assertEqual(len(catalog), len(entries))
+        for slug, tags in entries.items():
+            self.assertEqual(catalog.get(slug), tags)
+        self.assertIsNone(catalog.get("missing"))
+        self.assertIsNone(catalog.get(""))
+
+    def test_empty_catalog(self):
+        topic_catalog.write_catalog(self.path, {})
+        catalog = topic_catalog.open_catalog(self.path)
+        self.assertEqual(len(catalog), 0)
+        self.assertIsNone(catalog.get("two-sum"))
+
+    def test_rejects_foreign_files(self):
+        with open(self.path, "wb") as handle:
+            handle.write(b"not a catalog at all")
+        with self.assertRaises(ValueError):
+            topic_catalog.open_catalog(self.path)
+
+    def test_rejects_truncated_files(self):
+        data = topic_catalog.encode_catalog({"two-sum": ["Arrays", "Hashing"], "kadane": ["Arrays"]})
+        for size in (topic_catalog._HEADER.size, topic_catalog._HEADER.size + 6, len(data) - 1):
+            with open(self.path, "wb") as handle:
+                handle.write(data[:size])
+            with self.assertRaises(ValueError):
+                topic_catalog.open_catalog(self.path)
+
+    def test_cli_builds_from_cassette(self):
+        cassette = os.path.join(self.tmp.name, "problems.jsonl")
+        with open(cassette, "w", encoding="utf-8") as handle:
+            handle.write(json.dumps({"slug": "kadane", "response": {"results": {"tags": {"topic_tags": ["Arrays"]}}}}) + "\n")
+            handle.write(json.dumps({"slug": "reverse-ll", "response": {"results": {}}}) + "\n")
+
+        with open(os.devnull, "w") as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                topic_catalog.main(["--cassette", cassette, "-o", self.path])
+            finally:
+                sys.stdout = stdout
+
+        catalog = topic_catalog.open_catalog(self.path)
+        self.assertEqual(catalog.get("kadane"), ["Arrays"])
+        self.assertEqual(catalog.get("reverse-ll"), [])
+
+    async def test_fetch_prefers_catalog_over_network(self):
+        topic_catalog.write_catalog(self.path, {"kadane": ["Arrays"]})
+        catalog = topic_catalog.open_catalog(self.path)
+
+        async def no_network(slug: str):
+            raise AssertionError(f"unexpected fetch for {slug}")
+
+        topics._TAG_CACHE.clear()
+        original_request = topics._request_topic_tags
+        topics.get_catalog = lambda: catalog
+        topics._request_topic_tags = no_network
+        try:
+            self.assertEqual(await topics._fetch_topic_tags("kadane"), ["Arrays"])
+        finally:
+            topics.get_catalog = topic_catalog.get_catalog
+            topics._request_topic_tags = original_request
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+"""Popular handles are found by decayed hit counts and re-warmed within a budget."""
+
+import asyncio
+
+import httpx
+import pytest
+from starlette.responses import JSONResponse
+
+from core import cache, middleware
+from core.cache_backends import MemoryStore
+from core.invalid_handles import InvalidHandles
+from core.local_cache import LocalCache
+from core.popularity import PopularityTracker
+from core.warming import warm
+from services import warmer
+
+
+def test_recent_requests_outweigh_old_ones():
+    now = [0.0]
+    tracker = PopularityTracker(half_life_seconds=60, max_members=2, clock=lambda: now[0])
+
+    def hits(handle, count):
+        for _ in range(count):
+            tracker.record(handle)
+        asyncio.run(tracker.flush(None, "popularity:gfg"))
+
+    hits("old", 10)
+    now[0] = 180  # three half-lives later 10 old hits weigh like 1.25 new ones
+    hits("new", 2)
+    hits("rare", 1)
+    assert asyncio.run(tracker.top(None, "popularity:gfg", 3)) == ["new", "old"]
+
+    now[0] = 60 * 40  # past the rescale point the order still holds
+    hits("rare", 3)
+    assert asyncio.run(tracker.top(None, "popularity:gfg", 2)) == ["rare", "new"]
+    assert tracker.landmark == now[0] and max(tracker.scores.values()) == 3
+
+
+def test_warming_rounds_respect_claims_and_budget(monkeypatch):
+    monkeypatch.setattr(cache.settings, "cache_backend", "memory")
+    monkeypatch.setattr(cache, "_local_store", MemoryStore(max_entries=100))
+    monkeypatch.setattr(warmer.settings, "cache_warm_budget_per_minute", 2)
+    tracker = PopularityTracker(half_life_seconds=3600, max_members=100)
+    monkeypatch.setattr(warmer, "popularity", tracker)
+    warmed = []
+
+    async def fake_rewarm(app, username):
+        warmed.append(username)
+        return {}
+
+    minute = [0]
+    monkeypatch.setattr(warmer, "rewarm_user", fake_rewarm)
+    monkeypatch.setattr(warmer, "_budget_key", lambda: f"warmer:gfg:{minute[0]}")
+    for handle, count in (("alice", 5), ("bob", 3), ("carol", 2)):
+        for _ in range(count):
+            tracker.record(handle)
+
+    store = cache._local_store
+    assert asyncio.run(warmer.warm_popular_handles(app=None)) == 2
+    # carol was over budget: her claim is given back rather than held for the TTL
+    assert store.get("warm:gfg:carol") is None
+    assert asyncio.run(warmer.warm_popular_handles(app=None)) == 0
+    assert asyncio.run(warmer.warm_popular_handles(app=None)) == 0
+
+    # a minute later the budget is back, however often it was exceeded
+    minute[0] += 1
+    # alice and bob are claimed until shortly before expiry
+    assert asyncio.run(warmer.warm_popular_handles(app=None)) == 1
+    assert warmed == ["alice", "bob", "carol"]
+
+
+def test_budget_counter_on_redis(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True)
+    monkeypatch.setattr(cache, "get_redis", lambda: client)
+
+    async def scenario():
+        counts = [await cache.increment_counter("warmer:gfg:7", 60) for _ in range(3)]
+        return counts, await client.ttl("warmer:gfg:7"), await client.exists("backoff:warmer:gfg:7")
+
+    counts, ttl, backoff = asyncio.run(scenario())
+    assert counts == [1, 2, 3] and 0 < ttl <= 60 and not backoff
+
+
+def test_middleware_records_served_handles(monkeypatch):
+    tracker = PopularityTracker(half_life_seconds=3600, max_members=100)
+    monkeypatch.setattr(middleware, "popularity", tracker)
+    monkeypatch.setattr(middleware, "cache_enabled", lambda: True)
+    monkeypatch.setattr(middleware, "local_cache", LocalCache(max_entries=8, max_bytes=1 << 20))
+    monkeypatch.setattr(middleware, "invalid_handles", InvalidHandles(capacity=100, error_rate=0.001, ttl_seconds=300))
+
+    async def app(scope, receive, send):
+        status_code = 404 if scope["path"].startswith("/ghost") else 200
+        await JSONResponse({}, status_code=status_code)(scope, receive, send)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=middleware.CacheRateLimitMiddleware(app, "gfg"))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            for path in ("/Alice/stats/svg", "/alice", "/alice", "/docs", "/ghost", "/ghost", "/%3Cx%3E"):
+                await client.get(path)
+        await warm(middleware.CacheRateLimitMiddleware(app, "gfg"), "/bob/profile")
+
+    asyncio.run(scenario())
+    # the second /alice is a local-cache hit; 404s, rejections and warm requests are not popularity
+    assert tracker.pending == {"Alice": 1, "alice": 2}
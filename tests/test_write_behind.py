@@ -0,0 +1,67 @@
+"""Redis writes leave the response path and go out as batched pipelines."""
+
+import asyncio
+
+import httpx
+from starlette.responses import JSONResponse
+
+from core import middleware, write_behind as write_behind_module
+from core.cache import CacheWrite
+from core.local_cache import INSTANCE_ID, INVALIDATION_CHANNEL, LocalCache
+from core.write_behind import WriteBehind
+
+
+def _slow_redis(monkeypatch):
+    """A stand-in ``write_many`` that blocks until released, recording its batches."""
+    batches = []
+    release = asyncio.Event()
+
+    async def fake_write_many(writes, messages=()):
+        await release.wait()
+        batches.append(([write.key for write in writes], list(messages)))
+
+    monkeypatch.setattr(write_behind_module, "redis_available", lambda: True)
+    monkeypatch.setattr(write_behind_module, "write_many", fake_write_many)
+    return batches, release
+
+
+def test_writes_queued_during_a_flush_form_the_next_batch(monkeypatch):
+    monkeypatch.setattr(write_behind_module.settings, "cache_invalidation_pubsub", True)
+
+    async def scenario():
+        batches, release = _slow_redis(monkeypatch)
+        writer = WriteBehind(max_pending=3)
+        await writer.write(CacheWrite("a", b"1", 60), announce=True)
+        await asyncio.sleep(0)  # the flusher takes "a" and waits on Redis
+        for key in "bcde":
+            await writer.write(CacheWrite(key, b"1", 60))
+        assert batches == [] and [write.key for write, _ in writer.pending] == ["c", "d", "e"]
+        release.set()
+        await writer.drain()
+        return batches
+
+    batches = asyncio.run(scenario())
+    assert batches == [(["a"], [(INVALIDATION_CHANNEL, f"{INSTANCE_ID} a")]), (["c", "d", "e"], [])]
+
+
+def test_response_does_not_wait_for_the_cache_write(monkeypatch):
+    monkeypatch.setattr(middleware, "cache_enabled", lambda: True)
+    monkeypatch.setattr(middleware, "local_cache", LocalCache(max_entries=8, max_bytes=1 << 20))
+    writer = WriteBehind(max_pending=10)
+    monkeypatch.setattr(middleware, "write_behind", writer)
+
+    async def scenario():
+        batches, release = _slow_redis(monkeypatch)
+        transport = httpx.ASGITransport(app=middleware.CacheRateLimitMiddleware(JSONResponse({"ok": True}), "gfg"))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            miss = await client.get("/alice/profile")
+            hit = await client.get("/alice/profile")  # from the local cache, filled inline
+        landed = list(batches)
+        release.set()
+        await writer.drain()
+        return miss, hit, landed, batches
+
+    miss, hit, landed, batches = asyncio.run(scenario())
+    assert (miss.headers["x-cache"], hit.headers["x-cache"]) == ("MISS", "HIT")
+    assert landed == []  # both responses were done before the Redis write
+    assert len(batches) == 1 and batches[0][0][0].startswith("cache:gfg:")